@@ -3,16 +3,25 @@ FastAPI Backend for Codelex - Regional Language to Python Code Generator
 Supports: Kannada to Python code conversion with multi-stage pipeline
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 import os
 import sys
+import json
+import threading
+import time
 from pathlib import Path
 
 # Import model utilities
 from model_service import ModelService
+from inference_pool import InferencePool, PoolSaturatedError
+from caching import ResponseCache
+from code_analysis import feedback_cache_stats
+from resilience import CircuitBreaker
+from metrics import HTTP_LATENCY, REGISTRY, CallbackMetric
 
 app = FastAPI(
     title="Codelex API",
@@ -31,21 +40,120 @@ app.add_middleware(
 
 # Initialize model service
 model_service = None
+MODEL_PATH = os.getenv("CODELEX_MODEL_PATH", "./kannada_python_t5_model")
+
+# Startup progress for the readiness probe: "starting", "ready" or "failed"
+service_state = {"state": "starting", "error": None}
+
+# Largest number of items accepted by the batch endpoint
+MAX_BATCH_ITEMS = int(os.getenv("CODELEX_MAX_BATCH_ITEMS", "1000"))
+
+# Worker pool that keeps blocking pipeline work off the event loop
+inference_pool = InferencePool()
+
+# Full responses for repeated prompts, with identical in-flight requests coalesced
+response_cache = ResponseCache()
+
+def _queue_depth():
+    stats = inference_pool.stats()
+    depth = {("inference", "active"): stats["active"], ("inference", "queued"): stats["queued"]}
+    if model_service:
+        depth[("model_batch", "queued")] = model_service.batcher.pending()
+    return depth
+
+def _cache_counters(counter: str):
+    def collect():
+        values = {("response",): response_cache.cache.stats()[counter]}
+        if model_service:
+            translation = model_service.translation_cache.stats()
+            values[("translation_memory",)] = translation["memory"][counter]
+            values[("translation_disk",)] = translation["disk"][counter]
+            values[("execution",)] = model_service.sandbox.cache.stats()[counter]
+            values[("model",)] = model_service.model_cache.stats()[counter]
+        return values
+    return collect
+
+REGISTRY.register(CallbackMetric(
+    "codelex_queue_depth", "Jobs running or waiting in the worker queues", _queue_depth, ["queue", "state"]
+))
+REGISTRY.register(CallbackMetric(
+    "codelex_cache_hits_total", "Cache hits by cache", _cache_counters("hits"), ["cache"], "counter"
+))
+REGISTRY.register(CallbackMetric(
+    "codelex_cache_misses_total", "Cache misses by cache", _cache_counters("misses"), ["cache"], "counter"
+))
+REGISTRY.register(CallbackMetric(
+    "codelex_circuit_open", "1 while the circuit breaker of a remote service is open or half-open",
+    lambda: {
+        ("translator",): int(model_service.translator_breaker.state != CircuitBreaker.CLOSED)
+    } if model_service else {},
+    ["service"]
+))
+REGISTRY.register(CallbackMetric(
+    "codelex_coalesced_requests_total", "Requests that waited on an identical in-flight request",
+    lambda: {(): response_cache.coalesced}, type_name="counter"
+))
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Record request latency per route (for streams, the time to the first byte)"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_LATENCY.observe(time.perf_counter() - started, request.method, route.path if route else "unmatched")
+    return response
+
+def preload_service():
+    """
+    Load the model service up front, before worker processes are forked
+    (used by start.py --production so the weights are shared copy-on-write)
+    """
+    global model_service
+    model_service = ModelService(MODEL_PATH)
+    return model_service
+
+def _load_service():
+    """Load (unless preloaded) and warm up the model service; runs on a background thread"""
+    global model_service
+    try:
+        service = model_service or ModelService(MODEL_PATH)
+        print("🔥 Warming up model...")
+        service.warm_up()
+    except Exception as e:
+        print(f"❌ Model service failed to start: {e}")
+        service_state.update(state="failed", error=str(e))
+        return
+    
+    # Only published once warm, so requests are gated on readiness
+    model_service = service
+    service_state["state"] = "ready"
+    print("✅ Models loaded successfully!")
 
 @app.on_event("startup")
 async def startup_event():
-    """Load model on startup"""
-    global model_service
+    """Start loading the model in the background so the server accepts connections immediately"""
     print("🚀 Starting Codelex API...")
     print("📦 Loading AI models...")
-    model_service = ModelService()
-    print("✅ Models loaded successfully!")
+    print(f"🧵 Inference pool: {inference_pool.max_workers} workers, queue of {inference_pool.max_queue}")
+    threading.Thread(target=_load_service, name="codelex-startup", daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain the inference pool and stop sandbox workers"""
+    inference_pool.shutdown()
+    if model_service:
+        model_service.sandbox.shutdown()
 
 # Request/Response Models
 class ProcessRequest(BaseModel):
     inputText: str
     inputLanguage: str = "kn"  # Kannada by default
     
+class ExemplarMatch(BaseModel):
+    id: int
+    score: float
+    field: str
+
 class ProcessResponse(BaseModel):
     preprocess: str
     translation: str
@@ -53,11 +161,39 @@ class ProcessResponse(BaseModel):
     code: str
     execution: str
     feedback: str
+    exemplar: Optional[ExemplarMatch] = None  # Dataset example whose code was reused
+    timings: Optional[Dict[str, float]] = None  # Per-stage milliseconds, only with X-Codelex-Debug
+
+class BatchProcessRequest(BaseModel):
+    items: List[ProcessRequest]
+
+class BatchItemResult(BaseModel):
+    result: Optional[ProcessResponse] = None
+    error: Optional[str] = None
+
+class BatchProcessResponse(BaseModel):
+    results: List[BatchItemResult]
 
 class HealthResponse(BaseModel):
     status: str
     message: str
     model_loaded: bool
+    state: str = "starting"  # starting, ready or failed
+
+class ReadinessResponse(BaseModel):
+    state: str
+    error: Optional[str] = None
+
+def _ensure_ready():
+    """Reject requests with 503 until the model service is loaded and warm"""
+    if service_state["state"] != "ready" or not model_service.is_loaded():
+        if service_state["state"] == "starting":
+            raise HTTPException(
+                status_code=503,
+                detail="Model service is starting",
+                headers={"Retry-After": str(inference_pool.retry_after)}
+            )
+        raise HTTPException(status_code=503, detail="Model service not available")
 
 # API Endpoints
 @app.get("/", response_model=HealthResponse)
@@ -66,49 +202,211 @@ async def root():
     return {
         "status": "healthy",
         "message": "Codelex API is running",
-        "model_loaded": model_service is not None and model_service.is_loaded()
+        "model_loaded": model_service is not None and model_service.is_loaded(),
+        "state": service_state["state"]
     }
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Detailed health check"""
+    messages = {
+        "starting": "Model loading",
+        "ready": "All systems operational",
+        "failed": f"Model failed to load: {service_state['error']}",
+    }
     return {
-        "status": "healthy" if model_service and model_service.is_loaded() else "unhealthy",
-        "message": "All systems operational" if model_service and model_service.is_loaded() else "Model not loaded",
-        "model_loaded": model_service is not None and model_service.is_loaded()
+        "status": "healthy" if service_state["state"] == "ready" else "unhealthy",
+        "message": messages[service_state["state"]],
+        "model_loaded": model_service is not None and model_service.is_loaded(),
+        "state": service_state["state"]
     }
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready", response_model=ReadinessResponse)
+async def readiness_check():
+    """Readiness probe: 200 once the model is loaded and warm, 503 while starting or after a failure"""
+    if service_state["state"] != "ready":
+        return JSONResponse(status_code=503, content=service_state)
+    return service_state
+
+def _without_timings(result: Dict) -> Dict:
+    """Drop the debug-only per-stage timings from a pipeline result"""
+    return {key: value for key, value in result.items() if key != "timings"}
+
 @app.post("/api/process", response_model=ProcessResponse)
-async def process_code(request: ProcessRequest):
+async def process_code(request: ProcessRequest, x_codelex_debug: Optional[str] = Header(None)):
     """
     Main endpoint to process regional language input through all stages:
     1. Preprocessing
     2. Translation to English
     3. Pseudo-code generation
     4. Python code generation
-    5. Execution (placeholder for now)
+    5. Execution (sandboxed)
     6. Feedback generation
+    Send an X-Codelex-Debug header to get per-stage timings in the response.
     """
-    if not model_service or not model_service.is_loaded():
-        raise HTTPException(status_code=503, detail="Model service not available")
+    _ensure_ready()
     
     if not request.inputText or not request.inputText.strip():
         raise HTTPException(status_code=400, detail="Input text cannot be empty")
     
+    # Same normalized text and language means the same response
+    cleaned_text = model_service.preprocess_text(request.inputText)["cleaned_text"]
+    cache_key = (cleaned_text, request.inputLanguage)
+    
     try:
-        # Process through all stages
-        result = model_service.process_pipeline(
-            input_text=request.inputText,
-            language=request.inputLanguage
-        )
-        return result
+        if x_codelex_debug:
+            # Debug requests always run the pipeline so the timings are their own
+            result = await inference_pool.run(
+                model_service.process_pipeline,
+                input_text=request.inputText,
+                language=request.inputLanguage
+            )
+            response_cache.cache.set(cache_key, _without_timings(result))
+            return result
+        
+        # Process through all stages on a worker thread
+        async def compute():
+            result = await inference_pool.run(
+                model_service.process_pipeline,
+                input_text=request.inputText,
+                language=request.inputLanguage
+            )
+            return _without_timings(result)
+        
+        return await response_cache.get_or_compute(cache_key, compute)
     
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         print(f"❌ Processing error: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
+def _sse_event(event: str, data) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/process/stream")
+async def process_code_stream(request: ProcessRequest, x_codelex_debug: Optional[str] = Header(None)):
+    """
+    Streaming variant of /api/process using Server-Sent Events
+    Emits one event per stage (preprocess, translation, pseudo_code, code,
+    execution, feedback) as soon as it is ready, "code_token" events while
+    the CodeT5 fallback is decoding, and a final "result" event with the
+    complete response (with per-stage timings if an X-Codelex-Debug header
+    is sent). Failures are reported as an "error" event.
+    """
+    _ensure_ready()
+    
+    if not request.inputText or not request.inputText.strip():
+        raise HTTPException(status_code=400, detail="Input text cannot be empty")
+    
+    cleaned_text = model_service.preprocess_text(request.inputText)["cleaned_text"]
+    cached = response_cache.cache.get((cleaned_text, request.inputLanguage))
+    
+    if cached is not None:
+        async def replay_cached():
+            for stage in ("preprocess", "translation", "pseudo_code", "code", "execution", "feedback"):
+                yield _sse_event(stage, cached[stage])
+            yield _sse_event("result", cached)
+        
+        return StreamingResponse(replay_cached(), media_type="text/event-stream")
+    
+    try:
+        stages = inference_pool.iterate(
+            model_service.iter_pipeline,
+            input_text=request.inputText,
+            language=request.inputLanguage,
+            stream_tokens=True
+        )
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    async def stream_events():
+        # Token-streamed code comes from greedy decoding, not the decoding /api/process
+        # uses, so only responses without code_token events are shared with it
+        streamed = False
+        try:
+            async for stage, result in stages:
+                if stage == "code_token":
+                    streamed = True
+                elif stage == "result" and not streamed:
+                    response_cache.cache.set((cleaned_text, request.inputLanguage), _without_timings(result))
+                if stage == "result" and not x_codelex_debug:
+                    result = _without_timings(result)
+                yield _sse_event(stage, result)
+        except Exception as e:
+            print(f"❌ Streaming error: {str(e)}")
+            yield _sse_event("error", {"detail": f"Processing failed: {str(e)}"})
+    
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/process/batch", response_model=BatchProcessResponse)
+async def process_code_batch(request: BatchProcessRequest):
+    """
+    Process many inputs in one call, running each stage across the whole batch
+    Results come back in request order; a failing item reports its own error
+    """
+    _ensure_ready()
+    
+    if len(request.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch cannot contain more than {MAX_BATCH_ITEMS} items")
+    
+    try:
+        results = await inference_pool.run(
+            model_service.process_batch,
+            [(item.inputText, item.inputLanguage) for item in request.items]
+        )
+        return {"results": results}
+    
+    except PoolSaturatedError as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        print(f"❌ Batch processing error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Batch processing failed: {str(e)}")
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss counters for the service caches"""
+    if not model_service:
+        raise HTTPException(status_code=503, detail="Model service not available")
+    
+    return {
+        "translation": model_service.translation_cache.stats(),
+        "response": response_cache.stats(),
+        "feedback": feedback_cache_stats(),
+        "model": model_service.model_cache.stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Stage latencies, fallback counters, cache hits and queue depth in Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/languages")
 async def get_supported_languages():
     """Get list of supported languages"""
@@ -0,0 +1,88 @@
+"""
+Inference backends for Codelex
+Loads the CodeT5 model behind the same generate() interface:
+- torch: full-precision PyTorch model (default)
+- int8:  PyTorch with dynamic int8 quantization of the Linear layers
+- onnx:  ONNX Runtime encoder/decoder export with KV-cache reuse
+
+The backend is chosen with the CODELEX_BACKEND environment variable.
+Export a model for the onnx backend with:
+    python backends.py export --model ./kannada_python_t5_model
+"""
+
+import argparse
+import os
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def default_onnx_path(model_path: str) -> str:
+    """Where the ONNX export of a model lives unless CODELEX_ONNX_PATH says otherwise"""
+    return os.getenv("CODELEX_ONNX_PATH") or f"{model_path.rstrip('/')}_onnx"
+
+
+def _import_ort_model():
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError as e:
+        print(f"❌ Missing required package for the onnx backend: {e}")
+        print("Install with: pip install optimum-onnx[onnxruntime]")
+        raise
+    return ORTModelForSeq2SeqLM
+
+
+def load_model(model_path: str, backend: str = None):
+    """Load the seq2seq model for model_path using the requested backend"""
+    backend = backend or os.getenv("CODELEX_BACKEND", "torch")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+    if backend == "onnx":
+        onnx_path = default_onnx_path(model_path)
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"ONNX export not found at {onnx_path}. "
+                f"Run: python backends.py export --model {model_path}"
+            )
+        ORTModelForSeq2SeqLM = _import_ort_model()
+        return ORTModelForSeq2SeqLM.from_pretrained(onnx_path, use_cache=True)
+
+    import torch
+    from transformers import T5ForConditionalGeneration
+
+    model = T5ForConditionalGeneration.from_pretrained(model_path)
+    model.eval()
+
+    if backend == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    return model
+
+
+def export_onnx(model_path: str, output_path: str = None) -> str:
+    """Export a fine-tuned model (and its tokenizer) to ONNX for the onnx backend"""
+    from transformers import AutoTokenizer
+
+    ORTModelForSeq2SeqLM = _import_ort_model()
+    output_path = output_path or default_onnx_path(model_path)
+
+    print(f"📦 Exporting {model_path} to ONNX...")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True, use_cache=True)
+    model.save_pretrained(output_path)
+    AutoTokenizer.from_pretrained(model_path).save_pretrained(output_path)
+
+    print(f"✅ ONNX model saved to '{output_path}'")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Codelex inference backend tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subcommands.add_parser("export", help="Export a model for the onnx backend")
+    export_parser.add_argument("--model", default="./kannada_python_t5_model", help="Model directory to export")
+    export_parser.add_argument("--output", default=None, help="Output directory (default: <model>_onnx)")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_onnx(args.model, args.output)
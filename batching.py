@@ -0,0 +1,92 @@
+"""
+Dynamic micro-batching for Codelex
+Collects concurrent model-fallback requests for a short window and
+runs them through a single batched call:
+- Waits at most max_wait_ms after the first request arrives
+- Flushes early once max_batch_size requests are pending
+- Routes each result (or error) back to its caller
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+
+class BatchScheduler:
+    """Groups single-item requests into batches for a batch function"""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = None,
+        max_wait_ms: float = None,
+        name: str = "codelex-batcher"
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size or int(os.getenv("CODELEX_BATCH_SIZE", "8"))
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else float(os.getenv("CODELEX_BATCH_WAIT_MS", "10"))
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, item: Any) -> Future:
+        """Queue an item and return a future for its result"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any, timeout: float = None) -> Any:
+        """Submit an item and block until its result is ready"""
+        return self.submit(item).result(timeout=timeout)
+
+    def pending(self) -> int:
+        """Number of items waiting to be picked up by the scheduler thread"""
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        # Started lazily so the scheduler can be created before a fork
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> list:
+        """Block for the first request, then gather more until the window closes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,421 @@
+"""
+Benchmark suite for Codelex
+Three reproducible benchmarks whose results are written as JSON so runs
+can be diffed across commits:
+- stages:   each ModelService stage timed in isolation
+- pipeline: process_pipeline throughput over lang_dataset.json
+- http:     concurrent load against api.app (in-process) or a running server
+- compare:  accuracy vs latency of several models (e.g. teacher and distilled
+            student) on the same prompts
+
+Translation is served by a local fake built from the dataset, so results
+do not depend on network access to Google Translate.
+
+Usage:
+    python benchmark.py all --output results.json
+    python benchmark.py pipeline --limit 200 --cold
+    python benchmark.py http --requests 500 --concurrency 32
+    python benchmark.py http --url http://localhost:8000
+    python benchmark.py compare --models ./kannada_python_t5_model ./kannada_python_t5_student
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from caching import TranslationCache, normalize_text
+from intents import parse_intent
+from metrics import CODE_GENERATIONS, TRANSLATIONS
+from model_service import ModelService
+
+DATASET_PATH = "lang_dataset.json"
+
+
+class FakeTranslator:
+    """
+    Stand-in for translator_client.GoogleTranslateClient
+    Answers dataset prompts with their English text after a fixed delay
+    and echoes anything else back unchanged
+    """
+
+    phrases: Dict[str, str] = {}
+    latency_ms: float = 0.0
+
+    def __init__(self, source: str = "auto", target: str = "en", **kwargs):
+        self.source = source
+        self.target = target
+
+    def translate(self, text: str) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        return self.phrases.get(normalize_text(text), text)
+
+
+def load_dataset(path: str = DATASET_PATH, limit: int = None) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data[:limit] if limit else data
+
+
+def install_fake_translator(service, dataset: List[Dict], latency_ms: float):
+    """Route translate_to_english's remote call to FakeTranslator"""
+    FakeTranslator.phrases = {normalize_text(item["kannada text"]): item["text"] for item in dataset}
+    FakeTranslator.latency_ms = latency_ms
+    service.translator_class = FakeTranslator
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Count, mean and percentiles (ms) of a list of durations in seconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(q: float) -> float:
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def time_calls(fn: Callable, inputs: List, repeat: int) -> List[float]:
+    """Time fn(x) for every input, repeat times over"""
+    durations = []
+    for _ in range(repeat):
+        for value in inputs:
+            started = time.perf_counter()
+            fn(value)
+            durations.append(time.perf_counter() - started)
+    return durations
+
+
+def counter_snapshot() -> Dict[str, Dict[str, float]]:
+    return {
+        "translations": {labels[0]: value for labels, value in TRANSLATIONS.values().items()},
+        "code_generations": {labels[0]: value for labels, value in CODE_GENERATIONS.values().items()},
+    }
+
+
+def counter_delta(before: Dict, after: Dict) -> Dict[str, Dict[str, float]]:
+    return {
+        name: {
+            key: after[name][key] - before[name].get(key, 0.0)
+            for key in after[name]
+            if after[name][key] != before[name].get(key, 0.0)
+        }
+        for name in after
+    }
+
+
+def uncached(service, fn: Callable) -> Callable:
+    """fn with the model cache emptied before every call, so the model itself is timed"""
+    def call(value):
+        service.model_cache.clear()
+        return fn(value)
+    return call
+
+
+def benchmark_stages(service, dataset: List[Dict], samples: int, repeat: int) -> Dict:
+    """Time every pipeline stage on its own, over the same sample of prompts"""
+    print(f"\n⏱️  Stage micro-benchmark ({samples} prompts x {repeat})")
+    sample = dataset[:samples]
+    kannada = [item["kannada text"] for item in sample]
+    english = [item["text"] for item in sample]
+    intents = [parse_intent(text) for text in english]
+    codes = [item["code"] for item in sample]
+    unique = itertools.count()
+
+    stages = {
+        "preprocess": (service.preprocess_text, kannada),
+        "retrieval_kannada": (lambda text: service.find_exemplar(text, "kannada text"), kannada),
+        "retrieval_english": (lambda text: service.find_exemplar(text, "text"), english),
+        "translation_cached": (lambda text: service.translate_to_english(text, "kn"), kannada),
+        "translation_offline": (service.offline_translator.translate, kannada),
+        # A unique suffix makes every call miss the cache and the phrase table
+        "translation_uncached": (
+            lambda text: service.translate_to_english(f"{text} {next(unique)}", "kn"), kannada
+        ),
+        "intent": (parse_intent, english),
+        "pseudo_code": (lambda i: service.generate_pseudo_code(english[i], intents[i]), range(len(sample))),
+        "python_code": (lambda i: service.generate_python_code(english[i], None, intents[i]), range(len(sample))),
+        "model_single": (
+            uncached(service, lambda text: service.generate_code_batch([text])), english[:max(1, samples // 4)]
+        ),
+        # Encoder states and outputs of repeated descriptions come from the model cache
+        "model_single_cached": (lambda text: service.generate_code_batch([text]), english[:max(1, samples // 4)]),
+        "execution": (service.execute_code, codes),
+        "feedback": (lambda i: service.generate_feedback(codes[i], english[i]), range(len(sample))),
+    }
+    if not service.sandbox.enabled:
+        print("   execution              skipped (set CODELEX_EXECUTE_CODE=1 to measure the sandbox)")
+        del stages["execution"]
+
+    results = {}
+    for name, (fn, inputs) in stages.items():
+        inputs = list(inputs)
+        fn(inputs[0])  # Warm-up (lazy pools, first-call allocations)
+        results[name] = summarize(time_calls(fn, inputs, repeat))
+        print(f"   {name:<22} p50 {results[name]['p50_ms']:>9.3f} ms   p95 {results[name]['p95_ms']:>9.3f} ms")
+
+    # Batched generation, reported per batch and per input
+    batch_size = service.batcher.max_batch_size
+    batches = [english[start:start + batch_size] for start in range(0, len(english), batch_size)]
+    batches = [batch for batch in batches if len(batch) == batch_size] or [english]
+    durations = time_calls(uncached(service, service.generate_code_batch), batches[:max(1, len(batches) // 2)], 1)
+    results["model_batch"] = summarize(durations)
+    results["model_batch"]["batch_size"] = len(batches[0])
+    results["model_batch"]["per_input_mean_ms"] = round(results["model_batch"]["mean_ms"] / len(batches[0]), 3)
+    print(f"   {'model_batch':<22} p50 {results['model_batch']['p50_ms']:>9.3f} ms   ({len(batches[0])} inputs per batch)")
+    return results
+
+
+def benchmark_pipeline(service, dataset: List[Dict]) -> Dict:
+    """Run process_pipeline over the dataset and report throughput and per-stage time"""
+    print(f"\n🔁 Pipeline throughput ({len(dataset)} prompts)")
+    before = counter_snapshot()
+    durations = []
+    stage_totals: Dict[str, float] = {}
+    errors = 0
+
+    started = time.perf_counter()
+    for item in dataset:
+        item_started = time.perf_counter()
+        try:
+            result = service.process_pipeline(item["kannada text"], "kn")
+        except Exception as e:
+            errors += 1
+            print(f"⚠️  Pipeline error: {e}")
+            continue
+        durations.append(time.perf_counter() - item_started)
+        for stage, ms in (result.get("timings") or {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+    elapsed = time.perf_counter() - started
+
+    completed = len(durations)
+    results = {
+        "prompts": len(dataset),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(completed / elapsed, 2) if elapsed else 0.0,
+        "latency": summarize(durations),
+        "stage_mean_ms": {stage: round(total / completed, 3) for stage, total in stage_totals.items()} if completed else {},
+        "counters": counter_delta(before, counter_snapshot()),
+    }
+    print(f"   {results['throughput_per_s']} prompts/s, p50 {results['latency'].get('p50_ms')} ms, "
+          f"p99 {results['latency'].get('p99_ms')} ms")
+    return results
+
+
+async def _load_test(client, prompts: List[str], total: int, concurrency: int) -> Dict:
+    durations = []
+    statuses: Dict[str, int] = {}
+    next_prompt = itertools.cycle(prompts)
+    remaining = itertools.count()
+
+    async def worker():
+        while next(remaining) < total:
+            payload = {"inputText": next(next_prompt), "inputLanguage": "kn"}
+            started = time.perf_counter()
+            try:
+                response = await client.post("/api/process", json=payload)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            durations.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(total / elapsed, 2) if elapsed else 0.0,
+        "statuses": statuses,
+        "latency": summarize(durations),
+    }
+
+
+def benchmark_http(service, dataset: List[Dict], total: int, concurrency: int, url: Optional[str] = None) -> Dict:
+    """Fire concurrent /api/process requests and report req/s and latency percentiles"""
+    try:
+        import httpx
+    except ImportError as e:
+        print(f"❌ Missing required package for the HTTP benchmark: {e}")
+        print("Install with: pip install httpx")
+        raise
+
+    target = url or "api.app (in-process)"
+    print(f"\n🌐 HTTP load test against {target} ({total} requests, concurrency {concurrency})")
+    prompts = [item["kannada text"] for item in dataset]
+
+    async def run():
+        if url:
+            client = httpx.AsyncClient(base_url=url, timeout=120)
+        else:
+            import api
+            api.model_service = service
+            # The lifespan that normally marks the service ready does not run in-process
+            api.service_state.update(state="ready", error=None)
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://codelex", timeout=120)
+        async with client:
+            return await _load_test(client, prompts, total, concurrency)
+
+    results = asyncio.run(run())
+    results["target"] = target
+    print(f"   {results['requests_per_s']} req/s, p50 {results['latency'].get('p50_ms')} ms, "
+          f"p99 {results['latency'].get('p99_ms')} ms, statuses {results['statuses']}")
+    return results
+
+
+def benchmark_models(model_paths: List[str], backend: Optional[str], dataset: List[Dict], samples: int) -> Dict:
+    """
+    Accuracy vs latency of the model fallback for several models on the same prompts
+    - exact_match: generated code equals the dataset code (trailing whitespace ignored)
+    - valid_python: generated code parses (dataset fragments count as valid)
+    - single/batch latency of generate_code_batch
+    """
+    from decoding import is_valid_python
+    
+    print(f"\n⚖️  Model comparison ({samples} prompts)")
+    sample = dataset[:samples]
+    english = [item["text"] for item in sample]
+    expected = [item["code"].rstrip() for item in sample]
+
+    results = {}
+    for path in model_paths:
+        service = ModelService(path, backend)
+        try:
+            service.warm_up()
+            service.model_cache.clear()
+            parameters = None
+            if hasattr(service.model, "parameters"):
+                parameters = sum(parameter.numel() for parameter in service.model.parameters())
+
+            batch_size = service.batcher.max_batch_size
+            outputs = []
+            durations = []
+            for start in range(0, len(english), batch_size):
+                started = time.perf_counter()
+                outputs += service.generate_code_batch(english[start:start + batch_size])
+                durations.append(time.perf_counter() - started)
+            single = time_calls(
+                uncached(service, lambda text: service.generate_code_batch([text])), english[:max(1, samples // 4)], 1
+            )
+
+            results[path] = {
+                "parameters": parameters,
+                "exact_match": round(sum(o.rstrip() == e for o, e in zip(outputs, expected)) / len(sample), 4),
+                "valid_python": round(sum(is_valid_python(o) for o in outputs) / len(sample), 4),
+                "single": summarize(single),
+                "batch_per_input_ms": round(sum(durations) / len(sample) * 1000, 3),
+            }
+        finally:
+            service.sandbox.shutdown()
+
+    baseline = results[model_paths[0]]
+    print(f"   {'model':<36} {'params':>10} {'exact':>7} {'valid':>7} {'p50 ms':>9} {'batch ms/in':>12} {'speed-up':>9}")
+    for path, result in results.items():
+        result["speed_up"] = round(baseline["single"]["p50_ms"] / result["single"]["p50_ms"], 2) if result["single"]["p50_ms"] else None
+        print(f"   {path[-36:]:<36} {result['parameters'] or '-':>10} {result['exact_match']:>7.3f} "
+              f"{result['valid_python']:>7.3f} {result['single']['p50_ms']:>9.1f} "
+              f"{result['batch_per_input_ms']:>12.1f} {result['speed_up']:>8}x")
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Codelex benchmark suite")
+    parser.add_argument("suite", nargs="?", default="all", choices=["all", "stages", "pipeline", "http", "compare"])
+    parser.add_argument("--model", default="./kannada_python_t5_model", help="Model directory")
+    parser.add_argument("--models", nargs="+", default=None,
+                        help="Models for the compare suite, the first is the baseline "
+                             "(default: --model and ./kannada_python_t5_student)")
+    parser.add_argument("--backend", default=None, help="Inference backend (torch, int8, onnx)")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="Dataset of prompts")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--limit", type=int, default=None, help="Use only the first N dataset prompts")
+    parser.add_argument("--samples", type=int, default=32, help="Prompts per stage micro-benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per stage micro-benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="HTTP requests to send")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent HTTP clients")
+    parser.add_argument("--url", default=None, help="Benchmark a running server instead of api.app in-process")
+    parser.add_argument("--translate-latency-ms", type=float, default=0.0, help="Simulated translator latency")
+    parser.add_argument("--cold", action="store_true",
+                        help="Disable exemplar retrieval and the translation cache so every prompt runs every stage")
+    args = parser.parse_args()
+
+    dataset = load_dataset(args.dataset, args.limit)
+
+    # Keep benchmark translations out of the server's translation cache
+    scratch = tempfile.mkdtemp(prefix="codelex-benchmark-")
+    os.environ["CODELEX_TRANSLATION_CACHE"] = os.path.join(scratch, "translation_cache.sqlite3")
+
+    service = None
+    # The compare suite loads its own models
+    if args.suite != "compare" and (args.suite != "http" or not args.url):
+        service = ModelService(args.model, args.backend)
+        install_fake_translator(service, load_dataset(args.dataset), args.translate_latency_ms)
+        service.warm_up()
+        if args.cold:
+            service.exemplars = None
+            service.translation_cache = TranslationCache(db_path=os.path.join(scratch, "cold.sqlite3"))
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": service.model_path if service else None,
+            "backend": service.backend if service else None,
+            "args": vars(args),
+        }
+    }
+
+    try:
+        if args.suite in ("all", "stages"):
+            results["stages"] = benchmark_stages(service, dataset, min(args.samples, len(dataset)), args.repeat)
+        if args.suite in ("all", "pipeline"):
+            results["pipeline"] = benchmark_pipeline(service, dataset)
+        if args.suite in ("all", "http"):
+            results["http"] = benchmark_http(service, dataset, args.requests, args.concurrency, args.url)
+        if args.suite == "compare":
+            models = args.models or [args.model, "./kannada_python_t5_student"]
+            results["compare"] = benchmark_models(models, args.backend, dataset, min(args.samples, len(dataset)))
+    finally:
+        if service:
+            service.sandbox.shutdown()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
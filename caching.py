@@ -0,0 +1,302 @@
+"""
+Caching utilities for Codelex
+- LRUCache: thread-safe in-process LRU with size and TTL limits
+- nbytes: memory estimate of cached values (strings, tensors, containers)
+  for LRUCache's byte budget
+- TranslationCache: two-tier (memory + sqlite) cache for translations,
+  pre-seedable from the Kannada/English pairs in lang_dataset.json
+- ResponseCache: async cache of full API responses with single-flight
+  coalescing of identical in-flight requests
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with optional time-to-live
+    When max_bytes is set, sizeof(value) is charged against that budget
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing/expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            stored_at, value, size = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self._bytes -= size
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store value under key, evicting the least recently used entries"""
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._data[key] = (time.monotonic(), value, size)
+            self._bytes += size
+
+            while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def nbytes(value: Any) -> int:
+    """Approximate memory used by a cached value (tensors/arrays by their data size)"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if hasattr(value, "element_size") and hasattr(value, "nelement"):
+        return value.element_size() * value.nelement()
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(nbytes(item) for item in value.values())
+    return 8
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for use as a cache key (whitespace, case, trailing punctuation)"""
+    return " ".join(text.split()).rstrip(".!?।").strip().casefold()
+
+
+class TranslationCache:
+    """
+    Two-tier translation cache keyed on (normalized text, source language)
+    Tier 1 is an in-process LRU, tier 2 a sqlite file that survives restarts
+    """
+
+    def __init__(
+        self,
+        db_path: str = None,
+        max_entries: int = None,
+        ttl: float = None
+    ):
+        self.db_path = db_path or os.getenv("CODELEX_TRANSLATION_CACHE", "./translation_cache.sqlite3")
+        self.memory = LRUCache(
+            max_entries=max_entries or int(os.getenv("CODELEX_TRANSLATION_CACHE_SIZE", "4096")),
+            ttl=ttl if ttl is not None else float(os.getenv("CODELEX_TRANSLATION_CACHE_TTL", "3600"))
+        )
+        self.disk_hits = 0
+        self.disk_misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "text TEXT NOT NULL, source_lang TEXT NOT NULL, translation TEXT NOT NULL, "
+            "PRIMARY KEY (text, source_lang))"
+        )
+        self._conn.commit()
+
+        # A sqlite connection must not be used across fork(); forked workers reconnect
+        if hasattr(os, "register_at_fork"):
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._reconnect())
+
+    def _reconnect(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def get(self, text: str, source_lang: str) -> Optional[str]:
+        """Look up a translation in memory, then on disk"""
+        key = (normalize_text(text), source_lang)
+
+        translation = self.memory.get(key)
+        if translation is not None:
+            return translation
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT translation FROM translations WHERE text = ? AND source_lang = ?",
+                key
+            ).fetchone()
+            if row is None:
+                self.disk_misses += 1
+                return None
+            self.disk_hits += 1
+
+        self.memory.set(key, row[0])
+        return row[0]
+
+    def set(self, text: str, source_lang: str, translation: str):
+        """Store a translation in both tiers"""
+        key = (normalize_text(text), source_lang)
+        self.memory.set(key, translation)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (text, source_lang, translation) VALUES (?, ?, ?)",
+                (*key, translation)
+            )
+            self._conn.commit()
+
+    def seed_from_dataset(self, dataset_path: str = "lang_dataset.json", source_lang: str = "kn") -> int:
+        """
+        Pre-seed the disk tier with 'kannada text' -> 'text' pairs
+        Existing entries are kept; returns the number of pairs read
+        """
+        if not os.path.exists(dataset_path):
+            return 0
+
+        with open(dataset_path, encoding="utf-8") as f:
+            records = json.load(f)
+
+        rows = [
+            (normalize_text(record["kannada text"]), source_lang, " ".join(record["text"].split()))
+            for record in records
+            if record.get("kannada text") and record.get("text")
+        ]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO translations (text, source_lang, translation) VALUES (?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for both tiers"""
+        with self._lock:
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            disk = {
+                "entries": disk_entries,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses,
+            }
+        return {"memory": self.memory.stats(), "disk": disk}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Cache of complete pipeline responses for the API
+    Identical requests arriving while one is being computed share its result
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, ttl: float = None):
+        self.cache = LRUCache(
+            max_entries=max_entries or int(os.getenv("CODELEX_RESPONSE_CACHE_SIZE", "2048")),
+            ttl=ttl if ttl is not None else float(os.getenv("CODELEX_RESPONSE_CACHE_TTL", "600")),
+            max_bytes=max_bytes or int(os.getenv("CODELEX_RESPONSE_CACHE_BYTES", str(32 * 1024 * 1024))),
+            sizeof=lambda response: len(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+        )
+        self._inflight: Dict[Hashable, "asyncio.Future"] = {}
+        self.coalesced = 0
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached response for key, computing it at most once at a time"""
+        while True:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise  # This request itself was cancelled
+                # The computing request was cancelled; one of its waiters takes over
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a request nobody else waited on doesn't log a warning
+            future.exception()
+            raise
+        except BaseException:
+            # Cancellation or shutdown of this request is not the waiters' error
+            future.cancel()
+            raise
+        else:
+            self.cache.set(key, result)
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus coalesced and in-flight request counts"""
+        stats = self.cache.stats()
+        stats["coalesced_waiters"] = self.coalesced
+        stats["inflight"] = len(self._inflight)
+        return stats
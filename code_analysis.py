@@ -0,0 +1,301 @@
+"""
+Static analysis of generated programs for Codelex feedback
+One ast pass collects what the feedback stage reports:
+- loop, conditional, function and print usage
+- cyclomatic complexity (1 + decision points)
+- variables that are assigned but never read, and names shadowing built-ins
+- constant-foldable loops, e.g. the sum-of-range loop of the sum template
+Feedback is cached by a hash of the code, so popular programs are analyzed once.
+"""
+
+import ast
+import builtins
+import hashlib
+import io
+import os
+import textwrap
+import tokenize
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from caching import LRUCache
+
+_BUILTIN_NAMES = frozenset(dir(builtins))
+
+
+@dataclass(frozen=True)
+class FoldableLoop:
+    """A `for` over a constant range whose body only accumulates the loop variable"""
+    line: int
+    target: str
+    operator: str
+    range_args: Tuple[int, ...]
+    value: int
+
+
+@dataclass
+class CodeAnalysis:
+    """Result of analyze_code()"""
+    parsed: bool
+    syntax_error: Optional[str] = None
+    lines: int = 0
+    comments: int = 0
+    for_loops: int = 0
+    range_loops: int = 0
+    while_loops: int = 0
+    conditionals: int = 0
+    functions: int = 0
+    prints: int = 0
+    complexity: int = 1
+    unused_variables: List[str] = field(default_factory=list)
+    shadowed_builtins: List[str] = field(default_factory=list)
+    foldable_loops: List[FoldableLoop] = field(default_factory=list)
+
+
+def _constant_range(node: ast.expr) -> Optional[Tuple[int, ...]]:
+    """Arguments of range(...) if the call only uses integer literals"""
+    if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "range"):
+        return None
+    if node.keywords or not 1 <= len(node.args) <= 3:
+        return None
+
+    args = []
+    for arg in node.args:
+        if isinstance(arg, ast.UnaryOp) and isinstance(arg.op, ast.USub):
+            arg, sign = arg.operand, -1
+        else:
+            sign = 1
+        if not (isinstance(arg, ast.Constant) and type(arg.value) is int):
+            return None
+        args.append(sign * arg.value)
+    return tuple(args)
+
+
+def _fold(operator: ast.operator, args: Tuple[int, ...]) -> Optional[int]:
+    """
+    Value the loop over range(*args) accumulates, computed from start/stop/step
+    so huge literal ranges never build or measure a range object
+    """
+    start, stop, step = (0, args[0], 1) if len(args) == 1 else (args + (1,))[:3]
+    if step == 0:
+        return None
+    count = max(0, -((start - stop) // step))
+    if isinstance(operator, ast.Add):
+        return count * (2 * start + (count - 1) * step) // 2
+    if isinstance(operator, ast.Mult) and count <= 1000:
+        product = 1
+        for value in range(start, stop, step):
+            product *= value
+        return product
+    return None
+
+
+class _Analyzer(ast.NodeVisitor):
+    """Collects every CodeAnalysis field in a single walk of the tree"""
+
+    def __init__(self, analysis: CodeAnalysis):
+        self.analysis = analysis
+        self.stored = {}
+        self.loaded = set()
+
+    def visit_For(self, node: ast.For):
+        analysis = self.analysis
+        analysis.for_loops += 1
+        analysis.complexity += 1
+        args = _constant_range(node.iter)
+        if args is not None or (isinstance(node.iter, ast.Call) and getattr(node.iter.func, "id", None) == "range"):
+            analysis.range_loops += 1
+        if args is not None:
+            self._check_foldable(node, args)
+        self.generic_visit(node)
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node: ast.While):
+        self.analysis.while_loops += 1
+        self.analysis.complexity += 1
+        self.generic_visit(node)
+
+    def visit_If(self, node: ast.If):
+        self.analysis.conditionals += 1
+        self.analysis.complexity += 1
+        self.generic_visit(node)
+
+    def visit_IfExp(self, node: ast.IfExp):
+        self.analysis.conditionals += 1
+        self.analysis.complexity += 1
+        self.generic_visit(node)
+
+    def visit_BoolOp(self, node: ast.BoolOp):
+        self.analysis.complexity += len(node.values) - 1
+        self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler):
+        self.analysis.complexity += 1
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node: ast.comprehension):
+        self.analysis.complexity += 1 + len(node.ifs)
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        self.analysis.functions += 1
+        self.generic_visit(node)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node: ast.Call):
+        if isinstance(node.func, ast.Name) and node.func.id == "print":
+            self.analysis.prints += 1
+        self.generic_visit(node)
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, ast.Load):
+            self.loaded.add(node.id)
+        else:
+            self.stored.setdefault(node.id, node.lineno)
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        # x += 1 reads x as well as writing it
+        if isinstance(node.target, ast.Name):
+            self.loaded.add(node.target.id)
+        self.generic_visit(node)
+
+    def _check_foldable(self, node: ast.For, args: Tuple[int, ...]):
+        if node.orelse or len(node.body) != 1 or not isinstance(node.target, ast.Name):
+            return
+        statement = node.body[0]
+        if not (isinstance(statement, ast.AugAssign) and isinstance(statement.target, ast.Name)):
+            return
+        if not (isinstance(statement.value, ast.Name) and statement.value.id == node.target.id):
+            return
+
+        value = _fold(statement.op, args)
+        if value is not None:
+            self.analysis.foldable_loops.append(FoldableLoop(
+                line=node.lineno,
+                target=statement.target.id,
+                operator="+" if isinstance(statement.op, ast.Add) else "*",
+                range_args=args,
+                value=value,
+            ))
+
+    def finish(self):
+        analysis = self.analysis
+        analysis.unused_variables = sorted(
+            name for name in self.stored
+            if name not in self.loaded and name != "_"
+        )
+        analysis.shadowed_builtins = sorted(name for name in self.stored if name in _BUILTIN_NAMES)
+
+
+def _count_comments(code: str) -> int:
+    try:
+        return sum(
+            token.type == tokenize.COMMENT
+            for token in tokenize.generate_tokens(io.StringIO(code).readline)
+        )
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return code.count("#")
+
+
+def analyze_code(code: str) -> CodeAnalysis:
+    """Parse code once and collect everything the feedback stage reports"""
+    source = textwrap.dedent(code)
+    lines = len([line for line in source.split("\n") if line.strip()])
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        return CodeAnalysis(
+            parsed=False,
+            syntax_error=f"line {e.lineno}: {e.msg}",
+            lines=lines,
+            comments=_count_comments(source),
+        )
+
+    analysis = CodeAnalysis(parsed=True, lines=lines, comments=_count_comments(source))
+    analyzer = _Analyzer(analysis)
+    analyzer.visit(tree)
+    analyzer.finish()
+    return analysis
+
+
+def _range_text(args: Tuple[int, ...]) -> str:
+    return f"range({', '.join(str(arg) for arg in args)})"
+
+
+def feedback_points(analysis: CodeAnalysis) -> List[str]:
+    """Feedback lines for an analyzed program"""
+    points = []
+
+    if not analysis.parsed:
+        points.append(f"💡 This is a fragment rather than a complete program ({analysis.syntax_error}); review it in context")
+        if analysis.lines > 2 and not analysis.comments:
+            points.append("💡 Add comments to explain your code logic")
+        return points
+
+    if analysis.range_loops:
+        points.append("✓ Good use of for loop with range() function")
+    elif analysis.for_loops or analysis.while_loops:
+        points.append("✓ Loop implemented to repeat the work")
+
+    if analysis.conditionals:
+        points.append("✓ Conditional logic implemented correctly")
+
+    if analysis.functions:
+        points.append("✓ Code organized into a function")
+    elif analysis.lines > 3:
+        points.append("💡 Consider organizing code into functions for better reusability")
+
+    if analysis.prints:
+        points.append("✓ Output statements included")
+
+    for loop in analysis.foldable_loops:
+        formula = f"sum({_range_text(loop.range_args)})" if loop.operator == "+" else f"math.prod({_range_text(loop.range_args)})"
+        points.append(
+            f"💡 The loop on line {loop.line} always {'adds' if loop.operator == '+' else 'multiplies'} "
+            f"the same numbers into {loop.target} ({loop.value}); {formula} computes it without a loop"
+        )
+
+    # A lone assignment (the assign template) is the whole point of the program
+    if analysis.unused_variables and analysis.lines > 1:
+        points.append(f"💡 Assigned but never used: {', '.join(analysis.unused_variables)}")
+
+    if analysis.shadowed_builtins:
+        names = ", ".join(analysis.shadowed_builtins)
+        points.append(f"💡 {names} hides the built-in function of the same name; pick another variable name")
+
+    if analysis.complexity > 10:
+        points.append(
+            f"💡 Cyclomatic complexity is {analysis.complexity}; split the logic into smaller functions"
+        )
+
+    if not analysis.comments and analysis.lines > 2:
+        points.append("💡 Add comments to explain your code logic")
+
+    return points
+
+
+ANALYSIS_FAILED = "💡 This program is too large or deeply nested to analyze automatically; review it by hand"
+
+_FEEDBACK_CACHE = LRUCache(max_entries=int(os.getenv("CODELEX_FEEDBACK_CACHE_SIZE", "4096")))
+
+
+def code_feedback(code: str) -> List[str]:
+    """feedback_points(analyze_code(code)), cached by a hash of the code"""
+    key = hashlib.sha1(code.encode("utf-8")).digest()
+    points = _FEEDBACK_CACHE.get(key)
+    if points is None:
+        try:
+            points = tuple(feedback_points(analyze_code(code)))
+        except (ValueError, OverflowError, RecursionError, MemoryError) as e:
+            # No guessing from substrings: say the program wasn't analyzed
+            print(f"⚠️  Code analysis failed ({type(e).__name__})")
+            points = (ANALYSIS_FAILED,)
+        _FEEDBACK_CACHE.set(key, points)
+    return list(points)
+
+
+def feedback_cache_stats():
+    """Hit/miss counters of the feedback cache"""
+    return _FEEDBACK_CACHE.stats()
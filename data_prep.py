@@ -1,18 +1,27 @@
-
 """
 Preprocess Kannada → Python dataset for CodeT5 fine-tuning.
-- Loads JSON dataset with columns: 'kannada text', 'code', 'text'
-- Splits into train/validation
-- Tokenizes using CodeT5 tokenizer
-- Saves tokenized dataset to disk
+- Streams the JSON dataset (a JSON array or JSON Lines) record by record
+- Drops exact duplicates by a hash of the (source, code) pair
+- Splits into train/test by a seeded hash, so a record keeps its split as the dataset grows
+- Tokenizes without padding (DataCollatorForSeq2Seq pads per batch), using num_proc workers
+- Saves Arrow files that train_model.py memory-maps with load_from_disk
+
+Usage:
+    python data_prep.py --num-proc 4
+    python data_prep.py --source-field text --output tokenized_english_dataset
 """
 
+import argparse
+import hashlib
+import json
 import os
 import sys
 
 # Error handling for required packages
 try:
-    from datasets import load_dataset, DatasetDict
+    import numpy as np
+    import pyarrow.compute as pc
+    from datasets import Dataset, DatasetDict, Features, Value
     from transformers import AutoTokenizer
 except ImportError as e:
     print("❌ Required package missing:", e)
@@ -23,39 +32,171 @@ DATA_PATH = "lang_dataset.json"
 MODEL_NAME = "Salesforce/codet5-small"
 TOKENIZED_PATH = "tokenized_kannada_dataset"
 
-# Load JSON dataset
-dataset = load_dataset("json", data_files=DATA_PATH)
+# Array brackets, separators and whitespace between records
+_SEPARATORS = "[,] \t\r\n"
+
+
+def iter_json_records(path, chunk_size=1 << 16):
+    """
+    Yield the objects of a JSON array (or JSON Lines) file one at a time
+    Only the current chunk and the record being decoded are held in memory
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    with open(path, encoding="utf-8") as f:
+        eof = False
+        while True:
+            while position < len(buffer) and buffer[position] in _SEPARATORS:
+                position += 1
+
+            if position < len(buffer):
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # A number may continue in the next chunk unless a separator follows it
+                    complete = not isinstance(record, (int, float)) or (
+                        end < len(buffer) and buffer[end] in _SEPARATORS
+                    )
+                    if complete or eof:
+                        yield record
+                        position = end
+                        continue
+            elif eof:
+                return
+
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+
+def split_of(source, target, seed, test_size):
+    """Seeded hash split; the same record always lands in the same split"""
+    digest = hashlib.blake2b(f"{seed}\0{source}\0{target}".encode("utf-8"), digest_size=8).digest()
+    return "test" if int.from_bytes(digest, "big") % 10_000 < test_size * 10_000 else "train"
+
+
+def iter_unique_pairs(path, source_field, target_field, stats=None):
+    """(source, code) pairs streamed from the dataset file, without exact duplicates"""
+    seen = set()
+    for record in iter_json_records(path):
+        source = (record.get(source_field) or "").strip()
+        target = (record.get(target_field) or "").rstrip()
+        if stats is not None:
+            stats["records"] += 1
+        if not source or not target:
+            if stats is not None:
+                stats["incomplete"] += 1
+            continue
+
+        # 16-byte digests keep the dedupe set small however long the texts are
+        key = hashlib.blake2b(f"{source}\0{target}".encode("utf-8"), digest_size=16).digest()
+        if key in seen:
+            if stats is not None:
+                stats["duplicates"] += 1
+            continue
+        seen.add(key)
+        yield source, target
+
 
-# Split train/validation (90/10)
-if "train" not in dataset:
-    dataset = dataset["train"].train_test_split(test_size=0.1)
+def iter_examples(path, source_field, target_field, split, seed, test_size, data_version=None):
+    """
+    Examples of one split for Dataset.from_generator
+    data_version (size and mtime of the file) is only there so an edited
+    dataset doesn't hit the generator cache of the old one
+    """
+    for source, target in iter_unique_pairs(path, source_field, target_field):
+        if split_of(source, target, seed, test_size) == split:
+            yield {"source": source, "target": target}
+
+
+def length_summary(lengths, max_length):
+    """min/mean/p50/p95/max and truncated count of a column of sequence lengths"""
+    if len(lengths) == 0:
+        return "empty"
+    return (
+        f"min {lengths.min()}, mean {lengths.mean():.1f}, p50 {int(np.percentile(lengths, 50))}, "
+        f"p95 {int(np.percentile(lengths, 95))}, max {lengths.max()}, "
+        f"truncated {int((lengths >= max_length).sum())}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenize the Kannada → Python dataset for CodeT5")
+    parser.add_argument("--data", default=DATA_PATH, help="JSON array or JSON Lines file")
+    parser.add_argument("--model", default=MODEL_NAME, help="Tokenizer to use")
+    parser.add_argument("--output", default=TOKENIZED_PATH)
+    parser.add_argument("--source-field", default="kannada text", help="Model input column")
+    parser.add_argument("--target-field", default="code")
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--test-size", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--num-proc", type=int, default=None, help="Tokenization processes (default: one)")
+    args = parser.parse_args()
+
+    stats = {"records": 0, "incomplete": 0, "duplicates": 0}
+    unique = sum(1 for _ in iter_unique_pairs(args.data, args.source_field, args.target_field, stats))
+    print(f"✅ Read {stats['records']} records: {unique} unique, {stats['duplicates']} duplicates and "
+          f"{stats['incomplete']} incomplete records dropped")
+
+    file_stat = os.stat(args.data)
+    features = Features({"source": Value("string"), "target": Value("string")})
+    # Records are written to Arrow as they stream in; the file is never loaded whole
     dataset = DatasetDict({
-        "train": dataset["train"],
-        "validation": dataset["test"]
+        split: Dataset.from_generator(
+            iter_examples,
+            gen_kwargs={
+                "path": args.data,
+                "source_field": args.source_field,
+                "target_field": args.target_field,
+                "split": split,
+                "seed": args.seed,
+                "test_size": args.test_size,
+                "data_version": (file_stat.st_size, file_stat.st_mtime_ns),
+            },
+            features=features,
+        )
+        for split in ("train", "test")
     })
+    print("✅ Dataset splits:", {split: len(data) for split, data in dataset.items()})
 
-print("✅ Loaded dataset splits:", list(dataset.keys()))
+    # Load CodeT5 tokenizer
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
 
-# Load CodeT5 tokenizer
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+    # Preprocessing function for seq2seq; padding is left to the data collator
+    def preprocess_function(examples):
+        model_inputs = tokenizer(
+            examples["source"],
+            text_target=examples["target"],
+            max_length=args.max_length,
+            truncation=True
+        )
+        model_inputs["length"] = [len(ids) for ids in model_inputs["input_ids"]]
+        return model_inputs
 
-# Preprocessing function for seq2seq
-def preprocess_function(examples):
-    inputs = examples["kannada text"]
-    targets = examples["code"]
-    model_inputs = tokenizer(
-        inputs, max_length=128, truncation=True, padding="max_length"
+    tokenized_dataset = dataset.map(
+        preprocess_function,
+        batched=True,
+        num_proc=args.num_proc,
+        remove_columns=["source", "target"],
+        desc="Tokenizing"
     )
-    with tokenizer.as_target_tokenizer():
-        labels = tokenizer(
-            targets, max_length=128, truncation=True, padding="max_length"
-        )
-    model_inputs["labels"] = labels["input_ids"]
-    return model_inputs
 
-# Tokenize dataset
-tokenized_dataset = dataset.map(preprocess_function, batched=True, remove_columns=dataset["train"].column_names)
+    # Length statistics straight from the Arrow columns
+    for split, data in tokenized_dataset.items():
+        input_lengths = np.asarray(data.data.column("length"))
+        label_lengths = pc.list_value_length(data.data.column("labels")).to_numpy()
+        print(f"📏 {split} inputs: {length_summary(input_lengths, args.max_length)}")
+        print(f"📏 {split} labels: {length_summary(label_lengths, args.max_length)}")
+
+    # Save tokenized dataset
+    tokenized_dataset.save_to_disk(args.output)
+    print(f"✅ Tokenized dataset saved to '{args.output}'")
+
 
-# Save tokenized dataset
-tokenized_dataset.save_to_disk(TOKENIZED_PATH)
-print(f"✅ Tokenized dataset saved to '{TOKENIZED_PATH}'")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+Grammar-aware decoding for Codelex
+Keeps the CodeT5 fallback on syntactically possible Python while it decodes:
+- PythonPrefixState: incremental lexer state of a partial program (strings,
+  comments, brackets, indentation) that rejects impossible continuations
+- PythonGrammarLogitsProcessor: checks the top-k candidates of every beam
+  against that state and masks the impossible ones; end-of-sequence is only
+  allowed where the program parses
+- StatementBlockStoppingCriteria: ends a sequence once a block is closed by a
+  blank line or the last line starts repeating
+- speculative_generate: verifies a draft program (template skeleton or the
+  nearest dataset example) in a few forward passes and only generates where
+  the model disagrees with it
+
+This replaces no_repeat_ngram_size, which forbids the bigrams Python repeats
+all the time ("print(", indentation).
+"""
+
+import ast
+import re
+import textwrap
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from transformers import LogitsProcessor, StoppingCriteria
+
+_OPENING = {")": "(", "]": "[", "}": "{"}
+# Dataset targets are often fragments continuing an earlier statement
+_FRAGMENT_HEADS = {
+    "elif": "if True:\n    pass\n",
+    "else": "if True:\n    pass\n",
+    "except": "try:\n    pass\n",
+    "finally": "try:\n    pass\n",
+}
+_FIRST_WORD = re.compile(r"\s*([A-Za-z_]+)")
+
+
+@lru_cache(maxsize=4096)
+def is_valid_python(code: str) -> bool:
+    """Whether code parses, accepting fragments such as an indented body or an else: branch"""
+    code = textwrap.dedent(code)
+    if not code.strip():
+        return False
+    try:
+        ast.parse(code)
+        return True
+    except SyntaxError:
+        pass
+    match = _FIRST_WORD.match(code)
+    head = _FRAGMENT_HEADS.get(match.group(1)) if match else None
+    if head is None:
+        return False
+    try:
+        ast.parse(head + code)
+        return True
+    except SyntaxError:
+        return False
+
+
+def looks_like_code(code: str) -> bool:
+    """
+    Whether code is valid Python that does something: degenerate output such as
+    a lone identifier or constant parses too, but only as bare expressions
+    """
+    if not is_valid_python(code):
+        return False
+    try:
+        tree = ast.parse(textwrap.dedent(code))
+    except SyntaxError:
+        # A fragment starting with elif/else/except/finally
+        return True
+    return any(
+        not isinstance(node, ast.Expr) or isinstance(node.value, (ast.Call, ast.Await, ast.Yield, ast.YieldFrom))
+        for node in tree.body
+    )
+
+
+class PythonPrefixState:
+    """Incremental lexer state of a partial Python program"""
+
+    __slots__ = (
+        "brackets", "string", "string_tail", "escape", "empty_quote", "comment",
+        "indents", "indent", "line_started", "after_colon", "last_char", "lines",
+    )
+
+    def __init__(self):
+        self.brackets: List[str] = []
+        self.string: Optional[str] = None  # open quote: ', ", ''' or """
+        self.string_tail = ""
+        self.escape = False
+        self.empty_quote: Optional[str] = None  # just closed '' or "", a third quote opens a triple string
+        self.comment = False
+        self.indents: List[int] = []  # open indentation levels, set by the first line
+        self.indent = 0  # indentation of the current line so far
+        self.line_started = False
+        self.after_colon = False  # the previous logical line opened a block
+        self.last_char = ""
+        self.lines = 0
+
+    def copy(self) -> "PythonPrefixState":
+        state = PythonPrefixState.__new__(PythonPrefixState)
+        for name in self.__slots__:
+            setattr(state, name, getattr(self, name))
+        state.brackets = list(self.brackets)
+        state.indents = list(self.indents)
+        return state
+
+    def feed(self, text: str) -> bool:
+        """Advance over text; False if the program can no longer be valid Python"""
+        for ch in text:
+            if not self._feed_char(ch):
+                return False
+        return True
+
+    def can_end(self) -> bool:
+        """Whether the program may stop here (lexically; see is_valid_python for the full check)"""
+        return (
+            self.lines + self.line_started > 0
+            and self.string is None
+            and not self.brackets
+            and self.last_char != "\\"
+            and not self.after_colon
+            and not (self.line_started and self.last_char == ":")
+        )
+
+    def _feed_char(self, ch: str) -> bool:
+        if self.comment:
+            if ch == "\n":
+                self.comment = False
+                return self._newline()
+            return True
+
+        if self.string is not None:
+            return self._feed_string(ch)
+
+        if ch == "\n":
+            return self._newline()
+        if ch in " \t":
+            if not self.line_started and not self.brackets:
+                self.indent += 4 if ch == "\t" else 1
+            self.empty_quote = None
+            return True
+        if ch == "#":
+            self.comment = True
+            return True
+        if ch == "�":
+            # Part of a multi-byte character: only possible inside strings and comments
+            return False
+
+        if not self.line_started and not self.brackets:
+            if not self._start_line():
+                return False
+
+        if ch in "([{":
+            self.brackets.append(ch)
+        elif ch in _OPENING:
+            if not self.brackets or self.brackets[-1] != _OPENING[ch]:
+                return False
+            self.brackets.pop()
+        elif ch in "'\"":
+            if self.empty_quote == ch:
+                self.string = ch * 3
+                self.string_tail = ""
+            else:
+                self.string = ch
+                self.string_tail = ""
+            self.empty_quote = None
+            self.last_char = ch
+            return True
+
+        self.empty_quote = None
+        self.last_char = ch
+        return True
+
+    def _feed_string(self, ch: str) -> bool:
+        if self.escape:
+            self.escape = False
+            self.string_tail += "x"
+            return True
+        if ch == "\\":
+            self.escape = True
+            return True
+
+        quote = self.string
+        if len(quote) == 3:
+            self.string_tail = (self.string_tail + ch)[-3:]
+            if self.string_tail == quote:
+                self.string = None
+                self.last_char = ch
+            return True
+
+        if ch == quote:
+            self.empty_quote = ch if not self.string_tail else None
+            self.string = None
+            self.last_char = ch
+            return True
+        if ch == "\n":
+            # Unterminated single-quoted string
+            return False
+        self.string_tail = ch
+        return True
+
+    def _start_line(self) -> bool:
+        """Check the indentation of the line that starts now"""
+        self.line_started = True
+        indent = self.indent
+        if not self.indents:
+            # The first line sets the base level (fragments may start inside a block)
+            self.indents.append(indent)
+            self.after_colon = False
+            return True
+
+        if self.after_colon:
+            self.after_colon = False
+            if indent <= self.indents[-1]:
+                return False  # a block needs an indented body
+            self.indents.append(indent)
+            return True
+
+        if indent > self.indents[-1]:
+            return False  # unexpected indent
+        while len(self.indents) > 1 and indent < self.indents[-1]:
+            self.indents.pop()
+        if indent < self.indents[-1]:
+            # Below the base level of a fragment: the fragment started inside a block
+            self.indents[-1] = indent
+        return indent == self.indents[-1]
+
+    def _newline(self) -> bool:
+        self.empty_quote = None
+        if self.brackets:
+            return True  # implicit line joining
+        if self.last_char == "\\":
+            self.last_char = " "  # explicit line joining
+            return True
+        if self.line_started:
+            self.after_colon = self.last_char == ":"
+            self.lines += 1
+        self.line_started = False
+        self.indent = 0
+        return True
+
+
+@lru_cache(maxsize=8)
+def token_pieces(tokenizer) -> Tuple[Tuple[str, ...], frozenset]:
+    """Text of every vocabulary token (byte-level BPE aware) and the special token ids"""
+    special = frozenset(tokenizer.all_special_ids)
+    tokens = tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))
+    try:
+        from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+        byte_decoder = {char: byte for byte, char in bytes_to_unicode().items()}
+    except ImportError:
+        byte_decoder = None
+
+    pieces = []
+    for token_id, token in enumerate(tokens):
+        if token_id in special or token is None:
+            pieces.append("")
+        elif byte_decoder is not None and all(char in byte_decoder for char in token):
+            pieces.append(bytes(byte_decoder[char] for char in token).decode("utf-8", errors="replace"))
+        else:
+            pieces.append(tokenizer.convert_tokens_to_string([token]))
+    return tuple(pieces), special
+
+
+class _DecodedPrefixes:
+    """Text and lexer state of decoder prefixes, extended one token at a time"""
+
+    def __init__(self, pieces: Tuple[str, ...]):
+        self.pieces = pieces
+        self._cache: Dict[Tuple[int, ...], Tuple[str, Optional[PythonPrefixState]]] = {}
+
+    def get(self, row: List[int]) -> Tuple[str, Optional[PythonPrefixState]]:
+        key = tuple(row)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        parent = self._cache.get(key[:-1]) if key else None
+        if parent is None:
+            text, state = "", PythonPrefixState()
+            tokens = key
+        else:
+            text, state = parent
+            state = state.copy() if state is not None else None
+            tokens = key[-1:]
+
+        for token_id in tokens:
+            piece = self.pieces[token_id] if token_id < len(self.pieces) else ""
+            text += piece
+            if state is not None and not state.feed(piece):
+                state = None  # a token outside the checked top-k broke the grammar
+        self._cache[key] = (text, state)
+        return text, state
+
+
+class PythonGrammarLogitsProcessor(LogitsProcessor):
+    """Masks top-k candidates that would make the decoded program invalid Python"""
+
+    def __init__(self, tokenizer, top_k: int = 16):
+        self.pieces, self.special_ids = token_pieces(tokenizer)
+        self.eos_token_id = tokenizer.eos_token_id
+        self.top_k = top_k
+        self.prefixes = _DecodedPrefixes(self.pieces)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        k = min(self.top_k, scores.shape[-1])
+        candidates = scores.topk(k, dim=-1).indices.tolist()
+
+        for row_index, row in enumerate(input_ids.tolist()):
+            text, state = self.prefixes.get(row)
+            if state is None:
+                continue
+
+            invalid = []
+            for token_id in candidates[row_index]:
+                if token_id == self.eos_token_id:
+                    valid = state.can_end() and is_valid_python(text)
+                elif token_id in self.special_ids:
+                    valid = False
+                else:
+                    valid = state.copy().feed(self.pieces[token_id])
+                if not valid:
+                    invalid.append(token_id)
+
+            # If nothing in the top-k is valid, leave the row to the model rather than derail it
+            if invalid and len(invalid) < len(candidates[row_index]):
+                scores[row_index, invalid] = float("-inf")
+        return scores
+
+
+class StatementBlockStoppingCriteria(StoppingCriteria):
+    """Stops a sequence once a complete block is followed by a blank line, or its last line repeats"""
+
+    def __init__(self, tokenizer):
+        self.pieces, _ = token_pieces(tokenizer)
+        self.prefixes = _DecodedPrefixes(self.pieces)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        done = [self._complete(self.prefixes.get(row)[0]) for row in input_ids.tolist()]
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+    @staticmethod
+    def _complete(text: str) -> bool:
+        if text.endswith("\n\n"):
+            return is_valid_python(text)
+        lines = text.split("\n")[:-1]  # completed lines only
+        if len(lines) >= 2 and lines[-1].strip() and lines[-1] == lines[-2]:
+            return is_valid_python("\n".join(lines[:-1]))
+        return False
+
+
+def clean_generated_code(code: str) -> str:
+    """Drop what the stopping criteria leave behind: trailing blank lines and a repeated last line"""
+    lines = code.rstrip().split("\n")
+    while len(lines) >= 2 and lines[-1].strip() and lines[-1] == lines[-2]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+@torch.no_grad()
+def speculative_generate(
+    model,
+    tokenizer,
+    inputs: Dict,
+    draft: str,
+    generation_options: Dict,
+    max_rounds: int = 4
+) -> Tuple[List[int], int, int]:
+    """
+    Decode with a draft program as the guess for the model's output
+    Each round feeds the prefix plus the remaining draft through the decoder in
+    one forward pass and keeps the draft tokens the model would have picked
+    greedily. At the first disagreement the model's own token is kept, the
+    mismatched draft token is skipped (a substitution, e.g. another number) and
+    the rest of the draft is verified in the next round. Whatever the draft
+    doesn't cover is generated normally from the accepted prefix.
+    Returns (output ids, accepted draft tokens, rejected draft tokens).
+    """
+    eos_token_id = tokenizer.eos_token_id
+    max_length = generation_options.get("max_length", 128)
+    draft_ids = tokenizer(draft, add_special_tokens=False).input_ids
+    prefix = [model.config.decoder_start_token_id]
+    accepted = rejected = 0
+
+    for _ in range(max_rounds):
+        draft_ids = draft_ids[:max(0, max_length - len(prefix) - 1)]
+        if not draft_ids:
+            break
+        decoder_input_ids = torch.tensor([prefix + draft_ids], device=inputs["attention_mask"].device)
+        logits = model(**inputs, decoder_input_ids=decoder_input_ids).logits[0]
+        # predicted[i] is the model's choice where the draft has draft_ids[i]
+        predicted = logits[len(prefix) - 1:].argmax(dim=-1).tolist()
+
+        matched = 0
+        while matched < len(draft_ids) and predicted[matched] == draft_ids[matched]:
+            matched += 1
+        prefix += draft_ids[:matched]
+        accepted += matched
+        rejected += 1 if matched < len(draft_ids) else 0
+
+        next_token = predicted[matched]
+        if next_token == eos_token_id:
+            return prefix + [eos_token_id], accepted, rejected
+        prefix.append(next_token)
+        draft_ids = draft_ids[matched + 1:]
+
+    if len(prefix) >= max_length:
+        return prefix, accepted, rejected
+    decoder_input_ids = torch.tensor([prefix], device=inputs["attention_mask"].device)
+    output_ids = model.generate(**inputs, decoder_input_ids=decoder_input_ids, **generation_options)
+    return output_ids[0].tolist(), accepted, rejected
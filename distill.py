@@ -0,0 +1,252 @@
+"""
+Knowledge distillation of the fine-tuned CodeT5 model into a shallower student
+- The student keeps the teacher's encoder and an evenly spaced subset of its
+  decoder layers (decoding runs the decoder once per token, the encoder once)
+- Training data: lang_dataset.json pairs, the teacher's own outputs for them,
+  and number-swapped prompts labelled by the teacher (kept if they parse)
+- Loss: cross-entropy on the targets plus KL divergence to the teacher's
+  temperature-softened token distributions
+- The student is saved like the teacher, so it is a drop-in replacement:
+    CODELEX_MODEL_PATH=./kannada_python_t5_student python api.py
+
+Compare accuracy and latency of the two models with:
+    python benchmark.py compare --models ./kannada_python_t5_model ./kannada_python_t5_student
+
+Usage:
+    python distill.py --decoder-layers 2 --epochs 5
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Dict, List, Tuple
+
+try:
+    import torch
+    import torch.nn.functional as F
+    from transformers import AutoTokenizer, T5ForConditionalGeneration
+except ImportError as e:
+    print("❌ Required package missing:", e)
+    print("Install with: pip install transformers torch")
+    raise SystemExit(1)
+
+from decoding import is_valid_python
+
+TEACHER_PATH = "./kannada_python_t5_model"
+STUDENT_PATH = "./kannada_python_t5_student"
+DATA_PATH = "lang_dataset.json"
+
+_NUMBER = re.compile(r"\b\d+\b")
+
+
+def build_student(teacher: T5ForConditionalGeneration, decoder_layers: int) -> T5ForConditionalGeneration:
+    """
+    A copy of the teacher with decoder_layers decoder blocks, initialised from
+    evenly spaced teacher blocks (always the first, which holds the relative
+    position bias, and the last)
+    """
+    teacher_layers = teacher.config.num_decoder_layers
+    if not 1 <= decoder_layers <= teacher_layers:
+        raise ValueError(f"decoder_layers must be between 1 and {teacher_layers}")
+
+    if decoder_layers == 1:
+        kept = [0]
+    else:
+        kept = [round(i * (teacher_layers - 1) / (decoder_layers - 1)) for i in range(decoder_layers)]
+
+    config = teacher.config.to_dict()
+    config["num_decoder_layers"] = decoder_layers
+    student = T5ForConditionalGeneration(type(teacher.config).from_dict(config))
+
+    renamed = {f"decoder.block.{old}.": f"decoder.block.{new}." for new, old in enumerate(kept)}
+    state = {}
+    for key, value in teacher.state_dict().items():
+        if key.startswith("decoder.block."):
+            prefix = ".".join(key.split(".")[:3]) + "."
+            if prefix not in renamed:
+                continue
+            key = renamed[prefix] + key[len(prefix):]
+        state[key] = value
+    student.load_state_dict(state)
+    print(f"🎓 Student keeps teacher decoder layers {kept} of {teacher_layers}")
+    return student
+
+
+@torch.no_grad()
+def teacher_outputs(teacher, tokenizer, sources: List[str], batch_size: int, max_length: int) -> List[str]:
+    """The teacher's beam-search programs for a list of prompts"""
+    outputs = []
+    for start in range(0, len(sources), batch_size):
+        inputs = tokenizer(
+            sources[start:start + batch_size],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=max_length
+        )
+        output_ids = teacher.generate(**inputs, max_length=max_length, num_beams=4, early_stopping=True)
+        outputs += tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+    return outputs
+
+
+def swap_numbers(text: str, rng: random.Random) -> str:
+    """The prompt with every number replaced by another small number"""
+    return _NUMBER.sub(lambda match: str(rng.choice([n for n in range(1, 21) if str(n) != match.group()])), text)
+
+
+def build_examples(
+    records: List[Dict],
+    source_fields: List[str],
+    teacher,
+    tokenizer,
+    augment: int,
+    seed: int,
+    batch_size: int,
+    max_length: int
+) -> List[Tuple[str, str]]:
+    """Dataset pairs, teacher-labelled pairs and teacher-labelled augmentations, without duplicates"""
+    rng = random.Random(seed)
+    examples = []
+    for record in records:
+        code = (record.get("code") or "").rstrip()
+        for field in source_fields:
+            source = (record.get(field) or "").strip()
+            if source and code:
+                examples.append((source, code))
+    examples = list(dict.fromkeys(examples))
+    sources = list(dict.fromkeys(source for source, _ in examples))
+
+    # Number-swapped prompts only make sense where the prompt has numbers
+    augmented = []
+    for _ in range(augment):
+        augmented += [swap_numbers(source, rng) for source in sources if _NUMBER.search(source)]
+    augmented = [source for source in dict.fromkeys(augmented) if source not in sources]
+
+    print(f"🧑‍🏫 Labelling {len(sources)} prompts and {len(augmented)} augmentations with the teacher...")
+    started = time.perf_counter()
+    labelled = teacher_outputs(teacher, tokenizer, sources + augmented, batch_size, max_length)
+    print(f"   done in {time.perf_counter() - started:.1f}s")
+
+    valid = [
+        (source, code.rstrip())
+        for source, code in zip(sources + augmented, labelled)
+        if code.strip() and is_valid_python(code)
+    ]
+    examples = list(dict.fromkeys(examples + valid))
+    print(f"📚 {len(examples)} training pairs ({len(valid)} teacher-labelled)")
+    return examples
+
+
+def length_batches(examples: List[Tuple[str, str]], tokenizer, max_tokens: int, rng: random.Random) -> List[List[int]]:
+    """Indices of similar-length examples, about max_tokens padded tokens per batch, in shuffled order"""
+    lengths = [
+        len(tokenizer(source).input_ids) + len(tokenizer(text_target=code).input_ids)
+        for source, code in examples
+    ]
+    order = sorted(range(len(examples)), key=lambda i: (lengths[i], rng.random()))
+    batches, batch, longest = [], [], 0
+    for index in order:
+        if batch and (len(batch) + 1) * max(longest, lengths[index]) > max_tokens:
+            batches.append(batch)
+            batch, longest = [], 0
+        batch.append(index)
+        longest = max(longest, lengths[index])
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def distillation_loss(student_logits, teacher_logits, labels, ce_loss, alpha: float, temperature: float):
+    """alpha * cross-entropy + (1 - alpha) * T² * KL(teacher || student) over the target tokens"""
+    mask = labels != -100
+    kl = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=-1),
+        F.log_softmax(teacher_logits / temperature, dim=-1),
+        log_target=True,
+        reduction="none"
+    ).sum(-1)
+    kl = kl[mask].mean() * temperature ** 2
+    return alpha * ce_loss + (1 - alpha) * kl
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the fine-tuned CodeT5 model into a shallower student")
+    parser.add_argument("--teacher", default=TEACHER_PATH)
+    parser.add_argument("--output", default=STUDENT_PATH)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--source-fields", nargs="+", default=["text", "kannada text"],
+                        help="Prompt columns; ModelService feeds the model the English text")
+    parser.add_argument("--decoder-layers", type=int, default=2)
+    parser.add_argument("--augment", type=int, default=1, help="Number-swapped variants per prompt")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--learning-rate", type=float, default=3e-4)
+    parser.add_argument("--max-tokens", type=int, default=2048, help="Padded tokens per batch")
+    parser.add_argument("--alpha", type=float, default=0.5, help="Weight of the cross-entropy term")
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--max-length", type=int, default=128)
+    parser.add_argument("--label-batch-size", type=int, default=16, help="Prompts per teacher generate() call")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    rng = random.Random(args.seed)
+
+    print(f"📦 Loading teacher from {args.teacher}...")
+    tokenizer = AutoTokenizer.from_pretrained(args.teacher)
+    teacher = T5ForConditionalGeneration.from_pretrained(args.teacher).eval()
+    student = build_student(teacher, args.decoder_layers)
+
+    with open(args.data, encoding="utf-8") as f:
+        records = json.load(f)
+    examples = build_examples(
+        records, args.source_fields, teacher, tokenizer,
+        args.augment, args.seed, args.label_batch_size, args.max_length
+    )
+
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.learning_rate, weight_decay=0.01)
+    student.train()
+    for epoch in range(1, args.epochs + 1):
+        batches = length_batches(examples, tokenizer, args.max_tokens, rng)
+        rng.shuffle(batches)
+        started = time.perf_counter()
+        total_loss = 0.0
+        for batch in batches:
+            inputs = tokenizer(
+                [examples[i][0] for i in batch],
+                text_target=[examples[i][1] for i in batch],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=args.max_length
+            )
+            labels = inputs.pop("labels")
+            labels[labels == tokenizer.pad_token_id] = -100
+
+            with torch.no_grad():
+                teacher_logits = teacher(**inputs, labels=labels).logits
+            output = student(**inputs, labels=labels)
+            loss = distillation_loss(output.logits, teacher_logits, labels, output.loss, args.alpha, args.temperature)
+
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(student.parameters(), 1.0)
+            optimizer.step()
+            optimizer.zero_grad()
+            total_loss += loss.item()
+
+        elapsed = time.perf_counter() - started
+        print(f"⏱️  Epoch {epoch}: loss {total_loss / len(batches):.4f}, "
+              f"{len(examples) / elapsed:.1f} samples/s")
+
+    # Save student + tokenizer in the teacher's format
+    student.eval()
+    student.save_pretrained(args.output)
+    tokenizer.save_pretrained(args.output)
+    print(f"✅ Student saved to '{args.output}'")
+    print(f"💡 Serve it with CODELEX_MODEL_PATH={args.output}, compare it with "
+          f"python benchmark.py compare --models {args.teacher} {args.output}")
+
+
+if __name__ == "__main__":
+    main()
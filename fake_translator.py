@@ -0,0 +1,142 @@
+"""
+Fake Google Translate server for Codelex
+Answers the requests translator_client.GoogleTranslateClient sends, with
+injectable latency and failures, to test the translator deadline,
+circuit breaker and hedging without network access:
+- Dataset prompts get their English text, anything else the offline glossary
+- --latency-ms / --jitter-ms delay every answer
+- --error-rate answers 500, --rate-limit-rate answers 429,
+  --hang-rate holds the connection for --hang-seconds
+- GET /_faults?error_rate=1&latency_ms=0 changes the faults while running,
+  GET /_stats returns request counts
+
+Usage:
+    python fake_translator.py --port 8089 --latency-ms 200 --error-rate 0.2
+    CODELEX_TRANSLATOR_URL=http://localhost:8089/ python api.py
+"""
+
+import argparse
+import html
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from caching import normalize_text
+from offline_translator import OfflineTranslator
+
+FAULT_FIELDS = {
+    "latency_ms": float, "jitter_ms": float, "error_rate": float,
+    "rate_limit_rate": float, "hang_rate": float, "hang_seconds": float,
+}
+
+
+class FakeTranslatorHandler(BaseHTTPRequestHandler):
+    """Request handler; configuration lives on the server object"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/_faults":
+            faults = self.server.faults
+            for key, cast in FAULT_FIELDS.items():
+                if key in params:
+                    faults[key] = cast(params[key])
+            return self._send(200, json.dumps(faults), "application/json")
+        if url.path == "/_stats":
+            return self._send(200, json.dumps(self.server.stats), "application/json")
+
+        faults = self.server.faults
+        self._count("requests")
+        roll = random.random()
+        if roll < faults["hang_rate"]:
+            self._count("hung")
+            time.sleep(faults["hang_seconds"])
+            return self._send(504, "timeout")
+
+        time.sleep(max(0.0, faults["latency_ms"] + random.uniform(-1, 1) * faults["jitter_ms"]) / 1000)
+        roll -= faults["hang_rate"]
+        if roll < faults["error_rate"]:
+            self._count("errors")
+            return self._send(500, "injected error")
+        roll -= faults["error_rate"]
+        if roll < faults["rate_limit_rate"]:
+            self._count("rate_limited")
+            return self._send(429, "too many requests")
+
+        text = params.get("q", "")
+        translation = self.server.phrases.get(normalize_text(text))
+        if translation is None:
+            translation = self.server.translator.translate(text).text
+        self._count("translated")
+        self._send(200, f'<html><body><div class="result-container">{html.escape(translation)}</div></body></html>')
+
+    def _count(self, key: str):
+        with self.server.stats_lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def _send(self, status: int, body: str, content_type: str = "text/html; charset=utf-8"):
+        data = body.encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. its deadline passed)
+            pass
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(host: str, port: int, dataset_path: str, faults: dict, verbose: bool = False) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), FakeTranslatorHandler)
+    server.daemon_threads = True
+    server.faults = faults
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    server.verbose = verbose
+
+    with open(dataset_path, encoding="utf-8") as f:
+        records = json.load(f)
+    server.phrases = {
+        normalize_text(record["kannada text"]): record["text"]
+        for record in records
+        if record.get("kannada text") and record.get("text")
+    }
+    server.translator = OfflineTranslator.from_dataset(dataset_path)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Google Translate server with fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--dataset", default="lang_dataset.json")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before every answer")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random +/- variation of the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of requests held for --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    faults = {key: getattr(args, key) for key in FAULT_FIELDS}
+    server = create_server(args.host, args.port, args.dataset, faults, args.verbose)
+    print(f"🌐 Fake translator on http://{args.host}:{args.port}/ with faults {faults}")
+    print(f"💡 Point the API at it with CODELEX_TRANSLATOR_URL=http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Fake translator stopped")
+
+
+if __name__ == "__main__":
+    main()
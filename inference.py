@@ -1,25 +1,201 @@
+"""
+Run the fine-tuned model from the command line.
+- Interactive (default): translate one Kannada instruction and generate its code
+- Batch: read a JSON array or JSON Lines file (or stdin with --input -), generate
+  in batches, write one JSON line per prompt as soon as its batch finishes and
+  report exact match, BLEU against the "code" field, and throughput
+
+Usage:
+    python inference.py
+    python inference.py --input lang_dataset.json --batch-size 16 --output predictions.jsonl
+    cat prompts.jsonl | python inference.py --input - --field text > predictions.jsonl
+"""
+
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from collections import Counter
+
 from transformers import AutoTokenizer, T5ForConditionalGeneration
-from deep_translator import GoogleTranslator
 
 MODEL_PATH = "./kannada_python_t5_model"
+# Prompt fields tried in order when --field isn't given
+INPUT_FIELDS = ("kannada text", "text", "inputText", "body")
+
+_CODE_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+tokenizer = None
+model = None
+
+
+def load_model(model_path=MODEL_PATH):
+    global tokenizer, model
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = T5ForConditionalGeneration.from_pretrained(model_path).eval()
+
 
-# Load tokenizer and model
-tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-model = T5ForConditionalGeneration.from_pretrained(MODEL_PATH)
 def translate_kannada_to_english(kannada_text):
+    from deep_translator import GoogleTranslator
     return GoogleTranslator(source='kn', target='en').translate(kannada_text)
 
+
 def generate_code(kannada_instruction):
-    inputs = tokenizer(kannada_instruction, return_tensors="pt", truncation=True, max_length=128)
-    output_ids = model.generate(**inputs, max_length=128, num_beams=4)
-    code = tokenizer.decode(output_ids[0], skip_special_tokens=True)
-    return code
+    return generate_codes([kannada_instruction])[0]
 
-if __name__ == "__main__":
+
+def generate_codes(instructions, num_beams=4):
+    """Generate code for several instructions in one padded generate() call"""
+    inputs = tokenizer(instructions, return_tensors="pt", padding=True, truncation=True, max_length=128)
+    output_ids = model.generate(**inputs, max_length=128, num_beams=num_beams)
+    return tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+
+
+def iter_records(path):
+    """Records of a JSON array or JSON Lines file; "-" reads stdin"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        first = ""
+        while not first:
+            first = stream.read(1)
+            if not first:
+                return
+            if first.isspace():
+                first = ""
+        if first == "[":
+            yield from json.loads(first + stream.read())
+            return
+        # JSON Lines: one record per line, read as it arrives
+        yield json.loads(first + stream.readline())
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def iter_batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BleuScore:
+    """Corpus BLEU-4 over code tokens (identifiers, numbers and single symbols)"""
+
+    def __init__(self, max_order=4):
+        self.max_order = max_order
+        self.matches = [0] * max_order
+        self.totals = [0] * max_order
+        self.hypothesis_length = 0
+        self.reference_length = 0
+
+    def add(self, hypothesis, reference):
+        hypothesis = _CODE_TOKEN.findall(hypothesis)
+        reference = _CODE_TOKEN.findall(reference)
+        self.hypothesis_length += len(hypothesis)
+        self.reference_length += len(reference)
+        for n in range(1, self.max_order + 1):
+            hypothesis_ngrams = Counter(tuple(hypothesis[i:i + n]) for i in range(len(hypothesis) - n + 1))
+            reference_ngrams = Counter(tuple(reference[i:i + n]) for i in range(len(reference) - n + 1))
+            self.matches[n - 1] += sum((hypothesis_ngrams & reference_ngrams).values())
+            self.totals[n - 1] += max(len(hypothesis) - n + 1, 0)
+
+    def score(self):
+        if not self.hypothesis_length:
+            return 0.0
+        # +1 smoothing keeps short programs from zeroing the higher orders
+        log_precision = sum(
+            math.log((matches + 1) / (total + 1)) for matches, total in zip(self.matches, self.totals)
+        ) / self.max_order
+        brevity = min(0.0, 1 - self.reference_length / self.hypothesis_length)
+        return 100 * math.exp(log_precision + brevity)
+
+
+def run_batch(args):
+    """Generate code for every record of args.input, streaming JSON lines to args.output"""
+    output = sys.stdout if args.output in (None, "-") else open(args.output, "w", encoding="utf-8")
+    bleu = BleuScore()
+    exact = scored = processed = skipped = 0
+    started = time.perf_counter()
+
+    try:
+        for batch in iter_batches(iter_records(args.input), args.batch_size):
+            prompts = []
+            for record in batch:
+                field = args.field or next((name for name in INPUT_FIELDS if record.get(name)), None)
+                prompts.append(record.get(field) if field else None)
+
+            valid = [i for i, prompt in enumerate(prompts) if prompt]
+            codes = dict(zip(valid, generate_codes([prompts[i] for i in valid], args.num_beams))) if valid else {}
+
+            for i, record in enumerate(batch):
+                index = processed + i
+                if i not in codes:
+                    skipped += 1
+                    output.write(json.dumps({"index": index, "error": "no input text"}) + "\n")
+                    continue
+                result = {"index": index, "input": prompts[i], "code": codes[i]}
+                reference = record.get("code")
+                if reference is not None:
+                    result["exact_match"] = codes[i].rstrip() == reference.rstrip()
+                    exact += result["exact_match"]
+                    scored += 1
+                    bleu.add(codes[i], reference)
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+            output.flush()
+            processed += len(batch)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ {processed} prompts in {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.2f} prompts/s, batch size {args.batch_size})", file=sys.stderr)
+    if skipped:
+        print(f"⚠️  {skipped} records had no input text", file=sys.stderr)
+    if scored:
+        print(f"🎯 Exact match {exact / scored:.2%}, BLEU {bleu.score():.2f} over {scored} references", file=sys.stderr)
+
+
+def run_interactive():
     kannada_text = input("Enter Kannada instruction: ")
     english_text = translate_kannada_to_english(kannada_text)
     print("\n🔎 Translated to English:\n", english_text)
     
     python_code = generate_code(kannada_text)
     print("\nGenerated Python code:\n")
-    print(python_code)
\ No newline at end of file
+    print(python_code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate Python code with the fine-tuned model")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--input", default=None,
+                        help="JSON or JSON Lines file of prompts ('-' for stdin); interactive when omitted")
+    parser.add_argument("--output", default=None, help="JSON Lines results (default: stdout)")
+    parser.add_argument("--field", default=None,
+                        help=f"Prompt field (default: the first of {', '.join(INPUT_FIELDS)} present)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--num-beams", type=int, default=4)
+    args = parser.parse_args()
+
+    # Load tokenizer and model
+    load_model(args.model)
+
+    if args.input is None:
+        run_interactive()
+    else:
+        run_batch(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Inference worker pool for Codelex
+Runs blocking pipeline work (model generation, translation calls)
+off the asyncio event loop:
+- Fixed number of worker threads
+- Bounded queue of pending jobs
+- Fails fast when saturated so the API can answer 503 + Retry-After
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the pool is running and queueing as many jobs as it allows"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferencePool:
+    """Thread pool with a bounded backlog for running the processing pipeline"""
+
+    def __init__(self, max_workers: int = None, max_queue: int = None, retry_after: int = None):
+        self.max_workers = max_workers or int(os.getenv("CODELEX_INFERENCE_WORKERS", "4"))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("CODELEX_INFERENCE_QUEUE", "32"))
+        self.retry_after = retry_after or int(os.getenv("CODELEX_RETRY_AFTER", "2"))
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="codelex-inference"
+        )
+        # One slot per running job plus one per queued job
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._pending = 0
+
+    def _submit(self, fn: Callable[..., Any], *args, **kwargs) -> "Future":
+        """Reserve a slot and schedule fn on a worker thread"""
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturatedError(self.retry_after)
+
+        with self._lock:
+            self._pending += 1
+
+        def job():
+            with self._lock:
+                self._pending -= 1
+                self._active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                self._slots.release()
+
+        try:
+            return self._executor.submit(job)
+        except RuntimeError:
+            # Executor rejected the job (shutting down) - give the slot back
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+            raise
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) on a worker thread and await its result"""
+        return await asyncio.wrap_future(self._submit(fn, *args, **kwargs))
+
+    def iterate(self, fn: Callable[..., Iterator], *args, **kwargs) -> AsyncIterator:
+        """
+        Run the generator fn(*args, **kwargs) on a worker thread
+        Returns an async iterator over its items; the pool slot is reserved
+        immediately so saturation is reported before streaming starts
+        """
+        loop = asyncio.get_running_loop()
+        items: "asyncio.Queue" = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def deliver(message):
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, message)
+            except RuntimeError:
+                # Event loop already closed - nobody is listening any more
+                cancelled.set()
+
+        def produce():
+            generator = fn(*args, **kwargs)
+            try:
+                for item in generator:
+                    if cancelled.is_set():
+                        return
+                    deliver((False, item))
+            except Exception as e:
+                deliver((True, e))
+            else:
+                deliver((True, None))
+            finally:
+                generator.close()
+
+        self._submit(produce)
+
+        async def consume():
+            try:
+                while True:
+                    finished, value = await items.get()
+                    if finished:
+                        if value is not None:
+                            raise value
+                        return
+                    yield value
+            finally:
+                # Stop the producer early if the consumer goes away
+                cancelled.set()
+
+        return consume()
+
+    def stats(self) -> Dict[str, int]:
+        """Current pool utilisation"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._pending,
+            }
+
+    def shutdown(self):
+        """Stop accepting jobs and wait for running ones"""
+        self._executor.shutdown(wait=True)
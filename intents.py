@@ -0,0 +1,296 @@
+"""
+Intent detection for Codelex
+Parses an English description once into an intent plus its arguments,
+so pseudo-code and Python code are rendered from the same parse:
+- Declarative rule table, checked in order (most specific first)
+- One combined regex pass collects keywords and numbers
+- Numbers may be digits or simple English number words
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import FrozenSet, List, Optional, Tuple
+
+_NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17,
+    "eighteen": 18, "nineteen": 19, "twenty": 20, "thirty": 30, "forty": 40,
+    "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+# Multiplies the number before it: "two hundred" is 200, a bare "hundred" 100
+_SCALE_WORDS = {"hundred": 100, "thousand": 1000}
+
+
+@dataclass(frozen=True)
+class IntentRule:
+    """
+    One row of the rule table
+    - any_of: groups of keywords; every group needs at least one match
+    - min_numbers: numeric arguments the intent needs
+    - needs_variable: the intent needs a variable name
+    The first rule whose keywords match decides: if its arguments are missing
+    there is no intent (the model is used), less specific rules are not tried
+    """
+    name: str
+    any_of: Tuple[FrozenSet[str], ...]
+    min_numbers: int = 0
+    needs_variable: bool = False
+
+
+def _rule(name: str, *groups: str, **options) -> IntentRule:
+    return IntentRule(name=name, any_of=tuple(frozenset(group.split()) for group in groups), **options)
+
+
+INTENT_RULES: List[IntentRule] = [
+    _rule("fibonacci", "fibonacci"),
+    _rule("factorial", "factorial"),
+    _rule("sum", "sum total amount", "calculate find compute"),
+    # Assignment verbs are stronger signals than the "to" of a loop range
+    _rule("assign", "assign assigned store stored put set collect", min_numbers=1, needs_variable=True),
+    _rule("loop", "loop iterate repeat from to between through", min_numbers=2),
+    _rule("print", "print display show"),
+]
+
+# Keywords that only set flags on the parsed intent
+_FLAG_WORDS = {"even", "equal", "odd", "hello", "world"}
+
+_KEYWORDS = sorted(
+    {word for rule in INTENT_RULES for group in rule.any_of for word in group} | _FLAG_WORDS,
+    key=len,
+    reverse=True
+)
+_NUMBER_WORD_PATTERN = "|".join(sorted(_NUMBER_WORDS, key=len, reverse=True))
+_SCALE_WORD_PATTERN = "|".join(_SCALE_WORDS)
+# "seventy-three", "two hundred and seventy-three", "one thousand five hundred"
+_NUMBER_PHRASE_PATTERN = (
+    rf"(?:(?:{_NUMBER_WORD_PATTERN})(?:-(?:{_NUMBER_WORD_PATTERN}))?|{_SCALE_WORD_PATTERN})"
+    rf"(?:(?:\s+and)?[\s-]+(?:(?:{_NUMBER_WORD_PATTERN})(?:-(?:{_NUMBER_WORD_PATTERN}))?|{_SCALE_WORD_PATTERN}))*"
+)
+
+_TOKEN_PATTERN = re.compile(
+    r"\b(?:(?P<digits>\d+)"
+    rf"|(?P<number_word>{_NUMBER_PHRASE_PATTERN})"
+    rf"|(?P<keyword>{'|'.join(_KEYWORDS)}))\b",
+    re.IGNORECASE
+)
+_VARIABLE_PATTERN = re.compile(r"\bvariable\s+(?:(?:called|named)\s+)?([A-Za-z]\w*)", re.IGNORECASE)
+# Words that follow "variable" without naming it ("the A variable is the largest")
+_NOT_NAMES = {
+    "is", "to", "and", "or", "if", "the", "in", "of", "that", "which",
+    "until", "with", "for", "as", "should", "must", "variable",
+}
+_LETTER_PATTERN = re.compile(r"\b[A-Z]\b")
+# "A number ..." / "I want ..." at the start of a sentence is a word, not a variable
+_SENTENCE_START_WORD = re.compile(r"(?:^|[.!?]\s+)\s*$")
+_LOWERCASE_WORD = re.compile(r"\s+[a-z]")
+
+
+@dataclass
+class Intent:
+    """Result of parsing an English description"""
+    name: Optional[str]
+    numbers: List[str] = field(default_factory=list)
+    keywords: FrozenSet[str] = frozenset()
+    variable: Optional[str] = None
+
+    def has(self, *words: str) -> bool:
+        return any(word in self.keywords for word in words)
+
+
+def _number_word_values(phrase: str) -> List[int]:
+    """Values of a run of number words: "two hundred and seventy-three" is one number, "one two" two"""
+    values, total, current, last = [], 0, 0, None
+    for word in re.split(r"[\s-]+", phrase.lower()):
+        if word == "and":
+            continue
+        if word in _SCALE_WORDS:
+            total += (current or 1) * _SCALE_WORDS[word]
+            current, last = 0, "scale"
+            continue
+        value = _NUMBER_WORDS[word]
+        # "twenty three" and "hundred five" continue a number, "three four" does not
+        continues = last == "scale" or (last == "tens" and value < 10) or last is None
+        if not continues:
+            values.append(total + current)
+            total, current = 0, 0
+        current += value
+        last = "tens" if value >= 20 and value % 10 == 0 else "unit"
+    values.append(total + current)
+    return values
+
+
+def _find_variable(english_text: str) -> Optional[str]:
+    """The name after "variable", else the first single capital letter that isn't an article"""
+    for match in _VARIABLE_PATTERN.finditer(english_text):
+        if match.group(1).lower() not in _NOT_NAMES:
+            return match.group(1)
+    for match in _LETTER_PATTERN.finditer(english_text):
+        if (match.group() in "AI"
+                and _SENTENCE_START_WORD.search(english_text, 0, match.start())
+                and _LOWERCASE_WORD.match(english_text, match.end())):
+            continue
+        return match.group()
+    return None
+
+
+def parse_intent(english_text: str) -> Intent:
+    """Classify an English description and extract its arguments in one pass"""
+    keywords = set()
+    numbers = []
+
+    for match in _TOKEN_PATTERN.finditer(english_text):
+        if match.group("digits"):
+            numbers.append(match.group("digits"))
+        elif match.group("number_word"):
+            numbers += [str(value) for value in _number_word_values(match.group("number_word"))]
+        else:
+            keywords.add(match.group("keyword").lower())
+
+    variable = _find_variable(english_text)
+
+    name = None
+    for rule in INTENT_RULES:
+        if not all(keywords & group for group in rule.any_of):
+            continue
+        if len(numbers) >= rule.min_numbers and (variable or not rule.needs_variable):
+            name = rule.name
+        break
+
+    return Intent(name=name, numbers=numbers, keywords=frozenset(keywords), variable=variable)
+
+
+def render_pseudo_code(intent: Intent) -> List[str]:
+    """Pseudo-code lines for a parsed intent (empty when there is no template)"""
+    numbers = intent.numbers
+
+    if intent.name == "loop":
+        start, end = numbers[0], numbers[1]
+        lines = [f"FOR i FROM {start} TO {end}"]
+        if intent.has("even", "equal"):
+            lines += ["    IF i MOD 2 EQUALS 0 THEN", "        PRINT i", "    END IF"]
+        elif intent.has("odd"):
+            lines += ["    IF i MOD 2 NOT EQUALS 0 THEN", "        PRINT i", "    END IF"]
+        else:
+            lines.append("    PRINT i")
+        lines.append("END FOR")
+        return lines
+
+    if intent.name == "sum":
+        if len(numbers) >= 2:
+            return [
+                "SET sum = 0",
+                f"FOR i FROM {numbers[0]} TO {numbers[1]}",
+                "    SET sum = sum + i",
+                "END FOR",
+                "PRINT sum",
+            ]
+        return ["SET total = 0", "PRINT total"]
+
+    if intent.name == "fibonacci":
+        count = numbers[0] if numbers else "10"
+        return [
+            "SET a = 0, b = 1",
+            "PRINT a, b",
+            f"FOR i FROM 3 TO {count}",
+            "    SET c = a + b",
+            "    PRINT c",
+            "    SET a = b, b = c",
+            "END FOR",
+        ]
+
+    if intent.name == "factorial":
+        num = numbers[0] if numbers else "5"
+        return [
+            "SET factorial = 1",
+            f"FOR i FROM 1 TO {num}",
+            "    SET factorial = factorial * i",
+            "END FOR",
+            "PRINT factorial",
+        ]
+
+    if intent.name == "print":
+        if intent.has("hello", "world"):
+            return ['PRINT "Hello, World!"']
+        return ["PRINT output"]
+
+    if intent.name == "assign":
+        return [f"SET {intent.variable} = {numbers[0]}"]
+
+    return []
+
+
+def render_python_code(intent: Intent) -> List[str]:
+    """Python code lines for a parsed intent (empty when the model should be used)"""
+    numbers = intent.numbers
+
+    if intent.name == "sum":
+        if len(numbers) >= 2:
+            start, end = numbers[0], numbers[1]
+            return [
+                "sum = 0",
+                f"for i in range({start}, {int(end)+1}):",
+                "    sum += i",
+                "print(sum)",
+            ]
+        # Generic sum
+        return ["total = 0", "# Add your numbers here", "print(total)"]
+
+    if intent.name == "loop":
+        start, end = numbers[0], numbers[1]
+        lines = [f"for i in range({start}, {int(end)+1}):"]
+        if intent.has("even", "equal"):
+            lines += ["    if i % 2 == 0:", "        print(i)"]
+        elif intent.has("odd"):
+            lines += ["    if i % 2 != 0:", "        print(i)"]
+        else:
+            lines.append("    print(i)")
+        return lines
+
+    if intent.name == "fibonacci":
+        count = numbers[0] if numbers else "10"
+        return [
+            "a, b = 0, 1",
+            "print(a, b)",
+            f"for i in range(3, {int(count)+1}):",
+            "    c = a + b",
+            "    print(c)",
+            "    a, b = b, c",
+        ]
+
+    if intent.name == "factorial":
+        num = numbers[0] if numbers else "5"
+        return [
+            "factorial = 1",
+            f"for i in range(1, {int(num)+1}):",
+            "    factorial *= i",
+            "print(factorial)",
+        ]
+
+    if intent.name == "print":
+        if intent.has("hello", "world"):
+            return ['print("Hello, World!")']
+        return ['print("Output")']
+
+    if intent.name == "assign":
+        return [f"{intent.variable} = {numbers[0]}"]
+
+    return []
+
+
+def draft_python_code(intent: Intent) -> str:
+    """
+    Opening of the program for an intent the templates can't render, used as a
+    draft the model verifies instead of decoding it token by token ("" when the
+    keywords suggest nothing)
+    """
+    if intent.name is not None:
+        return ""
+
+    if intent.has("loop", "iterate", "repeat") and len(intent.numbers) == 1:
+        return f"for i in range({intent.numbers[0]}):\n"
+    if intent.has("assign", "store") and intent.variable:
+        return f"{intent.variable} = "
+    if intent.has("sum", "total"):
+        return "total = 0\n"
+    return ""
@@ -0,0 +1,199 @@
+"""
+Metrics for Codelex
+Minimal in-process metrics rendered in the Prometheus text format:
+- Counter: monotonically increasing values, optionally labelled
+- Summary: latency quantiles (p50/p95/p99) over a sliding window, plus sum/count
+- CallbackMetric: gauge or counter values read from a function at scrape time
+- StageTimer: times pipeline stages into a Summary and a per-request dict
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Counter with optional labels"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labels, values)} {value}"
+                for values, value in sorted(self._values.items())
+            ]
+
+
+class Summary:
+    """Latency summary with quantiles over the most recent observations"""
+
+    type_name = "summary"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), window: int = 2048):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.window = window
+        self._observations: Dict[Tuple[str, ...], deque] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+        self._counts: Dict[Tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            if label_values not in self._observations:
+                self._observations[label_values] = deque(maxlen=self.window)
+                self._sums[label_values] = 0.0
+                self._counts[label_values] = 0
+            self._observations[label_values].append(value)
+            self._sums[label_values] += value
+            self._counts[label_values] += 1
+
+    def quantiles(self, *label_values: str) -> Dict[float, float]:
+        with self._lock:
+            ordered = sorted(self._observations.get(label_values, ()))
+        if not ordered:
+            return {}
+        return {q: ordered[min(int(q * len(ordered)), len(ordered) - 1)] for q in QUANTILES}
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values in sorted(self._observations):
+            for q, value in self.quantiles(*values).items():
+                quantile = 'quantile="%s"' % q
+                lines.append(f"{self.name}{_format_labels(self.labels, values, quantile)} {value}")
+            labels = _format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {self._sums[values]}")
+            lines.append(f"{self.name}_count{labels} {self._counts[values]}")
+        return lines
+
+
+class CallbackMetric:
+    """Metric whose labelled values come from a callback at scrape time"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Dict[Tuple[str, ...], float]],
+        labels: Sequence[str] = (),
+        type_name: str = "gauge"
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.callback = callback
+        self.type_name = type_name
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+            for label_values, value in sorted(values.items())
+        ]
+
+
+class Registry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Summary(
+    "codelex_stage_latency_seconds", "Time spent in each pipeline stage", ["stage", "mode"]
+))
+PIPELINE_RUNS = REGISTRY.register(Counter(
+    "codelex_pipeline_runs_total", "Inputs processed by the pipeline", ["mode"]
+))
+TRANSLATIONS = REGISTRY.register(Counter(
+    "codelex_translations_total", "Translations by source (exemplar, cache, offline, remote, hedged, fallback)", ["source"]
+))
+CODE_GENERATIONS = REGISTRY.register(Counter(
+    "codelex_code_generations_total", "Generated programs by source (exemplar, template, model, model_draft, model_error)", ["source"]
+))
+DECODING_TIERS = REGISTRY.register(Counter(
+    "codelex_decoding_tier_total",
+    "Model outputs by decoding tier (greedy, grammar, beam) and result (valid, invalid, truncated)",
+    ["tier", "outcome"]
+))
+DRAFT_TOKENS = REGISTRY.register(Counter(
+    "codelex_draft_tokens_total", "Draft tokens checked by the model (accepted, rejected)", ["outcome"]
+))
+REMOTE_CALLS = REGISTRY.register(Counter(
+    "codelex_remote_calls_total", "Remote service calls by outcome (success, failure, timeout, rejected, hedged)",
+    ["service", "outcome"]
+))
+HTTP_LATENCY = REGISTRY.register(Summary(
+    "codelex_http_request_duration_seconds", "HTTP request latency by route", ["method", "path"]
+))
+
+
+class StageTimer:
+    """Times pipeline stages, recording them in STAGE_LATENCY and in timings (ms)"""
+
+    def __init__(self, mode: str = "single"):
+        self.mode = mode
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def __call__(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            STAGE_LATENCY.observe(elapsed, stage, self.mode)
+            self.timings[stage] = round(self.timings.get(stage, 0.0) + elapsed * 1000, 3)
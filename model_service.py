@@ -8,30 +8,117 @@ Handles all AI model operations including:
 - Feedback generation
 """
 
+import math
 import os
 import re
-from typing import Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
-try:
-    from transformers import AutoTokenizer, T5ForConditionalGeneration
-    from deep_translator import GoogleTranslator
-except ImportError as e:
-    print(f"❌ Missing required package: {e}")
-    print("Install with: pip install transformers deep-translator torch")
-    raise
+from backends import load_model
+from batching import BatchScheduler
+from caching import LRUCache, TranslationCache, nbytes
+from code_analysis import code_feedback
+from offline_translator import OfflineTranslator
+from resilience import CircuitBreaker, CircuitOpenError, RemoteCall
+from retrieval import ExemplarIndex
+from sandbox import SandboxPool, format_execution
+from translator_client import GoogleTranslateClient
+from intents import Intent, draft_python_code, parse_intent, render_pseudo_code, render_python_code
+from metrics import CODE_GENERATIONS, DECODING_TIERS, DRAFT_TOKENS, PIPELINE_RUNS, TRANSLATIONS, StageTimer
+
+# Unparseable (e.g. cut-off) model output is still shown if it has these as whole words
+_CODE_KEYWORDS = re.compile(r"\b(?:for|if|while|def|print)\b|=")
 
 class ModelService:
     """Service class to manage AI models and processing pipeline"""
     
-    def __init__(self, model_path: str = "./kannada_python_t5_model"):
+    # Prompts run through generate() by warm_up()
+    WARMUP_PROMPTS = [
+        "Print numbers from 1 to 10",
+        "Check if a number is even or odd",
+        "Find the largest of three numbers",
+        "Reverse a string",
+    ]
+    
+    def __init__(self, model_path: str = "./kannada_python_t5_model", backend: str = None):
         self.model_path = model_path
+        self.backend = backend or os.getenv("CODELEX_BACKEND", "torch")
         self.tokenizer = None
         self.model = None
+        # Any class taking (source, target, url, timeout) with a translate(text) method
+        self.translator_class = GoogleTranslateClient
         self._load_models()
+        
+        # Model fallback decoding: "grammar" (constrained to valid Python) or "beam"
+        self.decoding = os.getenv("CODELEX_DECODING", "grammar")
+        self.grammar_beams = int(os.getenv("CODELEX_GRAMMAR_BEAMS", "2"))
+        self.grammar_top_k = int(os.getenv("CODELEX_GRAMMAR_TOP_K", "16"))
+        
+        # Greedy decoding within a token budget first; the decoding above only for outputs that don't parse
+        self.adaptive_decoding = os.getenv("CODELEX_ADAPTIVE_DECODING", "1") != "0"
+        self.greedy_tokens_per_input = float(os.getenv("CODELEX_GREEDY_TOKENS_PER_INPUT", "1.5"))
+        self.greedy_extra_tokens = int(os.getenv("CODELEX_GREEDY_EXTRA_TOKENS", "8"))
+        
+        # Drafts (a close dataset example or a template skeleton) are verified instead of decoded
+        self.speculative = os.getenv("CODELEX_SPECULATIVE", "1") != "0"
+        self.draft_min_score = float(os.getenv("CODELEX_DRAFT_MIN_SCORE", "0.5"))
+        self.draft_rounds = int(os.getenv("CODELEX_DRAFT_ROUNDS", "4"))
+        
+        # Encoder states and decoded outputs of repeated model inputs, within a memory budget
+        self.model_cache = LRUCache(
+            max_entries=int(os.getenv("CODELEX_MODEL_CACHE_SIZE", "4096")),
+            max_bytes=int(float(os.getenv("CODELEX_MODEL_CACHE_MB", "64")) * 1024 * 1024),
+            sizeof=nbytes
+        )
+        
+        # Concurrent model-fallback requests are grouped into one generate() call
+        self.batcher = BatchScheduler(self.generate_code_batch)
+        
+        # Known prompts are answered from the cache instead of Google Translate
+        self.translation_cache = TranslationCache()
+        seeded = self.translation_cache.seed_from_dataset()
+        if seeded:
+            print(f"🗂️  Translation cache seeded with {seeded} dataset prompts")
+        
+        # Prompts close to a dataset example are answered with its stored code
+        self.exemplars = self._load_exemplars()
+        
+        # Kannada is translated offline; the remote translator is only a backstop
+        self.offline_translator = self._load_offline_translator()
+        self.offline_min_coverage = float(os.getenv("CODELEX_OFFLINE_MIN_COVERAGE", "1.0"))
+        self.remote_translation = os.getenv("CODELEX_REMOTE_TRANSLATION", "1") != "0"
+        
+        # A slow or failing translator costs at most one deadline per call, and nothing once the circuit opens
+        self.translator_url = os.getenv("CODELEX_TRANSLATOR_URL")
+        self.translator_breaker = CircuitBreaker(
+            "translator",
+            failure_threshold=int(os.getenv("CODELEX_TRANSLATE_FAILURES", "5")),
+            reset_timeout=float(os.getenv("CODELEX_TRANSLATE_RESET", "30")),
+            probe=lambda: self.remote_translator.run("ನಮಸ್ತೆ", "kn")
+        )
+        hedge_ms = float(os.getenv("CODELEX_TRANSLATE_HEDGE_MS", "0"))
+        self.remote_translator = RemoteCall(
+            self._call_translator,
+            "translator",
+            timeout=float(os.getenv("CODELEX_TRANSLATE_TIMEOUT", "3")),
+            breaker=self.translator_breaker,
+            hedge_after=hedge_ms / 1000 if hedge_ms > 0 else None
+        )
+        
+        # Generated code runs in resource-limited worker processes
+        self.sandbox = SandboxPool()
     
     def _load_models(self):
-        """Load the CodeT5 model and tokenizer"""
+        """Load the CodeT5 model and tokenizer (concurrently)"""
+        try:
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            print(f"❌ Missing required package: {e}")
+            print("Install with: pip install transformers deep-translator torch")
+            raise
+        
         try:
             # Check if model exists
             if not os.path.exists(self.model_path):
@@ -40,10 +127,12 @@ class ModelService:
                 self.model_path = "Salesforce/codet5-small"
             
             print(f"📦 Loading tokenizer from {self.model_path}...")
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
-            
-            print(f"🤖 Loading model from {self.model_path}...")
-            self.model = T5ForConditionalGeneration.from_pretrained(self.model_path)
+            print(f"🤖 Loading model from {self.model_path} ({self.backend} backend)...")
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="codelex-load") as executor:
+                tokenizer = executor.submit(AutoTokenizer.from_pretrained, self.model_path)
+                model = executor.submit(load_model, self.model_path, self.backend)
+                self.tokenizer = tokenizer.result()
+                self.model = model.result()
             
             print("✅ Model and tokenizer loaded successfully!")
             
@@ -51,6 +140,44 @@ class ModelService:
             print(f"❌ Error loading model: {e}")
             raise
     
+    def warm_up(self, batch_size: int = None):
+        """
+        Run a batch through generate() and start the sandbox workers
+        so the first real requests don't pay for lazy initialization
+        """
+        batch_size = batch_size if batch_size is not None else int(os.getenv("CODELEX_WARMUP_BATCH", "4"))
+        if batch_size > 0:
+            prompts = [self.WARMUP_PROMPTS[i % len(self.WARMUP_PROMPTS)] for i in range(batch_size)]
+            self.generate_code_batch(prompts)
+        if self.sandbox.enabled:
+            self.sandbox.execute("pass")
+    
+    def _load_exemplars(self, dataset_path: str = "lang_dataset.json") -> Optional[ExemplarIndex]:
+        """Build the exemplar retrieval index from the training dataset"""
+        if not os.path.exists(dataset_path):
+            print(f"⚠️  Dataset not found at {dataset_path}, exemplar retrieval disabled")
+            return None
+        
+        index = ExemplarIndex.from_dataset(dataset_path)
+        print(f"📚 Indexed {len(index.exemplars)} dataset exemplars")
+        return index
+    
+    def _load_offline_translator(self, dataset_path: str = "lang_dataset.json") -> OfflineTranslator:
+        """Build the offline translator's phrase table from the training dataset"""
+        if not os.path.exists(dataset_path):
+            print(f"⚠️  Dataset not found at {dataset_path}, offline translation uses the glossary only")
+            return OfflineTranslator()
+        
+        translator = OfflineTranslator.from_dataset(dataset_path)
+        print(f"🔤 Offline translator built from {translator.template_count} dataset sentences")
+        return translator
+    
+    def find_exemplar(self, text: str, field: str = "kannada text") -> Optional[Dict]:
+        """Look up a stored exemplar similar enough to reuse its code"""
+        if self.exemplars is None:
+            return None
+        return self.exemplars.lookup(text, field)
+    
     def is_loaded(self) -> bool:
         """Check if model is loaded"""
         return self.model is not None and self.tokenizer is not None
@@ -77,133 +204,90 @@ class ModelService:
     def translate_to_english(self, text: str, source_lang: str = "kn") -> Dict[str, str]:
         """
         Stage 2: Translate regional language to English
-        Uses Google Translate API with SSL error handling
+        Kannada is translated offline (phrase table + glossary); Google Translate
+        is only a backstop for prompts the offline translator doesn't fully cover,
+        called with a deadline behind a circuit breaker (see resilience.py)
+        Remote results are cached in memory and on disk (breaker probes are not)
         """
-        try:
-            # Try translation with SSL verification disabled for Google Translate
-            import ssl
-            import certifi
-            
-            translator = GoogleTranslator(source=source_lang, target='en')
-            translation = translator.translate(text)
-            
+        cached = self.translation_cache.get(text, source_lang)
+        if cached is not None:
+            TRANSLATIONS.inc("cache")
             return {
-                "translation": translation,
-                "message": f"Translated from {source_lang.upper()} to English",
+                "translation": cached,
+                "message": f"Translated from {source_lang.upper()} to English (cached)",
                 "original": text
             }
-        except Exception as e:
-            print(f"⚠️  Translation error: {e}")
-            print(f"💡 Using fallback: treating input as pattern-based")
-            
-            # Intelligent fallback based on Kannada patterns
-            # Common Kannada number words and their English equivalents
-            kannada_to_english_patterns = {
-                'ಮುದ್ರಿಸಿ': 'print',
-                'ಸಂಖ್ಯೆಗಳನ್ನು': 'numbers',
-                'ರಿಂದ': 'from',
-                'ರವರೆಗೆ': 'to',
-                'ಸಮ': 'even',
-                'ಮೊತ್ತ': 'sum',
-                'ಲೆಕ್ಕ': 'calculate',
-            }
-            
-            # Try to detect pattern from Kannada keywords
-            text_lower = text.lower()
-            detected_pattern = []
-            
-            for kannada, english in kannada_to_english_patterns.items():
-                if kannada in text:
-                    detected_pattern.append(english)
-            
-            # Extract numbers
-            import re
-            numbers = re.findall(r'\d+', text)
-            
-            # Build a simple English translation
-            if numbers and 'ಮುದ್ರಿಸಿ' in text:
-                if len(numbers) >= 2:
-                    if 'ಸಮ' in text:
-                        fallback_translation = f"Print even numbers from {numbers[0]} to {numbers[1]}"
-                    elif 'ಮೊತ್ತ' in text or 'ಲೆಕ್ಕ' in text:
-                        fallback_translation = f"Calculate sum of numbers from {numbers[0]} to {numbers[1]}"
-                    else:
-                        fallback_translation = f"Print numbers from {numbers[0]} to {numbers[1]}"
-                else:
-                    fallback_translation = "Print numbers"
+        
+        offline = None
+        if source_lang == "kn" and self.offline_translator is not None:
+            offline = self.offline_translator.translate(text)
+            if offline.coverage >= self.offline_min_coverage:
+                TRANSLATIONS.inc("offline")
+                return {
+                    "translation": offline.text,
+                    "message": f"Translated from {source_lang.upper()} to English (offline {offline.method.replace('_', ' ')})",
+                    "original": text
+                }
+        
+        if self.remote_translation:
+            # With hedging, a slow translator is raced by the offline glossary
+            hedge = (lambda: offline.text) if offline is not None else None
+            try:
+                translation, source = self.remote_translator.call(text, source_lang, hedge=hedge)
+            except CircuitOpenError:
+                pass
+            except Exception as e:
+                print(f"⚠️  Translation error: {e}")
+                print(f"💡 Using fallback: offline glossary translation")
             else:
-                # Use original text if can't detect pattern
-                fallback_translation = text
-            
+                if source == "hedge":
+                    TRANSLATIONS.inc("hedged")
+                    return {
+                        "translation": translation,
+                        "message": "Translator is slow - using offline glossary",
+                        "original": text
+                    }
+                TRANSLATIONS.inc("remote")
+                if translation:
+                    self.translation_cache.set(text, source_lang, translation)
+                return {
+                    "translation": translation,
+                    "message": f"Translated from {source_lang.upper()} to English",
+                    "original": text
+                }
+        
+        TRANSLATIONS.inc("fallback")
+        if offline is not None:
             return {
-                "translation": fallback_translation,
-                "message": "Translation unavailable - using pattern detection",
+                "translation": offline.text,
+                "message": f"Translation unavailable - using offline glossary ({offline.coverage:.0%} of words known)",
                 "original": text
             }
+        return {
+            "translation": text,
+            "message": "Translation unavailable - using original text",
+            "original": text
+        }
     
-    def generate_pseudo_code(self, english_text: str) -> Dict[str, str]:
+    def _call_translator(self, text: str, source_lang: str) -> str:
+        """Blocking call to Google Translate (or CODELEX_TRANSLATOR_URL)"""
+        translator = self.translator_class(
+            source=source_lang,
+            target='en',
+            url=self.translator_url,
+            timeout=self.remote_translator.timeout
+        )
+        return translator.translate(text)
+    
+    def generate_pseudo_code(self, english_text: str, intent: Intent = None) -> Dict[str, str]:
         """
         Stage 3: Generate pseudo-code from English description
-        Uses pattern matching and simple logic for now
-        """
-        # Simple heuristic-based pseudo-code generation
-        english_lower = english_text.lower()
-        
-        # Initialize pseudo code
-        pseudo_lines = []
-        
-        # Detect loop patterns
-        if any(word in english_lower for word in ['loop', 'iterate', 'repeat', 'from', 'to']):
-            # Try to extract range
-            numbers = re.findall(r'\b(\d+)\b', english_text)
-            if len(numbers) >= 2:
-                start, end = numbers[0], numbers[1]
-                pseudo_lines.append(f"FOR i FROM {start} TO {end}")
-                
-                # Check for conditions
-                if 'even' in english_lower:
-                    pseudo_lines.append("    IF i MOD 2 EQUALS 0 THEN")
-                    pseudo_lines.append("        PRINT i")
-                    pseudo_lines.append("    END IF")
-                elif 'odd' in english_lower:
-                    pseudo_lines.append("    IF i MOD 2 NOT EQUALS 0 THEN")
-                    pseudo_lines.append("        PRINT i")
-                    pseudo_lines.append("    END IF")
-                else:
-                    pseudo_lines.append("    PRINT i")
-                
-                pseudo_lines.append("END FOR")
-        
-        # Detect print patterns
-        elif 'print' in english_lower or 'display' in english_lower or 'show' in english_lower:
-            if 'hello' in english_lower or 'world' in english_lower:
-                pseudo_lines.append('PRINT "Hello, World!"')
-            else:
-                # Extract what to print
-                pseudo_lines.append('PRINT output')
-        
-        # Detect sum/calculation patterns
-        elif 'sum' in english_lower or 'add' in english_lower or 'total' in english_lower:
-            numbers = re.findall(r'\b(\d+)\b', english_text)
-            if len(numbers) >= 2:
-                start, end = numbers[0], numbers[1]
-                pseudo_lines.append("SET sum = 0")
-                pseudo_lines.append(f"FOR i FROM {start} TO {end}")
-                pseudo_lines.append("    SET sum = sum + i")
-                pseudo_lines.append("END FOR")
-                pseudo_lines.append("PRINT sum")
-        
-        # Detect fibonacci
-        elif 'fibonacci' in english_lower:
-            numbers = re.findall(r'\b(\d+)\b', english_text)
-            count = numbers[0] if numbers else "10"
-            pseudo_lines.append("SET a = 0, b = 1")
-            pseudo_lines.append("PRINT a, b")
-            pseudo_lines.append(f"FOR i FROM 3 TO {count}")
-            pseudo_lines.append("    SET c = a + b")
-            pseudo_lines.append("    PRINT c")
-            pseudo_lines.append("    SET a = b, b = c")
-            pseudo_lines.append("END FOR")
+        Renders the template for the detected intent
+        """
+        if intent is None:
+            intent = parse_intent(english_text)
+        
+        pseudo_lines = render_pseudo_code(intent)
         
         # Default fallback
         if not pseudo_lines:
@@ -219,125 +303,36 @@ class ModelService:
             "message": "Structured pseudo-code generated successfully"
         }
     
-    def generate_python_code(self, english_text: str, pseudo_code: str = None) -> Dict[str, str]:
+    def generate_python_code(self, english_text: str, pseudo_code: str = None, intent: Intent = None) -> Dict[str, str]:
         """
         Stage 4: Generate Python code from English description and pseudo-code
-        Uses pattern matching for reliable code generation
+        Renders the template for the detected intent, falling back to the model
         """
         try:
-            english_lower = english_text.lower()
-            code_lines = []
+            if intent is None:
+                intent = parse_intent(english_text)
             
-            # Detect sum/calculation patterns FIRST (before loop detection)
-            if any(word in english_lower for word in ['sum', 'total', 'amount']) and any(word in english_lower for word in ['calculate', 'find', 'compute']):
-                numbers = re.findall(r'\b(\d+)\b', english_text)
-                if len(numbers) >= 2:
-                    start, end = numbers[0], numbers[1]
-                    code_lines.append(f"sum = 0")
-                    code_lines.append(f"for i in range({start}, {int(end)+1}):")
-                    code_lines.append(f"    sum += i")
-                    code_lines.append(f"print(sum)")
-                else:
-                    # Generic sum
-                    code_lines.append(f"total = 0")
-                    code_lines.append(f"# Add your numbers here")
-                    code_lines.append(f"print(total)")
-            
-            # Detect loop patterns
-            elif any(word in english_lower for word in ['loop', 'iterate', 'repeat', 'from', 'to', 'print numbers', 'numbers from']):
-                # Try to extract range
-                numbers = re.findall(r'\b(\d+)\b', english_text)
-                
-                if len(numbers) >= 2:
-                    start, end = numbers[0], numbers[1]
-                    
-                    # Check for even/odd patterns
-                    if 'even' in english_lower or 'equal' in english_lower:
-                        code_lines.append(f"for i in range({start}, {int(end)+1}):")
-                        code_lines.append(f"    if i % 2 == 0:")
-                        code_lines.append(f"        print(i)")
-                    elif 'odd' in english_lower:
-                        code_lines.append(f"for i in range({start}, {int(end)+1}):")
-                        code_lines.append(f"    if i % 2 != 0:")
-                        code_lines.append(f"        print(i)")
-                    else:
-                        # Simple loop
-                        code_lines.append(f"for i in range({start}, {int(end)+1}):")
-                        code_lines.append(f"    print(i)")
-            
-            # Detect fibonacci
-            elif 'fibonacci' in english_lower:
-                numbers = re.findall(r'\b(\d+)\b', english_text)
-                count = numbers[0] if numbers else "10"
-                code_lines.append(f"a, b = 0, 1")
-                code_lines.append(f"print(a, b)")
-                code_lines.append(f"for i in range(3, {int(count)+1}):")
-                code_lines.append(f"    c = a + b")
-                code_lines.append(f"    print(c)")
-                code_lines.append(f"    a, b = b, c")
-            
-            # Detect factorial
-            elif 'factorial' in english_lower:
-                numbers = re.findall(r'\b(\d+)\b', english_text)
-                num = numbers[0] if numbers else "5"
-                code_lines.append(f"factorial = 1")
-                code_lines.append(f"for i in range(1, {int(num)+1}):")
-                code_lines.append(f"    factorial *= i")
-                code_lines.append(f"print(factorial)")
-            
-            # Detect print patterns
-            elif 'print' in english_lower or 'display' in english_lower or 'show' in english_lower:
-                if 'hello' in english_lower or 'world' in english_lower:
-                    code_lines.append('print("Hello, World!")')
-                else:
-                    # Extract what to print if possible
-                    code_lines.append('print("Output")')
-            
-            # Detect variable assignment
-            elif 'assign' in english_lower or 'store' in english_lower or 'variable' in english_lower:
-                # Try to extract variable name and value
-                numbers = re.findall(r'\b(\d+)\b', english_text)
-                # Look for variable name (single letter)
-                var_match = re.search(r'\b([A-Za-z])\b', english_text)
-                
-                if var_match and numbers:
-                    var_name = var_match.group(1)
-                    value = numbers[0]
-                    code_lines.append(f"{var_name} = {value}")
-                else:
-                    code_lines.append("# Variable assignment")
-                    code_lines.append("x = 0")
+            code_lines = render_python_code(intent)
             
             # Default fallback - try to use the model for trained data
-            if not code_lines:
+            if code_lines:
+                CODE_GENERATIONS.inc("template")
+            else:
                 # Try using the model as last resort
                 try:
-                    # Use English text with the model
-                    inputs = self.tokenizer(
-                        english_text,
-                        return_tensors="pt",
-                        truncation=True,
-                        max_length=128
-                    )
-                    
-                    output_ids = self.model.generate(
-                        **inputs,
-                        max_length=128,
-                        num_beams=4,
-                        early_stopping=True,
-                        no_repeat_ngram_size=2
-                    )
-                    
-                    code = self.tokenizer.decode(output_ids[0], skip_special_tokens=True)
-                    
-                    # Validate the generated code looks like Python
-                    if code and any(keyword in code for keyword in ['for', 'if', 'while', 'def', 'print', '=']):
-                        code_lines = code.split('\n')
+                    draft = self._draft_code(english_text, intent)
+                    if draft:
+                        # Verify the draft in a few forward passes, decoding only where the model disagrees
+                        code = self.generate_code_with_draft(english_text, draft)
+                        CODE_GENERATIONS.inc("model_draft")
                     else:
-                        # Model output doesn't look like code, use generic fallback
-                        code_lines = ["# Generated code", "print('Result')"]
+                        # Use English text with the model (batched with concurrent requests)
+                        code = self.batcher(english_text)
+                        CODE_GENERATIONS.inc("model")
+                    code_lines = self._model_code_lines(code)
                 except Exception as model_error:
                     print(f"⚠️  Model generation failed: {model_error}")
+                    CODE_GENERATIONS.inc("model_error")
                     code_lines = ["# Code generation in progress", "print('Result')"]
             
             python_code = "\n".join(code_lines)
@@ -357,42 +352,226 @@ class ModelService:
                 "message": f"Using fallback code (error: {str(e)})"
             }
     
-    def generate_execution_placeholder(self, code: str) -> Dict[str, str]:
+    def _model_code_lines(self, code: str) -> List[str]:
+        """Validate that model output looks like Python, else use a generic fallback"""
+        from decoding import is_valid_python, looks_like_code
+        
+        if code and (looks_like_code(code) or (not is_valid_python(code) and _CODE_KEYWORDS.search(code))):
+            return code.split('\n')
+        # Model output doesn't look like code, use generic fallback
+        return ["# Generated code", "print('Result')"]
+    
+    def generate_code_batch(self, english_texts: List[str]) -> List[str]:
         """
-        Stage 5: Execution placeholder
-        For now, returns a message indicating code is ready
-        Actual execution will be implemented later with sandboxing
+        Run the CodeT5 model on several English descriptions at once
+        Inputs are padded together and decoded greedily within a token budget sized
+        to the longest input; outputs that run out of budget or don't parse are
+        decoded again with the configured beams (adaptive decoding). Decoding is
+        deterministic (no sampling), so outputs are memoized per description and
+        decoding configuration; repeated descriptions skip the model.
         """
-        return {
-            "execution": "# Code execution not yet implemented\n# The generated code is ready to run",
-            "message": "Code ready for execution (execution feature coming soon)"
-        }
+        from decoding import looks_like_code
+        
+        config = self._decoding_config()
+        codes = [self.model_cache.get(("output", config, text)) for text in english_texts]
+        pending = list(dict.fromkeys(text for text, code in zip(english_texts, codes) if code is None))
+        if not pending:
+            return codes
+        
+        generated = {}
+        escalate = pending
+        if self.adaptive_decoding:
+            encoded = self._encode(pending)
+            longest = int(encoded["attention_mask"].sum(dim=1).max())
+            budget = min(128, math.ceil(self.greedy_tokens_per_input * longest) + self.greedy_extra_tokens)
+            options = self._generation_options(greedy=True)
+            del options["max_length"]
+            
+            output_ids = self.model.generate(**encoded, **options, max_new_tokens=budget)
+            for text, row, code in zip(pending, output_ids, self._decode(output_ids)):
+                if self._is_truncated(row, budget):
+                    DECODING_TIERS.inc("greedy", "truncated")
+                elif not looks_like_code(code):
+                    DECODING_TIERS.inc("greedy", "invalid")
+                else:
+                    DECODING_TIERS.inc("greedy", "valid")
+                    generated[text] = code
+            escalate = [text for text in pending if text not in generated]
+        
+        if escalate:
+            # Encoder states of escalated descriptions come from the model cache
+            output_ids = self.model.generate(**self._encode(escalate), **self._generation_options())
+            for text, code in zip(escalate, self._decode(output_ids)):
+                DECODING_TIERS.inc(self.decoding, "valid" if looks_like_code(code) else "invalid")
+                generated[text] = code
+        
+        for text, code in generated.items():
+            self.model_cache.set(("output", config, text), code)
+        return [code if code is not None else generated[text] for text, code in zip(english_texts, codes)]
     
-    def generate_feedback(self, code: str, english_text: str) -> Dict[str, str]:
+    def _decode(self, output_ids) -> List[str]:
+        codes = self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+        if self.decoding == "grammar":
+            from decoding import clean_generated_code
+            codes = [clean_generated_code(code) for code in codes]
+        return codes
+    
+    def _is_truncated(self, row, budget: int) -> bool:
+        """Whether a generated sequence used up its token budget without finishing"""
+        if self.tokenizer.eos_token_id in row.tolist():
+            return False
+        # Sequences that stopped early are padded to the batch length
+        return int((row[1:] != self.tokenizer.pad_token_id).sum()) >= budget
+    
+    def _decoding_config(self) -> Tuple:
+        """Settings that change what the model generates, part of every output cache key"""
+        config = (self.decoding,)
+        if self.decoding == "grammar":
+            config += (self.grammar_beams, self.grammar_top_k)
+        if self.adaptive_decoding:
+            config += ("adaptive", self.greedy_tokens_per_input, self.greedy_extra_tokens)
+        return config
+    
+    def _encode(self, english_texts: List[str]) -> Dict:
         """
-        Stage 6: Generate feedback about the code
-        Provides simple analysis and suggestions
+        Encoder inputs for generate() and forward passes
+        Encoder states of descriptions seen before come from the model cache; the
+        rest are tokenized and encoded together, then padded into one batch
         """
-        feedback_points = []
+        if self.backend == "onnx":
+            # The ONNX encoder is a separate session inside generate()
+            return dict(self.tokenizer(english_texts, return_tensors="pt", padding=True, truncation=True, max_length=128))
         
-        # Analyze code
-        if 'for' in code and 'range' in code:
-            feedback_points.append("✓ Good use of for loop with range() function")
+        import torch
+        from transformers.modeling_outputs import BaseModelOutput
         
-        if 'if' in code:
-            feedback_points.append("✓ Conditional logic implemented correctly")
+        states = [self.model_cache.get(("encoder", text)) for text in english_texts]
+        missing = list(dict.fromkeys(text for text, state in zip(english_texts, states) if state is None))
+        if missing:
+            inputs = self.tokenizer(missing, return_tensors="pt", padding=True, truncation=True, max_length=128)
+            with torch.no_grad():
+                hidden = self.model.get_encoder()(**inputs).last_hidden_state
+            encoded = {}
+            for text, row, length in zip(missing, hidden, inputs["attention_mask"].sum(dim=1).tolist()):
+                # Copy so the cached state doesn't keep the whole padded batch alive
+                encoded[text] = row[:length].clone()
+                self.model_cache.set(("encoder", text), encoded[text])
+            states = [state if state is not None else encoded[text] for text, state in zip(english_texts, states)]
         
-        if 'def' in code:
-            feedback_points.append("✓ Code organized into a function")
-        elif len(code.split('\n')) > 3:
-            feedback_points.append("💡 Consider organizing code into functions for better reusability")
+        longest = max(len(state) for state in states)
+        hidden = states[0].new_zeros((len(states), longest, states[0].shape[-1]))
+        attention_mask = torch.zeros((len(states), longest), dtype=torch.long)
+        for i, state in enumerate(states):
+            hidden[i, :len(state)] = state
+            attention_mask[i, :len(state)] = 1
+        return {"encoder_outputs": BaseModelOutput(last_hidden_state=hidden), "attention_mask": attention_mask}
+    
+    def _draft_code(self, english_text: str, intent: Intent) -> str:
+        """
+        Draft for the model to verify: the code of the nearest dataset example
+        (same numbers and key words) if it is close enough, else a template skeleton
+        """
+        if not self.speculative:
+            return ""
         
-        if 'print' in code:
-            feedback_points.append("✓ Output statements included")
+        if self.exemplars is not None:
+            match = self.exemplars.nearest(english_text, "text")
+            if match and match["score"] >= self.draft_min_score:
+                return match["code"]
+        return draft_python_code(intent)
+    
+    def generate_code_with_draft(self, english_text: str, draft: str) -> str:
+        """
+        Run the CodeT5 model on one description, using draft as the guess for its output
+        Draft tokens the model agrees with cost one forward pass together, so a good
+        draft replaces most of the token-by-token decoding
+        """
+        from decoding import speculative_generate
+        
+        key = ("draft", self._decoding_config(), english_text)
+        code = self.model_cache.get(key)
+        if code is not None:
+            return code
+        
+        output_ids, accepted, rejected = speculative_generate(
+            self.model,
+            self.tokenizer,
+            self._encode([english_text]),
+            draft,
+            self._generation_options(),
+            max_rounds=self.draft_rounds
+        )
+        DRAFT_TOKENS.inc("accepted", amount=accepted)
+        DRAFT_TOKENS.inc("rejected", amount=rejected)
+        code = self.tokenizer.decode(output_ids, skip_special_tokens=True)
+        
+        if self.decoding == "grammar":
+            from decoding import clean_generated_code
+            code = clean_generated_code(code)
+        self.model_cache.set(key, code)
+        return code
+    
+    def _generation_options(self, streaming: bool = False, greedy: bool = False) -> Dict:
+        """
+        generate() arguments for the configured decoding mode
+        - grammar: beams constrained to valid Python, stopping after a complete block
+        - beam: plain 4-beam search with no_repeat_ngram_size=2
+        Token streaming needs a single sequence, so streaming always decodes greedily;
+        greedy=True does the same for the first tier of adaptive decoding
+        """
+        streaming = streaming or greedy
+        if self.decoding == "grammar":
+            from transformers import LogitsProcessorList, StoppingCriteriaList
+            from decoding import PythonGrammarLogitsProcessor, StatementBlockStoppingCriteria
+            
+            num_beams = 1 if streaming else self.grammar_beams
+            return {
+                "max_length": 128,
+                "num_beams": num_beams,
+                "early_stopping": num_beams > 1,
+                "logits_processor": LogitsProcessorList([
+                    PythonGrammarLogitsProcessor(self.tokenizer, top_k=self.grammar_top_k)
+                ]),
+                "stopping_criteria": StoppingCriteriaList([StatementBlockStoppingCriteria(self.tokenizer)]),
+            }
+        
+        return {
+            "max_length": 128,
+            "num_beams": 1 if streaming else 4,
+            "early_stopping": not streaming,
+            "no_repeat_ngram_size": 2,
+        }
+    
+    def execute_code(self, code: str) -> Dict[str, str]:
+        """
+        Stage 5: Execute the generated code in the sandbox
+        Reports stdout, stderr, exit status and elapsed time
+        """
+        if not self.sandbox.enabled:
+            return {
+                "execution": "# Code execution is disabled on this server\n# The generated code is ready to run",
+                "message": "Code ready for execution (set CODELEX_EXECUTE_CODE=1 to run it in the sandbox)"
+            }
+        try:
+            result = self.sandbox.execute(code)
+        except Exception as e:
+            print(f"⚠️  Code execution error: {e}")
+            return {
+                "execution": f"# Code execution unavailable: {e}",
+                "message": "Code could not be executed"
+            }
         
-        # Check for common improvements
-        if '#' not in code and len(code.split('\n')) > 2:
-            feedback_points.append("💡 Add comments to explain your code logic")
+        return {
+            "execution": format_execution(result),
+            "message": f"Code executed ({result['status']}, exit status {result['exit_status']})"
+        }
+    
+    def generate_feedback(self, code: str, english_text: str) -> Dict[str, str]:
+        """
+        Stage 6: Generate feedback about the code
+        Static analysis of the program (cached by code hash), see code_analysis.py
+        """
+        feedback_points = code_feedback(code)
         
         if not feedback_points:
             feedback_points.append("Code generated successfully! Review and test the output.")
@@ -404,44 +583,280 @@ class ModelService:
             "message": "AI feedback generated"
         }
     
-    def process_pipeline(self, input_text: str, language: str = "kn") -> Dict[str, str]:
+    def stream_python_code(self, english_text: str) -> Iterator[str]:
         """
-        Complete processing pipeline
-        Runs all stages and returns complete response
+        Run the CodeT5 model on one description, yielding decoded text as it is produced
+        Token streaming needs a single sequence, so this uses greedy decoding.
+        A memoized output is yielded in one piece.
+        """
+        from transformers import TextIteratorStreamer
+        
+        key = ("stream", self._decoding_config(), english_text)
+        code = self.model_cache.get(key)
+        if code is not None:
+            if code:
+                yield code
+            return
+        
+        inputs = self._encode([english_text])
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors = []
+        
+        def generate():
+            try:
+                self.model.generate(**inputs, **self._generation_options(streaming=True), streamer=streamer)
+            except Exception as e:
+                errors.append(e)
+                streamer.end()
+        
+        thread = threading.Thread(target=generate, name="codelex-stream", daemon=True)
+        thread.start()
+        generated = []
+        for text in streamer:
+            if text:
+                generated.append(text)
+                yield text
+        thread.join()
+        
+        if errors:
+            raise errors[0]
+        self.model_cache.set(key, "".join(generated))
+    
+    def iter_pipeline(self, input_text: str, language: str = "kn", stream_tokens: bool = False) -> Iterator[Tuple[str, object]]:
+        """
+        Complete processing pipeline, yielding (stage, result) as each stage finishes
+        Stages: preprocess, translation, pseudo_code, code, execution, feedback,
+        then "result" with the complete response, including per-stage "timings"
+        in milliseconds. With stream_tokens, model fallback output is also
+        yielded incrementally as "code_token" events.
         """
+        timer = StageTimer()
+        PIPELINE_RUNS.inc("single")
+        
         # Stage 1: Preprocess
-        preprocess_result = self.preprocess_text(input_text)
-        cleaned_text = preprocess_result["cleaned_text"]
+        with timer("preprocess"):
+            preprocess_result = self.preprocess_text(input_text)
+            cleaned_text = preprocess_result["cleaned_text"]
+        yield "preprocess", preprocess_result["message"]
+        
+        # Stage 2: Translate (a known Kannada prompt already has its English text)
+        with timer("translation"):
+            exemplar = self.find_exemplar(cleaned_text, "kannada text")
+            if exemplar:
+                TRANSLATIONS.inc("exemplar")
+                english_text = exemplar["text"]
+            else:
+                translation_result = self.translate_to_english(cleaned_text, language)
+                english_text = translation_result["translation"]
+                exemplar = self.find_exemplar(english_text, "text")
+        yield "translation", english_text
         
-        # Stage 2: Translate
-        translation_result = self.translate_to_english(cleaned_text, language)
-        english_text = translation_result["translation"]
+        # Stage 3: Generate Pseudo-code (the intent is parsed once for both code generation stages)
+        with timer("pseudo_code"):
+            intent = parse_intent(english_text)
+            pseudo_result = self.generate_pseudo_code(english_text, intent)
+            pseudo_code = pseudo_result["pseudo_code"]
+        yield "pseudo_code", pseudo_code
         
-        # Stage 3: Generate Pseudo-code
-        pseudo_result = self.generate_pseudo_code(english_text)
-        pseudo_code = pseudo_result["pseudo_code"]
+        # Stage 4: Generate Python Code (stored exemplar code, else English translation and pseudo-code)
+        if exemplar:
+            CODE_GENERATIONS.inc("exemplar")
+            python_code = exemplar["code"]
+        elif stream_tokens and not render_python_code(intent):
+            generated = []
+            # Time spent waiting on the consumer between tokens is included here
+            with timer("code"):
+                try:
+                    for text in self.stream_python_code(english_text):
+                        generated.append(text)
+                        yield "code_token", text
+                    code_lines = self._model_code_lines("".join(generated))
+                    CODE_GENERATIONS.inc("model")
+                except Exception as model_error:
+                    print(f"⚠️  Model generation failed: {model_error}")
+                    CODE_GENERATIONS.inc("model_error")
+                    code_lines = ["# Code generation in progress", "print('Result')"]
+                python_code = "\n".join(code_lines)
+        else:
+            with timer("code"):
+                code_result = self.generate_python_code(english_text, pseudo_code, intent)
+                python_code = code_result["code"]
+        yield "code", python_code
         
-        # Stage 4: Generate Python Code (using English translation and pseudo-code)
-        code_result = self.generate_python_code(english_text, pseudo_code)
-        python_code = code_result["code"]
+        # Stage 5: Execution
+        with timer("execution"):
+            execution_result = self.execute_code(python_code)
+            execution_output = execution_result["execution"]
+        yield "execution", execution_output
         
-        # Stage 5: Execution (placeholder)
-        execution_result = self.generate_execution_placeholder(python_code)
+        # Stage 6: Feedback
+        with timer("feedback"):
+            feedback_result = self.generate_feedback(python_code, english_text)
+            feedback = feedback_result["feedback"]
+        yield "feedback", feedback
+        
+        result = self._build_response(
+            preprocess_result, english_text, pseudo_code, python_code, execution_output, feedback, exemplar
+        )
+        result["timings"] = timer.timings
+        yield "result", result
+    
+    def process_pipeline(self, input_text: str, language: str = "kn") -> Dict[str, str]:
+        """
+        Complete processing pipeline
+        Runs all stages and returns complete response
+        """
+        for stage, result in self.iter_pipeline(input_text, language):
+            if stage == "result":
+                return result
+    
+    def _finish_pipeline(
+        self,
+        preprocess_result: Dict,
+        english_text: str,
+        pseudo_code: str,
+        python_code: str,
+        exemplar: Optional[Dict]
+    ) -> Dict:
+        """Run the execution and feedback stages and assemble the response"""
+        # Stage 5: Execution
+        execution_result = self.execute_code(python_code)
         execution_output = execution_result["execution"]
         
         # Stage 6: Feedback
         feedback_result = self.generate_feedback(python_code, english_text)
         feedback = feedback_result["feedback"]
         
-        # Return complete response matching frontend interface
+        return self._build_response(
+            preprocess_result, english_text, pseudo_code, python_code, execution_output, feedback, exemplar
+        )
+    
+    def _build_response(
+        self,
+        preprocess_result: Dict,
+        english_text: str,
+        pseudo_code: str,
+        python_code: str,
+        execution_output: str,
+        feedback: str,
+        exemplar: Optional[Dict]
+    ) -> Dict:
+        """Assemble the response returned to the frontend"""
         return {
             "preprocess": preprocess_result["message"],
             "translation": english_text,
             "pseudo_code": pseudo_code,
             "code": python_code,
             "execution": execution_output,
-            "feedback": feedback
+            "feedback": feedback,
+            "exemplar": {key: exemplar[key] for key in ("id", "score", "field")} if exemplar else None
         }
+    
+    def process_batch(self, requests: List[Tuple[str, str]]) -> List[Dict]:
+        """
+        Batch processing pipeline
+        Runs each stage across all (input_text, language) pairs:
+        translations and model generations are deduplicated, and every
+        input that needs the model goes through batched generate() calls.
+        Returns one {"result": ...} or {"error": ...} per input, in order.
+        """
+        items = [{"input_text": text, "language": language} for text, language in requests]
+        timer = StageTimer("batch")
+        PIPELINE_RUNS.inc("batch", amount=len(items))
+        
+        def run_stage(stage, item_list):
+            for item in item_list:
+                if "error" in item:
+                    continue
+                try:
+                    stage(item)
+                except Exception as e:
+                    item["error"] = f"{stage.__name__.strip('_')} failed: {e}"
+        
+        # Stage 1: Preprocess, and reuse known Kannada prompts
+        def _preprocess(item):
+            if not item["input_text"] or not item["input_text"].strip():
+                raise ValueError("Input text cannot be empty")
+            item["preprocess"] = self.preprocess_text(item["input_text"])
+            item["exemplar"] = self.find_exemplar(item["preprocess"]["cleaned_text"], "kannada text")
+            if item["exemplar"]:
+                TRANSLATIONS.inc("exemplar")
+                item["english_text"] = item["exemplar"]["text"]
+        with timer("preprocess"):
+            run_stage(_preprocess, items)
+        
+        # Stage 2: Translate each distinct (text, language) once
+        translations = {}
+        def _translate(item):
+            key = (item["preprocess"]["cleaned_text"], item["language"])
+            if key not in translations:
+                translations[key] = self.translate_to_english(*key)["translation"]
+            item["english_text"] = translations[key]
+            item["exemplar"] = self.find_exemplar(item["english_text"], "text")
+        with timer("translation"):
+            run_stage(_translate, [item for item in items if "english_text" not in item])
+        
+        # Stage 3: Parse intents and render pseudo-code
+        def _pseudo_code(item):
+            item["intent"] = parse_intent(item["english_text"])
+            item["pseudo_code"] = self.generate_pseudo_code(item["english_text"], item["intent"])["pseudo_code"]
+        with timer("pseudo_code"):
+            run_stage(_pseudo_code, items)
+        
+        # Stage 4: Templates first, then batched model generation for the rest
+        def _code(item):
+            if item["exemplar"]:
+                CODE_GENERATIONS.inc("exemplar")
+                item["code"] = item["exemplar"]["code"]
+            else:
+                code_lines = render_python_code(item["intent"])
+                if code_lines:
+                    CODE_GENERATIONS.inc("template")
+                    item["code"] = "\n".join(code_lines)
+        with timer("code"):
+            run_stage(_code, items)
+            
+            pending = [item for item in items if "error" not in item and "code" not in item]
+            model_texts = list(dict.fromkeys(item["english_text"] for item in pending))
+            generated = {}
+            failed = set()
+            batch_size = self.batcher.max_batch_size
+            for start in range(0, len(model_texts), batch_size):
+                chunk = model_texts[start:start + batch_size]
+                try:
+                    outputs = self.generate_code_batch(chunk)
+                except Exception as model_error:
+                    print(f"⚠️  Model generation failed: {model_error}")
+                    outputs = [None] * len(chunk)
+                for text, output in zip(chunk, outputs):
+                    if output is None:
+                        failed.add(text)
+                        generated[text] = "# Code generation in progress\nprint('Result')"
+                    else:
+                        generated[text] = "\n".join(self._model_code_lines(output))
+            for item in pending:
+                CODE_GENERATIONS.inc("model_error" if item["english_text"] in failed else "model")
+                item["code"] = generated[item["english_text"]]
+        
+        # Stages 5-6: Execution and feedback (programs run in parallel across the sandbox pool first)
+        with timer("execution"):
+            try:
+                if self.sandbox.enabled:
+                    self.sandbox.execute_many([item["code"] for item in items if "error" not in item])
+            except Exception as e:
+                print(f"⚠️  Code execution error: {e}")
+        
+        def _finish(item):
+            item["result"] = self._finish_pipeline(
+                item["preprocess"], item["english_text"], item["pseudo_code"], item["code"], item["exemplar"]
+            )
+        with timer("feedback"):
+            run_stage(_finish, items)
+        
+        return [
+            {"error": item["error"]} if "error" in item else {"result": item["result"]}
+            for item in items
+        ]
 
 
 # Testing function
@@ -0,0 +1,673 @@
+"""
+Offline Kannada to English translation for Codelex
+Translates prompts in microseconds without a network call:
+- Phrase table of dataset sentences with numbers and variables as slots,
+  so "1 ರಿಂದ 20 ..." reuses the English of "1 ರಿಂದ 10 ..."
+- Glossary fallback: longest-match tokenization over a phrase trie
+  (whole words and multi-word phrases) and a character trie (word stems
+  plus case suffixes such as ರಿಂದ "from" or ಗಿಂತ "than")
+- Kannada number words and digits are normalized (ಎರಡು, ಎರಡನ್ನು -> 2)
+
+Each translation reports its coverage (share of Kannada words understood)
+so callers can decide when to fall back to a remote translator.
+"""
+
+import json
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+_KANNADA_DIGITS = str.maketrans("೦೧೨೩೪೫೬೭೮೯", "0123456789")
+_JOINERS = dict.fromkeys(map(ord, "‌‍"))
+_TOKEN_PATTERN = re.compile(r"[ಀ-೿]+|\d+(?:\.\d+)?|[A-Za-z_]\w*|'[^']*'|\"[^\"]*\"|[<>=!]=|\*\*|//|\S")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.।?!])\s+")
+
+# Number words; compound tens such as ಇಪ್ಪತ್ತೈದು (25) are generated below
+_UNITS = {"ಒಂದು": 1, "ಎರಡು": 2, "ಮೂರು": 3, "ನಾಲ್ಕು": 4, "ಐದು": 5, "ಆರು": 6, "ಏಳು": 7, "ಎಂಟು": 8, "ಒಂಬತ್ತು": 9}
+_TENS = {
+    "ಇಪ್ಪತ್ತು": 20, "ಮೂವತ್ತು": 30, "ನಲವತ್ತು": 40, "ಐವತ್ತು": 50,
+    "ಅರವತ್ತು": 60, "ಎಪ್ಪತ್ತು": 70, "ಎಂಬತ್ತು": 80, "ತೊಂಬತ್ತು": 90,
+}
+_OTHER_NUMBERS = {
+    "ಸೊನ್ನೆ": 0, "ಶೂನ್ಯ": 0, "ಹತ್ತು": 10, "ಹನ್ನೊಂದು": 11, "ಹನ್ನೆರಡು": 12, "ಹದಿಮೂರು": 13,
+    "ಹದಿನಾಲ್ಕು": 14, "ಹದಿನೈದು": 15, "ಹದಿನಾರು": 16, "ಹದಿನೇಳು": 17, "ಹದಿನೆಂಟು": 18,
+    "ಹತ್ತೊಂಬತ್ತು": 19, "ನೂರು": 100, "ಸಾವಿರ": 1000,
+}
+_ARTICLE = "ಒಂದು"  # "one", also the indefinite article
+_VOWEL_SIGNS = {"ಆ": "ಾ", "ಇ": "ಿ", "ಈ": "ೀ", "ಉ": "ು", "ಊ": "ೂ", "ಎ": "ೆ", "ಏ": "ೇ", "ಐ": "ೈ", "ಒ": "ೊ", "ಓ": "ೋ", "ಔ": "ೌ"}
+
+# Spelled-out letters used as variable names
+VARIABLE_LETTERS = {
+    "ಎ": "A", "ಬಿ": "B", "ಸಿ": "C", "ಡಿ": "D", "ಇ": "E", "ಎಫ್": "F", "ಜಿ": "G", "ಎಚ್": "H", "ಹೆಚ್": "H",
+    "ಐ": "I", "ಜೆ": "J", "ಕೆ": "K", "ಎಲ್": "L", "ಎಂ": "M", "ಎನ್": "N", "ಓ": "O", "ಪಿ": "P",
+    "ಕ್ಯೂ": "Q", "ಆರ್": "R", "ಎಸ್": "S", "ಟಿ": "T", "ಯು": "U", "ವಿ": "V", "ಡಬ್ಲ್ಯೂ": "W",
+    "ಎಕ್ಸ್": "X", "ವೈ": "Y", "ಝಡ್": "Z", "ಜಡ್": "Z",
+}
+
+# Case endings: English preposition placed before the word ("" drops the ending)
+SUFFIXES = {
+    "": "", "ಅನ್ನು": "", "ನ್ನು": "", "ಯನ್ನು": "", "ವನ್ನು": "", "ನ": "", "ರ": "", "ದ": "", "ಯ": "",
+    "ಯು": "", "ವು": "", "ವಾದ": "", "ಆದ": "", "ದಂತೆ": "", "ನಂತೆ": "",
+    "ಗೆ": "to", "ಕ್ಕೆ": "to", "ಕೆ": "to", "ಯಿಗೆ": "to",
+    "ರಿಂದ": "from", "ಇಂದ": "from", "ಯಿಂದ": "from", "ದಿಂದ": "from", "ನಿಂದ": "from",
+    "ರವರೆಗೆ": "to", "ವರೆಗೆ": "to", "ರವರೆಗಿನ": "to", "ವರೆಗಿನ": "to", "ತನಕ": "to", "ರತನಕ": "to",
+    "ಗಿಂತ": "than", "ಕ್ಕಿಂತ": "than", "ಕಿಂತ": "than",
+    "ನಲ್ಲಿ": "in", "ಯಲ್ಲಿ": "in", "ದಲ್ಲಿ": "in", "ಲ್ಲಿ": "in",
+    "ನೊಂದಿಗೆ": "with", "ಯೊಂದಿಗೆ": "with", "ದೊಂದಿಗೆ": "with",
+    "ಆಗಿದ್ದರೆ": "is", "ಯಾಗಿದ್ದರೆ": "is", "ವಾಗಿದ್ದರೆ": "is", "ವಲ್ಲ": "is not",
+    "ಗಳು": "", "ಗಳನ್ನು": "", "ಗಳ": "", "ಗಳಿಗೆ": "to", "ಗಳಲ್ಲಿ": "in",
+}
+_PLURAL_SUFFIXES = {"ಗಳು", "ಗಳನ್ನು", "ಗಳ", "ಗಳಿಗೆ", "ಗಳಲ್ಲಿ"}
+# Letters are short, so only accept the endings they actually take (ಬಿಗೆ, ಎನ್ನ)
+_VARIABLE_SUFFIXES = {"", "ಗೆ", "ನ", "ಯ", "ಗಿಂತ", "ಕ್ಕಿಂತ", "ಕ್ಕೆ", "ಯನ್ನು", "ನ್ನು"}
+# Endings after which a conditional clause is complete ("if ... is greater, ...")
+_CLAUSE_ENDINGS = ("ದ್ದರೆ", "ದ್ದರೇ", "ದರೆ", "ದಲ್ಲಿ", "ವಾದರೆ")
+
+# Glossary: Kannada word or phrase -> (English, kind)
+# "verb" words move to the front of their clause, "conjunction" words may join two commands
+GLOSSARY: Dict[str, Tuple[str, str]] = {}
+
+
+def _gloss(kind: str, entries: str):
+    for line in entries.strip().splitlines():
+        kannada, english = line.split("=")
+        GLOSSARY[kannada.strip()] = (english.strip(), kind)
+
+
+_gloss("verb", """
+ಮುದ್ರಿಸಿ = print
+ಪ್ರಿಂಟ್ ಮಾಡಿ = print
+ಪ್ರಿಂಟ್ = print
+ತೋರಿಸಿ = display
+ನಿಯೋಜಿಸಿ = assign
+ನಿಯೋಜಿಸು = assign
+ನೇಮಿಸಿ = assign
+ನಿಗದಿಪಡಿಸಿ = assign
+ಹೊಂದಿಸಿ = set
+ಸಂಗ್ರಹಿಸಿ = store
+ಘೋಷಿಸಿ = declare
+ಲೆಕ್ಕ ಮಾಡಿ = calculate
+ಲೆಕ್ಕ ಹಾಕಿ = calculate
+ಲೆಕ್ಕಹಾಕಿ = calculate
+ಲೆಕ್ಕಾಚಾರ ಮಾಡಿ = calculate
+ಕಂಡುಹಿಡಿಯಿರಿ = find
+ಹುಡುಕಿ = find
+ಪ್ರಾರಂಭಿಸಿ = start
+ಜಾರಿ ಮಾಡಿ = execute
+ಜಾರಿ ಪಡಿಸಿ = execute
+ಜಾರಿಗೊಳಿಸಿ = execute
+ಕಾರ್ಯಗತಗೊಳಿಸಿ = execute
+ಕೂಡಿ = add
+ಕೂಡಿಸಿ = add
+ಸೇರಿಸಿ = add
+ಗುಣಿಸಿ = multiply
+ಭಾಗಿಸಿ = divide
+ಕಳೆಯಿರಿ = subtract
+ಕಳೆದು = subtract
+ಹೆಚ್ಚಿಸಿ = increment
+ಕಡಿಮೆ ಮಾಡಿ = decrement
+ರಚಿಸಿ = create
+ಹಾಕಿ = put
+ತೆಗೆದುಕೊಳ್ಳಿ = take
+ಪಡೆಯಿರಿ = get
+ಓದಿ = read
+ಹಿಂತಿರುಗಿಸಿ = return
+ಪರಿಶೀಲಿಸಿ = check
+ಪರೀಕ್ಷಿಸಿ = check
+ಬರೆಯಿರಿ = write
+ಪರಿವರ್ತಿಸಿ = convert
+""")
+
+_gloss("comparative", """
+ದೊಡ್ಡದು = greater
+ದೊಡ್ಡ = greater
+ಹೆಚ್ಚು = greater
+ಅಧಿಕ = greater
+ಕಡಿಮೆ = less
+ಚಿಕ್ಕದು = smaller
+ಚಿಕ್ಕ = smaller
+ಸಮಾನ = equal
+ದೊಡ್ಡದಾಗಿದ್ದರೆ = is greater
+ದೊಡ್ಡದಿದ್ದರೆ = is greater
+ದೊಡ್ಡದಿದ್ದು = is greater
+ದೊಡ್ಡದಿತ್ತು = is greater
+ಹೆಚ್ಚಿದಲ್ಲಿ = is greater
+ಹೆಚ್ಚಿಗಿದ್ದರೇ = is greater
+ಹೆಚ್ಚಿಗಿದ್ದರೆ = is greater
+ಹೆಚ್ಚಾಗಿದ್ದರೆ = is greater
+ಚಿಕ್ಕದಾಗಿದ್ದರೆ = is less
+ಚಿಕ್ಕದಿದ್ದರೆ = is less
+ಕಡಿಮೆಯಿದ್ದರೆ = is less
+ಸಮಾನವಾಗಿದ್ದರೆ = is equal
+ಸಮಾನವಿದ್ದರೆ = is equal
+ಸಮಾನವಿದ್ದು = is equal
+ಸಮಾನವಾಗಿದೆ = is equal
+ಸಮಾನವಾದ = equal
+ದೊಡ್ಡದಾಗಿರಬೇಕು = must be greater
+ಹೆಚ್ಚಾಗಿರಬೇಕು = must be greater
+ಸಮಾನವಾಗಿರಬಹುದು = may be equal
+""")
+
+_gloss("conjunction", """
+ಮತ್ತು = and
+ಹಾಗೂ = and
+ಅಥವಾ = or
+""")
+
+_gloss("word", """
+ಒಂದು ವೇಳೆ = if
+ಒಂದೂವೇಳೆ = if
+ಇಲ್ಲದಿದ್ದರೆ = else
+ಇಲ್ಲದ್ದಿದ್ದರೆ = else
+ಇಲ್ಲವಾದರೆ = else
+ಇಲ್ಲದಿದ್ದರೆ ಒಂದು ವೇಳೆ = elif
+ನಿಜವಾಗಿದ್ದರೆ = is true
+ನಿಜವಾಗಿರುವ = true
+ನಿಜವಾಗಿರಬೇಕು = must be true
+ಸತ್ಯವಿದ್ದರೆ = is true
+ಸತ್ಯವಾಗಿರಬೇಕು = must be true
+ಸುಳ್ಳಾದ = false
+ಇದ್ದರೆ = is
+ಇದ್ದರೇ = is
+ಇದಾದರೆ = is
+ಆಗಿದ್ದರೆ = is
+ಇರಬೇಕು = must be
+ಇರಬಹುದು = can be
+ವೇರಿಯಬಲ್ = variable
+ವೇರಿಯೇಬಲ್ = variable
+ಸಂಖ್ಯೆ = number
+ಸಂಖ್ಯಾ = number
+ಮೌಲ್ಯ = value
+ಬಳಕೆದಾರ = user
+ಬಳಕೆದಾರರು = user
+ಬಳಕೆದಾರರ = user
+ಬಳಕೆದಾರನ = user
+ಇನ್ಪುಟ್ = input
+ಆದಾನ = input
+ಫಲಿತಾಂಶ = result
+ಉತ್ತರ = answer
+ಮೊತ್ತ = sum
+ಸಮ್ = sum
+ಸಮ = even
+ಬೆಸ = odd
+ಲೂಪ್ = loop
+ಲೂಪಿನ = loop
+ಫಾರ್ = for
+ವೈಲ್ = while
+ಷರತ್ತು = condition
+ಶರತ್ತು = condition
+ಷರತ್ತಿನೊಂದಿಗೆ = with the condition
+ಪಟ್ಟಿ = list
+ಸ್ಟ್ರಿಂಗ್ = string
+ಸ್ರಿಂಗ್ = string
+ಅಕ್ಷರ = character
+ಪಾತ್ರ = character
+ಪದ = word
+ವಾಕ್ಯ = sentence
+ಸಾಲು = line
+ಸಾಲಿನ = line
+ಹೆಸರು = name
+ವಯಸ್ಸು = age
+ವರ್ಷ = year
+ಗ್ರೇಡ್ = grade
+ಫ್ಲೋಟ್ = float
+ಫ್ಲೋಟಿಂಗ್ = floating
+ಇಂಟೀಜರ್ = integer
+ಇನ್ಟೀಜರ್ = integer
+ದಶಮಾಂಶ = decimal
+ದಶಮಾಂಕ = decimal
+ಪೈ = pi
+ತ್ರಿಜ್ಯ = radius
+ರೇಡಿಯಸ್ = radius
+ಸುತ್ತಳತೆ = circumference
+ಏರಿಯಾ = area
+ವಿಸ್ತೀರ್ಣ = area
+ಬಡ್ಡಿ = interest
+ಸೆಲ್ಸಿಯಸ್ = celsius
+ಕೆಲ್ವಿನ್ = kelvin
+ಫ್ಯಾರನ್ಹೀಟ್ = fahrenheit
+ಫ್ಯಾಕ್ಟೋರಿಯಲ್ = factorial
+ಫಿಬೊನಾಕಿ = fibonacci
+ವರ್ಗ = square
+ಪ್ರಾಡಕ್ಟ್ = product
+ಗುಣಲಬ್ಧ = product
+ವ್ಯತ್ಯಾಸ = difference
+ಶೇಷ = remainder
+ಪೈಥಾನ್ = python
+ಭಾಷೆ = language
+ಲಾಂಗ್ವೇಜ್ = language
+ಹಿಮ್ಮುಖ = reverse
+ಧನಾತ್ಮಕ = positive
+ಪಾಸಿಟಿವ್ = positive
+ಋಣಾತ್ಮಕ = negative
+ನೆಗೆಟಿವ್ = negative
+ಡೇಟಾ = data
+ಪ್ರಕಾರ = type
+ಸ್ವಾಭಾವಿಕ = natural
+ಅವಿಭಾಜ್ಯ = prime
+ಉಳಿದ = remaining
+ಪ್ಲಸ್ = plus
+ನಿಜ = true
+ಸತ್ಯ = true
+ಸುಳ್ಳು = false
+ಹಾಯ್ = hi
+ಹಲೋ = hello
+ನಮಸ್ತೆ = hello
+ವರ್ಲ್ಡ್ = world
+ಜಗತ್ತು = world
+ಹೊಸ = new
+ಅನ್ನು =
+ಎಂಬ = named
+ಎನ್ನುವ = named
+ಎಂದು =
+ಅಂತ =
+ಅಂದರೆ = that is
+ಅದರಲ್ಲಿ = in it
+ಅದಕ್ಕೆ = to it
+ಅದನ್ನು = it
+ಅದು = it
+ಇದು = this
+ಈ = this
+ಆ = that
+ಅವುಗಳ = their
+ನನ್ನ = my
+ನೀವು = you
+ಈಗ = now
+ನಂತರ = then
+ಒಳಗೆ = inside
+ಒಳಗಡೆ = inside
+ಮೇಲೆ = on
+ಎಲ್ಲದಕ್ಕಿಂತ = than all
+ಎಲ್ಲಕ್ಕಿಂತ = than all
+ಅತ್ಯಂತ = most
+ಎಲ್ಲಾ = all
+ನೀಡುವ = given
+ನೀಡಿದ = given
+ಕೊಟ್ಟ = given
+ಒದಗಿಸಲಾದ = provided
+ಕೂಡಿರುವ = containing
+""")
+
+# Plain English numbers for reading and rendering slots
+_ENGLISH_UNITS = [
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen",
+]
+_ENGLISH_TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+_ENGLISH_VALUES = {word: value for value, word in enumerate(_ENGLISH_UNITS)}
+_ENGLISH_VALUES.update({word: value * 10 for value, word in enumerate(_ENGLISH_TENS) if word})
+_ENGLISH_VALUES.update({"hundred": 100, "thousand": 1000})
+_ENGLISH_NUMBER_PATTERN = "|".join(sorted(_ENGLISH_VALUES, key=len, reverse=True))
+_ENGLISH_SLOT_PATTERN = re.compile(
+    rf"\b(?:(?P<digits>\d+(?:\.\d+)?)|(?P<words>(?:{_ENGLISH_NUMBER_PATTERN})(?:-(?:{_ENGLISH_NUMBER_PATTERN}))?)"
+    r"|(?P<letter>[A-Za-z]))\b",
+    re.IGNORECASE
+)
+
+
+def _english_words(value: int) -> str:
+    """Spell out 0-999 the way the dataset does ("twenty-five")"""
+    if value < 20:
+        return _ENGLISH_UNITS[value]
+    if value < 100:
+        tens, units = divmod(value, 10)
+        return _ENGLISH_TENS[tens] + (f"-{_ENGLISH_UNITS[units]}" if units else "")
+    if value < 1000:
+        hundreds, rest = divmod(value, 100)
+        return f"{_ENGLISH_UNITS[hundreds]} hundred" + (f" {_english_words(rest)}" if rest else "")
+    return str(value)
+
+
+def _english_value(text: str) -> Optional[str]:
+    parts = text.lower().split("-")
+    if all(part in _ENGLISH_VALUES for part in parts):
+        return str(sum(_ENGLISH_VALUES[part] for part in parts))
+    return None
+
+
+def _number_words() -> Dict[str, int]:
+    """Every number word plus its oblique stem (ಒಂದು -> ಒಂದ, as in ಒಂದರಿಂದ)"""
+    words = dict(_UNITS)
+    words.update(_TENS)
+    words.update(_OTHER_NUMBERS)
+    for tens_word, tens in _TENS.items():
+        for unit_word, unit in _UNITS.items():
+            initial = unit_word[0]
+            if initial in _VOWEL_SIGNS:
+                compound = tens_word[:-1] + _VOWEL_SIGNS[initial] + unit_word[1:]
+            else:
+                compound = tens_word[:-2] + unit_word
+            words[compound] = tens + unit
+    for word, value in list(words.items()):
+        if word.endswith("ು"):
+            words[word[:-1]] = value
+    return words
+
+
+class _TrieNode:
+    __slots__ = ("children", "value")
+
+    def __init__(self):
+        self.children = {}
+        self.value = None
+
+
+class Trie:
+    """Trie over any sequence type (characters of a word, or tokens of a sentence)"""
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, key, value, replace: bool = True):
+        node = self.root
+        for part in key:
+            node = node.children.setdefault(part, _TrieNode())
+        if replace or node.value is None:
+            node.value = value
+
+    def prefixes(self, sequence, start: int = 0) -> List[Tuple[int, object]]:
+        """Every (end, value) whose key is a prefix of sequence[start:], longest first"""
+        matches = []
+        node = self.root
+        for index in range(start, len(sequence)):
+            node = node.children.get(sequence[index])
+            if node is None:
+                break
+            if node.value is not None:
+                matches.append((index + 1, node.value))
+        matches.reverse()
+        return matches
+
+
+@dataclass
+class OfflineTranslation:
+    """Result of an offline translation"""
+    text: str
+    coverage: float  # Share of Kannada words that were understood (1.0 = all)
+    method: str      # "phrase_table" or "glossary"
+
+
+@dataclass
+class _Word:
+    """One analysed input word"""
+    surface: str
+    english: str = ""
+    kind: str = "word"       # word, verb, comparative, number, variable, other
+    prep: str = ""
+    known: bool = True
+    slot: Optional[str] = None  # "#<value>" for numbers, "@<letter>" for variables
+
+
+class OfflineTranslator:
+    """Dataset-driven Kannada to English translator with a glossary fallback"""
+
+    def __init__(self, pairs: List[Tuple[str, str]] = ()):
+        self._phrases = Trie()
+        for kannada, (english, kind) in GLOSSARY.items():
+            self._phrases.insert(self._normalize(kannada).split(), (english, kind))
+
+        self._stems = Trie()
+        for word, value in _number_words().items():
+            self._stems.insert(word, ("number", str(value)))
+        for word, letter in VARIABLE_LETTERS.items():
+            self._stems.insert(word, ("variable", letter))
+        for kannada, (english, kind) in GLOSSARY.items():
+            if " " not in kannada and english:
+                for stem in self._oblique_stems(kannada):
+                    self._stems.insert(stem, (kind, english))
+
+        self._templates = Trie()
+        self.template_count = 0
+        for kannada, english in pairs:
+            self.add_example(kannada, english)
+
+    @classmethod
+    def from_dataset(cls, dataset_path: str = "lang_dataset.json") -> "OfflineTranslator":
+        """Build the phrase table from the 'kannada text' / 'text' pairs of the dataset"""
+        with open(dataset_path, encoding="utf-8") as f:
+            records = json.load(f)
+        return cls([
+            (record["kannada text"], record["text"])
+            for record in records
+            if record.get("kannada text") and record.get("text")
+        ])
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        text = unicodedata.normalize("NFC", text).translate(_JOINERS).translate(_KANNADA_DIGITS)
+        return " ".join(text.split())
+
+    @staticmethod
+    def _oblique_stems(word: str) -> List[str]:
+        """Forms a word takes before a case ending (ಲೂಪ್ -> ಲೂಪ, ಲೂಪಿ)"""
+        stems = [word]
+        if word.endswith("ು"):
+            stems.append(word[:-1])
+        elif word.endswith("್"):
+            stems.extend([word[:-1], word[:-1] + "ಿ"])
+        return stems
+
+    def _analyse_kannada(self, word: str) -> _Word:
+        """Split a Kannada word into a known stem plus a case ending"""
+        for end, (kind, english) in self._stems.prefixes(word):
+            suffix = word[end:]
+            if suffix not in SUFFIXES or (suffix and kind in ("verb", "comparative")):
+                continue
+            if kind == "variable" and suffix not in _VARIABLE_SUFFIXES:
+                continue
+            analysed = _Word(word, english, kind, SUFFIXES[suffix])
+            if kind == "number":
+                analysed.slot = f"#{english}"
+            elif kind == "variable":
+                analysed.slot = f"@{english}"
+            elif suffix in _PLURAL_SUFFIXES and not english.endswith("s"):
+                analysed.english = english + "s"
+            return analysed
+        return _Word(word, word, "word", known=False)
+
+    def _analyse(self, text: str) -> List[_Word]:
+        """Tokenize with longest-match phrase lookup, then stem + ending analysis"""
+        tokens = _TOKEN_PATTERN.findall(self._normalize(text))
+        words = []
+        index = 0
+        while index < len(tokens):
+            match = self._phrases.prefixes(tokens, index)
+            if match:
+                end, (english, kind) = match[0]
+                words.append(_Word(" ".join(tokens[index:end]), english, kind))
+                index = end
+                continue
+
+            token = tokens[index]
+            if (token in SUFFIXES and token not in VARIABLE_LETTERS
+                    and words and words[-1].kind != "other" and not words[-1].prep):
+                # Case ending written apart from its word ("1 ರಿಂದ", "ಬಿ ಗೆ")
+                words[-1].surface += " " + token
+                words[-1].prep = SUFFIXES[token]
+            elif re.fullmatch(r"[ಀ-೿]+", token):
+                words.append(self._analyse_kannada(token))
+            elif re.fullmatch(r"\d+(?:\.\d+)?", token):
+                words.append(_Word(token, token, "number", slot=f"#{token}"))
+            elif re.fullmatch(r"[A-Za-z]", token):
+                words.append(_Word(token, token, "variable", slot=f"@{token.upper()}"))
+            else:
+                words.append(_Word(token, token, "other"))
+            index += 1
+
+        # A closing full stop does not change the sentence
+        while words and words[-1].surface in (".", "।"):
+            words.pop()
+
+        # A bare ಒಂದು before a noun is the article: "ಒಂದು ಪಟ್ಟಿ" is "a list", not "1 list"
+        for word, following in zip(words, words[1:]):
+            if word.surface == _ARTICLE and not word.prep and following.kind == "word":
+                word.english, word.kind, word.slot = "a", "word", None
+        return words
+
+    def add_example(self, kannada: str, english: str):
+        """Add one sentence pair to the phrase table, abstracting aligned numbers and variables"""
+        words = self._analyse(kannada)
+        english = " ".join(english.split())
+        slots = [word.slot for word in words if word.slot]
+
+        # Align English numbers and letters with the Kannada slots holding the same value
+        parts: List[object] = []
+        used = set()
+        position = 0
+        for match in _ENGLISH_SLOT_PATTERN.finditer(english):
+            if match.group("digits"):
+                slot, style = f"#{match.group('digits')}", "digits"
+            elif match.group("words"):
+                value = _english_value(match.group("words"))
+                slot, style = (f"#{value}", "words") if value is not None else (None, None)
+            elif match.group("letter") != "a":  # the article, not variable A
+                letter = match.group("letter")
+                slot, style = f"@{letter.upper()}", "upper" if letter.isupper() else "lower"
+            else:
+                continue
+            index = next((i for i, s in enumerate(slots) if s == slot and i not in used), None)
+            if index is None:
+                continue
+            used.add(index)
+            parts.append(english[position:match.start()])
+            parts.append((index, style))
+            position = match.end()
+        parts.append(english[position:])
+
+        # Unaligned Kannada numbers/letters stay literal (e.g. ಒಂದು as "a", not 1)
+        slot_numbers = {}
+        key = []
+        slot_index = 0
+        for word in words:
+            if word.slot:
+                if slot_index in used:
+                    slot_numbers[slot_index] = len(slot_numbers)
+                    key.append("<NUM>" if word.slot.startswith("#") else "<VAR>")
+                else:
+                    key.append(word.slot)
+                key.append(f"+{word.prep or '-'}")
+                slot_index += 1
+            else:
+                key.append(word.surface)
+
+        template = [
+            part if isinstance(part, str) else (slot_numbers[part[0]], part[1])
+            for part in parts
+        ]
+        # The first pair wins when the dataset has several translations of one sentence
+        self._templates.insert(key, template, replace=False)
+        self.template_count += 1
+
+    def _match_template(self, words: List[_Word]):
+        """Find a phrase-table sentence with the same shape; returns (template, slot values)"""
+        def walk(node, index, values):
+            if index == len(words):
+                return (node.value, values) if node.value is not None else None
+            word = words[index]
+            if word.slot:
+                ending = node.children
+                wildcard = "<NUM>" if word.slot.startswith("#") else "<VAR>"
+                for token, value in ((word.slot, None), (wildcard, word.slot)):
+                    child = ending.get(token)
+                    if child is None:
+                        continue
+                    child = child.children.get(f"+{word.prep or '-'}")
+                    if child is None:
+                        continue
+                    found = walk(child, index + 1, values + [value] if value else values)
+                    if found:
+                        return found
+                return None
+            child = node.children.get(word.surface)
+            return walk(child, index + 1, values) if child is not None else None
+
+        return walk(self._templates.root, 0, [])
+
+    @staticmethod
+    def _render_template(template, values: List[str]) -> str:
+        rendered = []
+        for part in template:
+            if isinstance(part, str):
+                rendered.append(part)
+                continue
+            value = values[part[0]][1:]
+            style = part[1]
+            if style == "words" and value.isdigit() and int(value) < 1000:
+                rendered.append(_english_words(int(value)))
+            elif style == "lower":
+                rendered.append(value.lower())
+            else:
+                rendered.append(value)
+        return "".join(rendered)
+
+    @staticmethod
+    def _render_gloss(words: List[_Word]) -> str:
+        """Word-by-word English with Kannada verb-final clauses reordered verb-first"""
+        clauses = [[]]
+        separators = []
+        for word in words:
+            if word.kind == "conjunction" and clauses[-1] and clauses[-1][-1].kind == "verb":
+                # "ಓದಿ ಮತ್ತು ಮುದ್ರಿಸಿ" joins two commands
+                clauses.append([])
+                separators.append(f" {word.english} ")
+                continue
+            clauses[-1].append(word)
+            if word.surface.endswith(_CLAUSE_ENDINGS) and word is not words[-1]:
+                clauses.append([])
+                separators.append(", ")
+
+        rendered = []
+        for clause in clauses:
+            if len(clause) > 1 and clause[-1].kind == "verb":
+                clause = [clause[-1]] + clause[:-1]
+            pieces = []
+            index = 0
+            while index < len(clause):
+                word = clause[index]
+                english = "i" if word.kind == "variable" and word.english == "I" else word.english
+                following = clause[index + 1] if index + 1 < len(clause) else None
+                # "ಸೊನ್ನೆಗಿಂತ ದೊಡ್ಡದು" (than zero greater) -> "greater than 0"
+                if word.prep in ("than", "to") and following is not None and following.kind == "comparative":
+                    pieces.extend([following.english, word.prep, english])
+                    index += 2
+                    continue
+                pieces.extend([word.prep, english])
+                index += 1
+            rendered.append(" ".join(piece for piece in pieces if piece))
+
+        text = rendered[0]
+        for separator, clause in zip(separators, rendered[1:]):
+            text += separator + clause
+        return re.sub(r"\s+([.,?!])", r"\1", text.strip())
+
+    def translate(self, text: str) -> OfflineTranslation:
+        """Translate Kannada text, as one phrase-table entry if possible, else sentence by sentence"""
+        text = self._normalize(text)
+        words = self._analyse(text)
+        match = self._match_template(words)
+        if match is not None:
+            return OfflineTranslation(self._render_template(*match), 1.0, "phrase_table")
+
+        translations = []
+        known = total = 0
+        method = "phrase_table"
+        for sentence in _SENTENCE_PATTERN.split(text):
+            words = self._analyse(sentence)
+            kannada_words = [word for word in words if re.search(r"[ಀ-೿]", word.surface)]
+            total += len(kannada_words)
+
+            match = self._match_template(words)
+            if match is not None:
+                translations.append(self._render_template(*match))
+                known += len(kannada_words)
+            else:
+                translations.append(self._render_gloss(words))
+                known += sum(1 for word in kannada_words if word.known)
+                method = "glossary"
+
+        return OfflineTranslation(
+            text=" ".join(translation for translation in translations if translation),
+            coverage=known / total if total else 1.0,
+            method=method
+        )
@@ -0,0 +1,198 @@
+"""
+Resilience helpers for remote calls in Codelex
+Wraps a blocking remote function (e.g. Google Translate) with:
+- A per-call deadline, enforced by running the call on a worker thread
+- A circuit breaker that fails fast after repeated failures and probes
+  for recovery in the background
+- Optional hedging: once a latency threshold passes, a local fallback is
+  tried in parallel and used if it has an answer
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional, Tuple
+
+from metrics import REMOTE_CALLS
+
+
+class DeadlineExceeded(TimeoutError):
+    """The remote call did not finish within its deadline"""
+
+
+class CircuitOpenError(RuntimeError):
+    """The circuit breaker is open, so the remote call was not attempted"""
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through, consecutive failures are counted
+    Open: calls are rejected until the service recovers
+    Half-open: a single trial call decides between closed and open
+
+    With a probe function, recovery is checked by a background thread
+    calling probe() every reset_timeout seconds; without one, the first
+    call after reset_timeout is let through as the trial.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        probe: Callable[[], Any] = None
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if (self.state == self.OPEN and self.probe is None
+                    and time.monotonic() - self.opened_at >= self.reset_timeout):
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"✅ Circuit '{self.name}' closed, remote service recovered")
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self._open()
+
+    def _open(self):
+        # Called with the lock held
+        print(f"⚠️  Circuit '{self.name}' opened after {self.failures} failure(s)")
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        if self.probe is not None and not self._probing:
+            self._probing = True
+            threading.Thread(target=self._probe_loop, name=f"codelex-probe-{self.name}", daemon=True).start()
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.reset_timeout)
+            with self._lock:
+                if self.state == self.CLOSED:
+                    # A late call succeeded in the meantime
+                    self._probing = False
+                    return
+            try:
+                self.probe()
+            except Exception:
+                with self._lock:
+                    self.opened_at = time.monotonic()
+                continue
+            with self._lock:
+                self._probing = False
+            self.record_success()
+            return
+
+
+class RemoteCall:
+    """Runs a blocking function with a deadline, a circuit breaker and optional hedging"""
+
+    def __init__(
+        self,
+        fn: Callable[..., Any],
+        name: str,
+        timeout: float = 3.0,
+        breaker: CircuitBreaker = None,
+        hedge_after: float = None,
+        max_workers: int = 8
+    ):
+        self.fn = fn
+        self.name = name
+        self.timeout = timeout
+        self.breaker = breaker
+        self.hedge_after = hedge_after
+        # Threads of calls that blew their deadline keep running here until the call returns
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"codelex-{name}")
+        # Probes get their own thread, so calls hung on the main executor can't starve them
+        self._probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"codelex-{name}-probe")
+
+    def run(self, *args, timeout: float = None) -> Any:
+        """Call fn with a deadline only (used by the breaker's recovery probe)"""
+        future = self._probe_executor.submit(self.fn, *args)
+        try:
+            return future.result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            raise DeadlineExceeded(f"{self.name} did not answer within {timeout or self.timeout}s")
+
+    def call(self, *args, hedge: Callable[[], Optional[Any]] = None) -> Tuple[Any, str]:
+        """
+        Call fn(*args) and return (result, "primary")
+        If hedging is enabled and fn is still running after hedge_after seconds,
+        hedge() is tried; a non-None answer is returned as (answer, "hedge") while
+        fn keeps running in the background. Raises CircuitOpenError,
+        DeadlineExceeded or the exception raised by fn.
+        """
+        if self.breaker is not None and not self.breaker.allow():
+            REMOTE_CALLS.inc(self.name, "rejected")
+            raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+        started = time.monotonic()
+        # Acquired by whichever of the caller and the completion callback counts the call first
+        settled = threading.Lock()
+        future = self._executor.submit(self.fn, *args)
+
+        def account(done):
+            # Late results still tell the breaker whether the service works
+            if not settled.acquire(blocking=False):
+                return
+            if done.exception() is None:
+                REMOTE_CALLS.inc(self.name, "success")
+                if self.breaker is not None:
+                    self.breaker.record_success()
+            else:
+                REMOTE_CALLS.inc(self.name, "failure")
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+
+        if hedge is not None and self.hedge_after is not None and self.hedge_after < self.timeout:
+            try:
+                future.result(timeout=self.hedge_after)
+            except FutureTimeoutError:
+                answer = hedge()
+                if answer is not None:
+                    REMOTE_CALLS.inc(self.name, "hedged")
+                    future.add_done_callback(account)
+                    return answer, "hedge"
+            except Exception:
+                pass
+
+        try:
+            result = future.result(timeout=max(0.0, self.timeout - (time.monotonic() - started)))
+        except FutureTimeoutError:
+            if settled.acquire(blocking=False):
+                REMOTE_CALLS.inc(self.name, "timeout")
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+            raise DeadlineExceeded(f"{self.name} did not answer within {self.timeout}s")
+        finally:
+            if future.done():
+                account(future)
+        return result, "primary"
@@ -0,0 +1,166 @@
+"""
+Exemplar retrieval for Codelex
+Indexes the Kannada/English/code triples in lang_dataset.json so that
+prompts close to a known example can be answered without the model:
+- Character trigram TF-IDF vectors in a NumPy matrix (one per field)
+- Cosine similarity lookup against 'kannada text' or 'text'
+- A match is rejected when the query and exemplar differ in a number,
+  a short token (usually a variable name) or a control-flow word
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Latin and Kannada digits are both treated as numbers
+_NUMBER_PATTERN = re.compile(r"[0-9೦-೯]+")
+_KANNADA_DIGITS = str.maketrans("೦೧೨೩೪೫೬೭೮೯", "0123456789")
+_WORD_PATTERN = re.compile(r"[^\s.,!?;:'\"()]+")
+# Kannada letters that start an akshara (vowels and consonants, not signs)
+_KANNADA_LETTER = re.compile(r"[\u0c85-\u0cb9\u0cde\u0ce0\u0ce1]")
+
+# Words that change the code of an otherwise identical prompt
+_CONTROL_WORDS = {
+    "if", "elif", "else", "otherwise", "not", "or", "and", "while", "until", "unless", "print",
+    "ಇಲ್ಲದಿದ್ದರೆ", "ಇಲ್ಲವಾದರೆ", "ಇತರವು", "ಇಲ್ಲ", "ಅಥವಾ", "ಮತ್ತು", "ಹಾಗೂ", "ಮುದ್ರಿಸಿ", "ಪ್ರಿಂಟ್",
+}
+
+
+def _ngrams(text: str, n: int = 3) -> List[str]:
+    """Character n-grams of whitespace-normalized, lowercased text"""
+    padded = f" {' '.join(text.lower().split())} "
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+def _is_distinguishing(word: str) -> bool:
+    """Whether a word that differs between two prompts likely changes the code"""
+    if word in _CONTROL_WORDS or _NUMBER_PATTERN.search(word):
+        return True
+    kannada_letters = len(_KANNADA_LETTER.findall(word))
+    if kannada_letters:
+        return kannada_letters <= 3
+    return len(word) <= 2
+
+
+def _signature(text: str) -> List[str]:
+    """Numbers, short tokens and control words of a prompt, in order"""
+    words = _WORD_PATTERN.findall(text.lower().translate(_KANNADA_DIGITS))
+    return [word for word in words if _is_distinguishing(word)]
+
+
+class ExemplarIndex:
+    """Character n-gram TF-IDF index over dataset exemplars"""
+
+    FIELDS = ("kannada text", "text")
+
+    def __init__(self, exemplars: List[Dict[str, str]], threshold: float = None):
+        self.threshold = threshold if threshold is not None else float(os.getenv("CODELEX_RETRIEVAL_THRESHOLD", "0.92"))
+
+        # Drop exact duplicates, keeping the first occurrence
+        seen = set()
+        self.exemplars = []
+        for exemplar in exemplars:
+            key = tuple(exemplar.get(field, "") for field in ("kannada text", "text", "code"))
+            if key not in seen and exemplar.get("code"):
+                seen.add(key)
+                self.exemplars.append(exemplar)
+
+        self._signatures = {
+            field: [_signature(exemplar.get(field, "")) for exemplar in self.exemplars]
+            for field in self.FIELDS
+        }
+        self._vocab = {}
+        self._idf = {}
+        self._matrix = {}
+        for field in self.FIELDS:
+            self._build(field)
+
+    @classmethod
+    def from_dataset(cls, dataset_path: str = "lang_dataset.json", **kwargs) -> "ExemplarIndex":
+        """Build the index from a JSON list of exemplars"""
+        with open(dataset_path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    def _build(self, field: str):
+        documents = [Counter(_ngrams(exemplar.get(field, ""))) for exemplar in self.exemplars]
+
+        document_frequency = Counter()
+        for counts in documents:
+            document_frequency.update(counts.keys())
+
+        vocab = {gram: i for i, gram in enumerate(sorted(document_frequency))}
+        total = len(documents)
+        idf = np.zeros(len(vocab), dtype=np.float32)
+        for gram, i in vocab.items():
+            idf[i] = math.log((1 + total) / (1 + document_frequency[gram])) + 1.0
+
+        matrix = np.zeros((total, len(vocab)), dtype=np.float32)
+        for row, counts in enumerate(documents):
+            for gram, count in counts.items():
+                matrix[row, vocab[gram]] = 1.0 + math.log(count)
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.maximum(norms, 1e-12)
+
+        self._vocab[field] = vocab
+        self._idf[field] = idf
+        self._matrix[field] = matrix
+
+    def _vectorize(self, text: str, field: str) -> Optional[np.ndarray]:
+        vocab = self._vocab[field]
+        counts = Counter(_ngrams(text))
+        vector = np.zeros(len(vocab), dtype=np.float32)
+        # Unknown n-grams still count towards the query norm
+        unknown = 0.0
+        for gram, count in counts.items():
+            weight = 1.0 + math.log(count)
+            index = vocab.get(gram)
+            if index is None:
+                unknown += (weight * (math.log(len(self.exemplars) + 1) + 1.0)) ** 2
+            else:
+                vector[index] = weight * self._idf[field][index]
+
+        norm = math.sqrt(float(vector @ vector) + unknown)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def nearest(self, text: str, field: str = "kannada text") -> Optional[Dict]:
+        """Return the most similar exemplar and its score, regardless of threshold"""
+        if not self.exemplars or not text or not text.strip():
+            return None
+
+        query = self._vectorize(text, field)
+        if query is None:
+            return None
+
+        scores = self._matrix[field] @ query
+        query_signature = _signature(text)
+
+        # Best-scoring exemplar that agrees with the query on numbers and key words
+        for index in np.argsort(-scores)[:10]:
+            if self._signatures[field][index] != query_signature:
+                continue
+
+            exemplar = self.exemplars[index]
+            return {
+                "id": int(index),
+                "score": round(float(scores[index]), 4),
+                "field": field,
+                "text": exemplar.get("text", ""),
+                "kannada_text": exemplar.get("kannada text", ""),
+                "code": exemplar["code"],
+            }
+        return None
+
+    def lookup(self, text: str, field: str = "kannada text") -> Optional[Dict]:
+        """Return the most similar exemplar if its score clears the threshold"""
+        match = self.nearest(text, field)
+        if match and match["score"] >= self.threshold:
+            return match
+        return None
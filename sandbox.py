@@ -0,0 +1,358 @@
+"""
+Sandboxed code execution for Codelex
+Runs generated Python code in a pool of pre-started worker processes:
+- Per-job CPU time, wall-clock and output size limits
+- Per-worker address space limit
+- Workers are recycled after a fixed number of jobs
+- Results are memoized by code hash, unless the program imports a
+  non-deterministic module such as random or time
+- Workers drop root privileges and may not start processes
+
+Execution is off unless CODELEX_EXECUTE_CODE=1. The restricted builtins only
+keep well-meaning programs from touching files or importing arbitrary modules;
+a determined program can still reach the interpreter's internals, so only
+enable execution where the workers run inside an isolated container or VM.
+"""
+
+import ast
+import builtins
+import hashlib
+import io
+import itertools
+import math
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows - only the wall-clock timeout applies there
+    resource = None
+
+from caching import LRUCache
+
+ALLOWED_MODULES = {
+    "math", "random", "string", "itertools", "functools", "collections", "statistics",
+    "datetime", "decimal", "fractions", "operator", "heapq", "bisect", "re", "time",
+}
+# Programs importing these can print something different on every run
+NONDETERMINISTIC_MODULES = {"random", "time", "datetime"}
+BLOCKED_BUILTINS = {"open", "exec", "eval", "compile", "breakpoint", "help", "exit", "quit", "__import__"}
+
+
+class _LimitExceeded(BaseException):
+    """Raised inside a worker when a job hits one of its limits"""
+
+    def __init__(self, status: str, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class _BoundedOutput(io.StringIO):
+    """StringIO that stops the program once it has written max_chars characters"""
+
+    def __init__(self, max_chars: int):
+        super().__init__()
+        self.max_chars = max_chars
+        self.written = 0
+
+    def write(self, text: str) -> int:
+        remaining = self.max_chars - self.written
+        if len(text) > remaining:
+            super().write(text[:max(remaining, 0)])
+            self.written = self.max_chars
+            raise _LimitExceeded("output_limit", f"Output limit of {self.max_chars} characters exceeded")
+        self.written += len(text)
+        return super().write(text)
+
+
+def _restricted_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level != 0 or name.split(".")[0] not in ALLOWED_MODULES:
+        raise ImportError(f"Import of '{name}' is not allowed during execution")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def _is_deterministic(code: str) -> bool:
+    """Whether a program's result can be memoized (it imports no clock or random module)"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return True  # The syntax error is the same every time
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            names = [node.module or ""]
+        elif isinstance(node, ast.Name) and node.id == "__import__":
+            return False
+        else:
+            continue
+        if any(name.split(".")[0] in NONDETERMINISTIC_MODULES for name in names):
+            return False
+    return True
+
+
+def _safe_builtins() -> Dict:
+    safe = {name: value for name, value in vars(builtins).items() if name not in BLOCKED_BUILTINS}
+    safe["__import__"] = _restricted_import
+    return safe
+
+
+def _raise_limit(status: str, message: str):
+    def handler(signum, frame):
+        raise _LimitExceeded(status, message)
+    return handler
+
+
+_started_jobs = None
+
+
+def _drop_privileges(uid: int):
+    """Run as an unprivileged user when the service itself runs as root"""
+    if not hasattr(os, "geteuid") or os.geteuid() != 0:
+        return
+    os.setgroups([])
+    os.setgid(uid)
+    os.setuid(uid)
+
+
+def _init_worker(memory_mb: int, cpu_budget_seconds: int, uid: int, started_jobs):
+    """Apply limits that hold for the whole life of a worker process"""
+    global _started_jobs
+    _started_jobs = started_jobs
+    if resource is None:
+        return
+    # No fork/exec from generated code (enforced once the worker is not root)
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    _drop_privileges(uid)
+    memory_bytes = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    # Hard CPU cap for the worker's lifetime; per-job limits use the soft limit
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    hard = int(usage.ru_utime + usage.ru_stime) + cpu_budget_seconds
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+    signal.signal(signal.SIGXCPU, _raise_limit("cpu_limit", "CPU time limit exceeded"))
+
+
+def _run_job(code: str, cpu_seconds: float, timeout: float, max_output: int, job_id: int = None) -> Dict:
+    """Execute code in this worker process and report what happened"""
+    if _started_jobs is not None:
+        # Lets the pool kill this worker alone if the job never returns
+        _started_jobs.put((job_id, os.getpid()))
+    stdout = _BoundedOutput(max_output)
+    stderr = _BoundedOutput(max_output)
+    status, exit_status = "ok", 0
+
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = int(math.ceil(usage.ru_utime + usage.ru_stime + cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_CPU, (min(soft, hard), hard))
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _raise_limit("timeout", f"Execution timed out after {timeout}s"))
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    saved_streams = sys.stdout, sys.stderr, sys.stdin
+    sys.stdout, sys.stderr, sys.stdin = stdout, stderr, io.StringIO("")
+    started = time.perf_counter()
+    try:
+        compiled = compile(code, "<generated>", "exec")
+        exec(compiled, {"__builtins__": _safe_builtins(), "__name__": "__main__"})
+    except _LimitExceeded as e:
+        status, exit_status = e.status, 1
+        stderr.max_chars += 200
+        stderr.write(f"{e}\n")
+    except SystemExit as e:
+        exit_status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        status = "ok" if exit_status == 0 else "error"
+    except MemoryError:
+        status, exit_status = "memory_limit", 1
+        stderr.max_chars += 200
+        stderr.write("Memory limit exceeded\n")
+    except BaseException:
+        status, exit_status = "error", 1
+        stderr.max_chars += 2000
+        try:
+            # Only show frames from the generated program
+            error_type, error, tb = sys.exc_info()
+            while tb is not None and tb.tb_frame.f_code.co_filename != "<generated>":
+                tb = tb.tb_next
+            stderr.write("".join(traceback.format_exception(error_type, error, tb)))
+        except _LimitExceeded:
+            pass
+    finally:
+        elapsed = time.perf_counter() - started
+        if hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        sys.stdout, sys.stderr, sys.stdin = saved_streams
+
+    return {
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "exit_status": exit_status,
+        "status": status,
+        "elapsed_ms": round(elapsed * 1000, 2),
+    }
+
+
+def format_execution(result: Dict) -> str:
+    """Render an execution result for the 'execution' response field"""
+    parts = []
+    if result["stdout"]:
+        parts.append(result["stdout"].rstrip("\n"))
+    if result["stderr"]:
+        parts.append(result["stderr"].rstrip("\n"))
+    if not parts:
+        parts.append("(no output)")
+    parts.append(f"# exit status {result['exit_status']} ({result['status']}) in {result['elapsed_ms']} ms")
+    return "\n".join(parts)
+
+
+class SandboxPool:
+    """Pool of resource-limited worker processes for running generated code"""
+
+    def __init__(
+        self,
+        workers: int = None,
+        max_jobs_per_worker: int = None,
+        cpu_seconds: float = None,
+        memory_mb: int = None,
+        timeout: float = None,
+        max_output: int = None,
+        cache_size: int = None
+    ):
+        self.workers = workers or int(os.getenv("CODELEX_SANDBOX_WORKERS", "2"))
+        self.max_jobs_per_worker = max_jobs_per_worker or int(os.getenv("CODELEX_SANDBOX_JOBS_PER_WORKER", "50"))
+        self.cpu_seconds = cpu_seconds or float(os.getenv("CODELEX_SANDBOX_CPU_SECONDS", "2"))
+        self.memory_mb = memory_mb or int(os.getenv("CODELEX_SANDBOX_MEMORY_MB", "256"))
+        self.timeout = timeout or float(os.getenv("CODELEX_SANDBOX_TIMEOUT", "3"))
+        self.max_output = max_output or int(os.getenv("CODELEX_SANDBOX_MAX_OUTPUT", "10000"))
+        self.cache = LRUCache(max_entries=cache_size or int(os.getenv("CODELEX_SANDBOX_CACHE_SIZE", "1024")))
+        self.enabled = os.getenv("CODELEX_EXECUTE_CODE", "0") == "1"
+        self.uid = int(os.getenv("CODELEX_SANDBOX_UID", "65534"))
+
+        self._pool = None
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._started_jobs = None
+        self._outstanding = set()
+        self._worker_pids = {}
+        self._killed_workers = 0
+
+    def _get_pool(self):
+        # Started lazily so the service can be created before a fork
+        with self._lock:
+            if self._pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                cpu_budget = int(math.ceil((self.cpu_seconds + 1) * self.max_jobs_per_worker)) + 5
+                self._started_jobs = context.SimpleQueue()
+                self._pool = context.Pool(
+                    processes=self.workers,
+                    initializer=_init_worker,
+                    initargs=(self.memory_mb, cpu_budget, self.uid, self._started_jobs),
+                    maxtasksperchild=self.max_jobs_per_worker
+                )
+            return self._pool
+
+    def _drain_started_jobs(self):
+        # Called with the lock held; keeps the pipe from filling up
+        while self._started_jobs is not None and not self._started_jobs.empty():
+            job_id, pid = self._started_jobs.get()
+            if job_id in self._outstanding:
+                self._worker_pids[job_id] = pid
+
+    def _kill_worker(self, job_id: int) -> bool:
+        """
+        Kill the worker running job_id, e.g. after it stopped responding;
+        the pool replaces it and the other jobs keep running
+        """
+        with self._lock:
+            self._drain_started_jobs()
+            pid = self._worker_pids.get(job_id)
+        if pid is None:
+            return False
+        self._killed_workers += 1
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+        return True
+
+    def _forget(self, job_id: int):
+        with self._lock:
+            self._drain_started_jobs()
+            self._outstanding.discard(job_id)
+            self._worker_pids.pop(job_id, None)
+
+    def _submit(self, code: str):
+        job_id = next(self._job_ids)
+        with self._lock:
+            self._outstanding.add(job_id)
+        pending = self._get_pool().apply_async(_run_job, (code, self.cpu_seconds, self.timeout, self.max_output, job_id))
+        return job_id, pending
+
+    def _collect(self, code: str, job) -> Dict:
+        job_id, pending = job
+        started = time.perf_counter()
+        try:
+            # The worker enforces the timeout itself; the margin covers queueing
+            result = pending.get(timeout=self.timeout * 2 + 5)
+        except multiprocessing.TimeoutError:
+            stopped = self._kill_worker(job_id)
+            self._forget(job_id)
+            return {
+                "stdout": "",
+                "stderr": "Execution did not finish and the worker was stopped\n" if stopped
+                else "Execution did not start in time\n",
+                "exit_status": 1,
+                "status": "timeout",
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            }
+
+        self._forget(job_id)
+        if _is_deterministic(code):
+            self.cache.set(hashlib.sha256(code.encode("utf-8")).hexdigest(), result)
+        return result
+
+    def execute(self, code: str) -> Dict:
+        """Run code in a worker and return stdout, stderr, exit status and elapsed time"""
+        return self.execute_many([code])[0]
+
+    def execute_many(self, codes: List[str]) -> List[Dict]:
+        """Run several programs in parallel across the pool, memoizing deterministic ones by code hash"""
+        if not self.enabled:
+            raise RuntimeError("Code execution is disabled (set CODELEX_EXECUTE_CODE=1 to enable it)")
+        results = {}
+        pending = {}
+        for code in dict.fromkeys(codes):
+            cached = self.cache.get(hashlib.sha256(code.encode("utf-8")).hexdigest())
+            if cached is not None:
+                results[code] = cached
+            else:
+                pending[code] = self._submit(code)
+
+        for code, job in pending.items():
+            results[code] = self._collect(code, job)
+
+        return [results[code] for code in codes]
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                if self._killed_workers:
+                    # Jobs of killed workers never finish, so join() would wait forever
+                    self._pool.terminate()
+                else:
+                    self._pool.close()
+                self._pool.join()
+                self._pool = None
+                self._outstanding.clear()
+                self._worker_pids.clear()
+                self._killed_workers = 0
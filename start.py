@@ -2,11 +2,21 @@
 """
 Startup script for Codelex Backend API
 Checks dependencies and starts the FastAPI server
+
+Development (default): single process with auto-reload
+    python start.py
+Production: the model is loaded once, then N workers are forked and
+share its weights copy-on-write while serving one listening socket
+    python start.py --production --workers 4
 """
 
+import argparse
 import sys
 import subprocess
 import os
+import signal
+import socket
+import time
 
 def check_dependencies():
     """Check if required packages are installed"""
@@ -14,7 +24,7 @@ def check_dependencies():
         'fastapi',
         'uvicorn',
         'transformers',
-        'deep_translator',
+        'requests',
         'torch'
     ]
     
@@ -37,7 +47,7 @@ def check_dependencies():
 
 def check_model():
     """Check if model exists"""
-    model_path = "./kannada_python_t5_model"
+    model_path = os.getenv("CODELEX_MODEL_PATH", "./kannada_python_t5_model")
     if not os.path.exists(model_path):
         print(f"⚠️  Model not found at {model_path}")
         print("💡 The system will use the base CodeT5 model instead.")
@@ -47,11 +57,11 @@ def check_model():
     print(f"✅ Model found at {model_path}")
     return True
 
-def start_server():
+def start_server(host: str = "0.0.0.0", port: int = 8000):
     """Start the FastAPI server"""
     print("\n🚀 Starting Codelex API Server...")
-    print("📡 API will be available at: http://localhost:8000")
-    print("📚 API Docs at: http://localhost:8000/docs")
+    print(f"📡 API will be available at: http://localhost:{port}")
+    print(f"📚 API Docs at: http://localhost:{port}/docs")
     print("\nPress CTRL+C to stop the server\n")
     
     try:
@@ -59,25 +69,142 @@ def start_server():
             sys.executable, "-m", "uvicorn",
             "api:app",
             "--reload",
-            "--host", "0.0.0.0",
-            "--port", "8000"
+            "--host", host,
+            "--port", str(port)
         ])
     except KeyboardInterrupt:
         print("\n\n👋 Server stopped")
         sys.exit(0)
 
+def limit_threads(threads: int):
+    """
+    Cap the math library thread pools of this process
+    Must run before torch is imported to cover OpenMP/MKL
+    """
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    # The Rust tokenizer thread pool does not survive fork() once used
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    
+    if "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(threads)
+
+def _serve_worker(app, sock: socket.socket, threads: int):
+    """Body of a forked worker process: serve the shared socket until told to stop"""
+    import uvicorn
+    
+    limit_threads(threads)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info", timeout_graceful_shutdown=30))
+    server.run(sockets=[sock])
+
+def _spawn_worker(app, sock: socket.socket, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _serve_worker(app, sock, threads)
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+def start_production_server(host: str, port: int, workers: int, threads: int = None):
+    """
+    Preload the model in this process, then fork workers sharing the listening socket
+    Workers inherit the loaded weights as copy-on-write pages; each one warms up
+    on its own and reports ready through /health/ready. Dead workers are replaced.
+    """
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    limit_threads(threads)
+    
+    if not hasattr(os, "fork"):
+        # Windows: no fork, so no shared weights - run a single process without reload
+        import uvicorn
+        print("⚠️  fork() is not available on this platform, starting a single worker")
+        uvicorn.run("api:app", host=host, port=port, workers=1)
+        return
+    
+    import gc
+    import api
+    
+    print(f"📦 Preloading model in the parent process ({threads} torch thread(s) per worker)...")
+    api.preload_service()
+    # Keep the garbage collector from touching (and so copying) the shared objects
+    gc.collect()
+    gc.freeze()
+    
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    
+    print(f"\n🚀 Starting {workers} Codelex API workers on http://{host}:{port}")
+    children = {_spawn_worker(api.app, sock, threads) for _ in range(workers)}
+    
+    stopping = False
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️  Worker {pid} exited (status {status}), starting a replacement")
+            time.sleep(1)
+            children.add(_spawn_worker(api.app, sock, threads))
+    
+    sock.close()
+    print("\n👋 Server stopped")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start the Codelex API server")
+    parser.add_argument("--production", action="store_true",
+                        help="Preload the model and fork worker processes instead of running with --reload")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("CODELEX_WORKERS", "2")),
+                        help="Worker processes in production mode")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("CODELEX_TORCH_THREADS", "0")) or None,
+                        help="Torch threads per worker (default: CPU cores / workers)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("  CODELEX BACKEND - Regional Language to Python Converter")
     print("=" * 60)
     print()
     
     # Change to script directory to ensure correct imports
-    import os
     script_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(script_dir)
+    sys.path.insert(0, script_dir)
     print(f"📁 Working directory: {os.getcwd()}")
     
+    if args.production:
+        # check_dependencies() imports torch, so the thread limits must be in place first
+        args.threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+        limit_threads(args.threads)
+    
     # Check dependencies
     print("\n🔍 Checking dependencies...")
     if not check_dependencies():
@@ -89,4 +216,7 @@ if __name__ == "__main__":
     check_model()
     
     # Start server
-    start_server()
+    if args.production:
+        start_production_server(args.host, args.port, args.workers, args.threads)
+    else:
+        start_server(args.host, args.port)
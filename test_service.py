@@ -2,7 +2,13 @@
 Quick test script for the updated model service
 """
 
+import asyncio
+
+from caching import ResponseCache
+from code_analysis import ANALYSIS_FAILED, code_feedback
+from intents import parse_intent, render_python_code
 from model_service import ModelService
+from offline_translator import OfflineTranslator
 
 def test_code_generation():
     print("🧪 Testing Updated Model Service...")
@@ -45,5 +51,69 @@ def test_code_generation():
     print("\n" + "="*60)
     print("🎉 All tests completed!")
 
+def test_feedback_huge_range():
+    # The sum template for a 21-digit bound used to crash the feedback stage
+    intent = parse_intent("Calculate the sum of numbers from 1 to 100000000000000000000")
+    feedback = code_feedback("\n".join(render_python_code(intent)))
+    assert "✓ Good use of for loop with range() function" in feedback
+    assert any("5000000000000000000050000000000000000000" in point for point in feedback)
+
+    # range() with a zero step raises ValueError; it must not be folded
+    feedback = code_feedback("total = 0\nfor i in range(1, 5, 0):\n    total += i\nprint(total)")
+    assert not any("computes it without a loop" in point for point in feedback)
+
+    # Programs the parser can't handle get a neutral note, not substring guesses
+    assert code_feedback("x = " + "1+" * 100000 + "1") == [ANALYSIS_FAILED]
+
+def test_intent_rules():
+    # A rule whose keywords match but whose arguments are missing leaves the prompt to the model
+    assert parse_intent("Print numbers from 1 to n").name is None
+    assert parse_intent("Print numbers between 1 and 10").name == "loop"
+    assert render_python_code(parse_intent("Assign number 12 to variable B")) == ["B = 12"]
+    assert render_python_code(parse_intent("A number 7 is stored in variable n")) == ["n = 7"]
+    assert render_python_code(parse_intent("Print hello world")) == ['print("Hello, World!")']
+
+def test_number_words():
+    # Scale words multiply the number before them instead of counting as numbers
+    intent = parse_intent("Print numbers from one hundred to two hundred")
+    assert intent.numbers == ["100", "200"]
+    assert render_python_code(intent)[0] == "for i in range(100, 201):"
+    assert parse_intent("Add two hundred and seventy-three").numbers == ["273"]
+    assert parse_intent("Print numbers from one to ten").numbers == ["1", "10"]
+
+def test_offline_article():
+    # ಒಂದು before a noun is the article "a"; as a range bound it stays 1
+    translator = OfflineTranslator()
+    assert translator.translate("ಒಂದು ಪಟ್ಟಿ ಮುದ್ರಿಸಿ").text == "print a list"
+    assert translator.translate("ಒಂದರಿಂದ ಹತ್ತರವರೆಗೆ ಮುದ್ರಿಸಿ").text == "print from 1 to 10"
+
+def test_response_cache_cancelled_leader():
+    # A waiter recomputes when the request it was waiting on is cancelled
+    async def scenario():
+        cache = ResponseCache(max_entries=8, ttl=60)
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        async def fast():
+            return {"code": "print(1)"}
+
+        leader = asyncio.create_task(cache.get_or_compute("key", slow))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_compute("key", fast))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await waiter == {"code": "print(1)"}
+        assert leader.cancelled()
+
+    asyncio.run(scenario())
+
 if __name__ == "__main__":
+    test_feedback_huge_range()
+    test_intent_rules()
+    test_number_words()
+    test_offline_article()
+    test_response_cache_cancelled_leader()
     test_code_generation()
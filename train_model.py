@@ -1,66 +1,261 @@
-from transformers import AutoTokenizer, T5ForConditionalGeneration, Trainer, TrainingArguments
-from datasets import load_from_disk, DatasetDict
-from transformers import DataCollatorForSeq2Seq
-
-# Load tokenized dataset
-dataset = load_from_disk("tokenized_kannada_dataset")
-
-# If only "train" split exists, create a "test" split from it
-if "train" in dataset and "test" not in dataset:
-    # Split 10% for validation
-    train_test = dataset["train"].train_test_split(test_size=0.1)
-    dataset = DatasetDict({
-        "train": train_test["train"],
-        "test": train_test["test"]
-    })
-
-# Ensure dataset splits exist and are Dataset objects
-if "train" not in dataset or "test" not in dataset:
-    raise ValueError("Dataset must contain 'train' and 'test' splits.")
-
-# Check required columns
-required_columns = {"input_ids", "attention_mask", "labels"}
-for split in ["train", "test"]:
-    if not required_columns.issubset(set(dataset[split].column_names)):
-        raise ValueError(f"Dataset split '{split}' must contain columns: {required_columns}")
-
-# Load tokenizer and model
-model_name = "Salesforce/codet5-small"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = T5ForConditionalGeneration.from_pretrained(model_name)
-
-# Training configuration
+"""
+Fine-tune CodeT5 on the tokenized Kannada → Python dataset (see data_prep.py).
+- Batches are grouped by length and filled up to a token budget (--max-tokens),
+  so little compute goes to padding
+- The train/test split is seeded when data_prep.py didn't make one
+- Gradient accumulation, periodic checkpoints and automatic resume from the
+  last checkpoint in --output-dir
+- Tokens/s and samples/s are printed after every epoch
+
+Usage:
+    python train_model.py --max-tokens 4096 --grad-accum 2
+    python train_model.py --no-resume   # ignore existing checkpoints
+"""
+
+import argparse
+import os
+import random
+import time
+from functools import partial
+
+import numpy as np
+import pyarrow.compute as pc
 import torch
-training_args = TrainingArguments(
-    output_dir="./results",
-    do_train=True,
-    do_eval=True,
-    learning_rate=5e-5,
-    per_device_train_batch_size=4,
-    per_device_eval_batch_size=4,
-    num_train_epochs=3,
-    weight_decay=0.01,
-    logging_dir="./logs",
-    logging_steps=50,
-    save_total_limit=2,
-    fp16=torch.cuda.is_available(),
+from datasets import DatasetDict, load_from_disk
+from torch.utils.data import DataLoader, Sampler
+from transformers import (
+    AutoTokenizer,
+    DataCollatorForSeq2Seq,
+    T5ForConditionalGeneration,
+    Trainer,
+    TrainerCallback,
+    TrainingArguments,
 )
+from transformers.trainer_utils import get_last_checkpoint, seed_worker
 
-data_collator = DataCollatorForSeq2Seq(tokenizer, model=model)
 
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=dataset["train"],
-    eval_dataset=dataset["test"],
-    data_collator=data_collator,  # <-- add this line
-)
+class TokenBudgetBatchSampler(Sampler):
+    """
+    Batches of similar-length examples whose padded size stays within max_tokens
+    Examples are sorted by length (ties broken by a seeded shuffle) and packed once,
+    so every epoch has the same number of batches; only the batch order changes
+    per epoch, seeded by seed + epoch, which keeps resumed runs on the same order.
+    """
+
+    def __init__(self, input_lengths, label_lengths, max_tokens, seed=42, max_batch_size=256):
+        self.seed = seed
+        self.epoch = 0
+
+        tie_breaker = np.random.default_rng(seed).permutation(len(input_lengths))
+        order = np.lexsort((tie_breaker, label_lengths, input_lengths))
+
+        self.batches = []
+        batch, longest_input, longest_label = [], 0, 0
+        for index in order.tolist():
+            new_input = max(longest_input, int(input_lengths[index]))
+            new_label = max(longest_label, int(label_lengths[index]))
+            # Padded size of the batch with this example added
+            if batch and (
+                (len(batch) + 1) * (new_input + new_label) > max_tokens or len(batch) >= max_batch_size
+            ):
+                self.batches.append(batch)
+                batch = []
+                new_input, new_label = int(input_lengths[index]), int(label_lengths[index])
+            batch.append(index)
+            longest_input, longest_label = new_input, new_label
+        if batch:
+            self.batches.append(batch)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        order = list(range(len(self.batches)))
+        random.Random(self.seed + self.epoch).shuffle(order)
+        for i in order:
+            yield self.batches[i]
+
+    def __len__(self):
+        return len(self.batches)
+
+
+class ThroughputCallback(TrainerCallback):
+    """Prints training tokens/s and samples/s (padding excluded) at the end of every epoch"""
+
+    def __init__(self):
+        self.samples = 0
+        self.tokens = 0
+        self.started = None
+
+    def record(self, inputs):
+        self.samples += inputs["input_ids"].shape[0]
+        self.tokens += int(inputs["attention_mask"].sum())
+        if "labels" in inputs:
+            self.tokens += int((inputs["labels"] != -100).sum())
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self.samples = 0
+        self.tokens = 0
+        self.started = time.perf_counter()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        elapsed = time.perf_counter() - self.started
+        if elapsed <= 0 or not self.samples:
+            return
+        print(
+            f"⏱️  Epoch {state.epoch:.2f}: {self.samples} samples in {elapsed:.1f}s, "
+            f"{self.tokens / elapsed:.0f} tokens/s, {self.samples / elapsed:.1f} samples/s"
+        )
+
+
+class CodelexTrainer(Trainer):
+    """Trainer with token-budget batches and throughput accounting"""
+
+    def __init__(self, *args, max_tokens=None, throughput=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_tokens = max_tokens
+        self.throughput = throughput
+
+    def get_train_dataloader(self):
+        if not self.max_tokens:
+            return super().get_train_dataloader()
+
+        dataset = self.train_dataset
+        # Lengths come straight from the Arrow columns, without decoding the examples
+        table = dataset.with_format("arrow")[:]
+        if "length" in table.column_names:
+            input_lengths = table.column("length").to_numpy()
+        else:
+            input_lengths = pc.list_value_length(table.column("input_ids")).to_numpy()
+        label_lengths = pc.list_value_length(table.column("labels")).to_numpy()
+        batch_sampler = TokenBudgetBatchSampler(
+            input_lengths,
+            label_lengths,
+            self.max_tokens,
+            seed=self.args.data_seed if self.args.data_seed is not None else self.args.seed
+        )
+
+        dataloader = DataLoader(
+            self._remove_unused_columns(dataset, description="Training"),
+            batch_sampler=batch_sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+            persistent_workers=self.args.dataloader_persistent_workers,
+            worker_init_fn=partial(
+                seed_worker, num_workers=self.args.dataloader_num_workers, rank=self.args.process_index
+            ),
+        )
+        return self.accelerator.prepare(dataloader)
+
+    def training_step(self, model, inputs, num_items_in_batch=None):
+        if self.throughput is not None:
+            self.throughput.record(inputs)
+        return super().training_step(model, inputs, num_items_in_batch)
+
+
+def load_splits(path, test_size, seed):
+    """train/test splits of the tokenized dataset, splitting train (seeded) if needed"""
+    dataset = load_from_disk(path)
+
+    # data_prep.py used to call the held-out split "validation"
+    if "test" not in dataset and "validation" in dataset:
+        dataset = DatasetDict({"train": dataset["train"], "test": dataset["validation"]})
+
+    # If only "train" split exists, create a "test" split from it
+    if "train" in dataset and "test" not in dataset:
+        train_test = dataset["train"].train_test_split(test_size=test_size, seed=seed)
+        dataset = DatasetDict({
+            "train": train_test["train"],
+            "test": train_test["test"]
+        })
+
+    # Ensure dataset splits exist and are Dataset objects
+    if "train" not in dataset or "test" not in dataset:
+        raise ValueError("Dataset must contain 'train' and 'test' splits.")
+
+    # Check required columns
+    required_columns = {"input_ids", "attention_mask", "labels"}
+    for split in ["train", "test"]:
+        if not required_columns.issubset(set(dataset[split].column_names)):
+            raise ValueError(f"Dataset split '{split}' must contain columns: {required_columns}")
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fine-tune CodeT5 on the tokenized dataset")
+    parser.add_argument("--data", default="tokenized_kannada_dataset")
+    parser.add_argument("--model", default="Salesforce/codet5-small")
+    parser.add_argument("--output-dir", default="./results", help="Checkpoints (resumed automatically)")
+    parser.add_argument("--save-dir", default="./kannada_python_t5_model", help="Final model")
+    parser.add_argument("--epochs", type=float, default=3)
+    parser.add_argument("--learning-rate", type=float, default=5e-5)
+    parser.add_argument("--max-tokens", type=int, default=2048,
+                        help="Padded tokens (inputs + labels) per batch; 0 uses --batch-size batches")
+    parser.add_argument("--batch-size", type=int, default=4, help="Evaluation batch size, and training without --max-tokens")
+    parser.add_argument("--grad-accum", type=int, default=1, help="Batches per optimizer step")
+    parser.add_argument("--save-steps", type=int, default=200, help="Optimizer steps between checkpoints")
+    parser.add_argument("--test-size", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-resume", action="store_true", help="Start over even if checkpoints exist")
+    args = parser.parse_args()
+
+    # Load tokenized dataset
+    dataset = load_splits(args.data, args.test_size, args.seed)
+
+    # Load tokenizer and model
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = T5ForConditionalGeneration.from_pretrained(args.model)
+
+    # Training configuration
+    training_args = TrainingArguments(
+        output_dir=args.output_dir,
+        do_train=True,
+        do_eval=True,
+        learning_rate=args.learning_rate,
+        per_device_train_batch_size=args.batch_size,
+        per_device_eval_batch_size=args.batch_size,
+        gradient_accumulation_steps=args.grad_accum,
+        num_train_epochs=args.epochs,
+        weight_decay=0.01,
+        logging_dir="./logs",
+        logging_steps=50,
+        save_strategy="steps",
+        save_steps=args.save_steps,
+        save_total_limit=2,
+        seed=args.seed,
+        fp16=torch.cuda.is_available(),
+    )
+
+    data_collator = DataCollatorForSeq2Seq(tokenizer, model=model)
+    throughput = ThroughputCallback()
+
+    trainer = CodelexTrainer(
+        model=model,
+        args=training_args,
+        train_dataset=dataset["train"],
+        eval_dataset=dataset["test"],
+        data_collator=data_collator,
+        callbacks=[throughput],
+        max_tokens=args.max_tokens,
+        throughput=throughput,
+    )
+
+    last_checkpoint = None
+    if not args.no_resume and os.path.isdir(args.output_dir):
+        last_checkpoint = get_last_checkpoint(args.output_dir)
+    if last_checkpoint:
+        print(f"🔁 Resuming from {last_checkpoint}")
+
+    print("🚀 Training started...")
+    trainer.train(resume_from_checkpoint=last_checkpoint)
+
+    # Save model + tokenizer after training
+    model.save_pretrained(args.save_dir)
+    tokenizer.save_pretrained(args.save_dir)
 
-print("🚀 Training started...")
-trainer.train()
+    print("✅ Model training completed and saved successfully!")
 
-# Save model + tokenizer after training
-model.save_pretrained("./kannada_python_t5_model")
-tokenizer.save_pretrained("./kannada_python_t5_model")
 
-print("✅ Model training completed and saved successfully!")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Google Translate client for Codelex
+Sends the same request as deep_translator's GoogleTranslator (the mobile
+page with sl/tl/q parameters), but with a timeout on every HTTP request
+and a configurable base URL (e.g. fake_translator.py)
+"""
+
+import html
+import re
+
+import requests
+
+GOOGLE_TRANSLATE_URL = "https://translate.google.com/m"
+_RESULT_PATTERN = re.compile(r'<div[^>]*class="(?:t0|result-container)"[^>]*>(.*?)</div>', re.DOTALL)
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+class TranslationNotFound(RuntimeError):
+    """The translator answered, but without a translation in the page"""
+
+
+class GoogleTranslateClient:
+    """Translates one text per request; errors and timeouts raise"""
+
+    def __init__(self, source: str = "auto", target: str = "en", url: str = None, timeout: float = 3.0):
+        self.source = source
+        self.target = target
+        self.url = url or GOOGLE_TRANSLATE_URL
+        self.timeout = timeout
+
+    def translate(self, text: str) -> str:
+        text = text.strip()
+        if not text:
+            return text
+        response = requests.get(
+            self.url,
+            params={"sl": self.source, "tl": self.target, "q": text},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        match = _RESULT_PATTERN.search(response.text)
+        if match is None:
+            raise TranslationNotFound(f"No translation in the response from {self.url}")
+        return html.unescape(_TAG_PATTERN.sub("", match.group(1))).strip()